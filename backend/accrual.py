@@ -0,0 +1,237 @@
+"""Interest accrual for DAILY_RATE loans (see migrations/add_interest_accrual.sql).
+
+A DAILY_RATE loan owes one INTEREST_ONLY installment of
+ceil(principal / 1 lakh * rate * days) per period of `frequency` days, due at
+the end of the period (the first one is created with the loan, see
+schedule.py). An installment is generated once its period has begun, so a
+loan always has the installment of its current period.
+
+The job reads every active daily-rate loan together with the due date its
+interest has been generated through, works out all missing installments in
+one vectorized NumPy pass over principal / rate / day-count arrays and writes
+them back in bulk. Loans advance their `last_interest_generation_date`, so
+re-running the job generates nothing new.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from postgrest.exceptions import APIError
+from database import AsyncDatabase, fetch_all
+from data_versions import bump_data_version
+from schedule import frequency_days
+
+# Installments per apply_interest_accrual call / insert request
+APPLY_CHUNK_SIZE = 5000
+
+# Ids per `in` filter in the fallback path, to keep request URLs short
+UPDATE_CHUNK_SIZE = 200
+
+CANDIDATE_FIELDS = "id, user_id, client_name, principal_amount, daily_rate_per_lakh, frequency, start_date"
+
+# The fallback reads, then inserts without database locking: overlapping runs
+# (the job and POST /loans/accrue-interest) would insert the same installments.
+# Serializes them within this process; several workers need the migration.
+_fallback_lock = asyncio.Lock()
+
+
+def _cents(values: List[Any]) -> np.ndarray:
+    return np.rint(np.array([float(v or 0) for v in values], dtype=np.float64) * 100).astype(np.int64)
+
+
+def _dates(values: List[Any]) -> np.ndarray:
+    return np.array([str(v)[:10] if v else "NaT" for v in values], dtype="datetime64[D]")
+
+
+def plan_accrual(loans: List[dict], as_of: date) -> Tuple[Dict[str, list], Dict[str, str]]:
+    """Missing interest installments of `loans` as of `as_of`
+
+    Loans need id, principal_amount, daily_rate_per_lakh, frequency,
+    start_date and generated_through (due date of their latest interest
+    installment, None if they have none). Returns the installments as
+    columns ({"loan_id", "due_date", "expected_amount"} lists, ordered by
+    loan and due date) and the due date each accrued loan is now generated
+    through.
+    """
+    planned: Dict[str, list] = {"loan_id": [], "due_date": [], "expected_amount": []}
+    if not loans:
+        return planned, {}
+
+    # Day counts: one lookup per distinct frequency string
+    day_counts: Dict[str, int] = {}
+    for frequency in set(str(loan.get("frequency") or "") for loan in loans):
+        try:
+            day_counts[frequency] = frequency_days(frequency)
+        except ValueError:
+            day_counts[frequency] = 0  # CUSTOM without a day count - skipped
+    days = np.array([day_counts[str(loan.get("frequency") or "")] for loan in loans], dtype=np.int64)
+
+    principal = _cents([loan.get("principal_amount") for loan in loans])
+    rate = _cents([loan.get("daily_rate_per_lakh") for loan in loans])
+    start = _dates([loan.get("start_date") for loan in loans])
+    through = _dates([loan.get("generated_through") for loan in loans])
+
+    # ceil(principal / 1 lakh * rate * days) in whole units, exactly: amounts
+    # are in cents, so the divisor is 1 lakh * 100 * 100
+    divisor = 100000 * 100 * 100
+    if float(principal.max()) * float(rate.max()) * float(max(days.max(), 1)) < 2 ** 62:
+        amount = -(-(principal * rate * days) // divisor)
+    else:
+        amount = np.array([-(-(int(p) * int(r) * int(d)) // divisor) for p, r, d in zip(principal, rate, days)],
+                          dtype=object)
+
+    # Periods are counted from the last generated due date (or the start):
+    # due dates anchor + k * days for every k whose period began by as_of
+    anchor = np.where(np.isnat(through), start, through)
+    elapsed = (np.datetime64(as_of, "D") - anchor).astype(np.int64)
+    valid = (days > 0) & (amount > 0) & ~np.isnat(anchor)
+    counts = np.where(valid, (elapsed + days) // np.maximum(days, 1), 0)
+    counts = np.maximum(counts, 0).astype(np.int64)
+
+    total = int(counts.sum())
+    if total == 0:
+        return planned, {}
+
+    loan_index = np.repeat(np.arange(len(loans)), counts)
+    first_row = np.repeat(np.cumsum(counts) - counts, counts)
+    period = np.arange(total, dtype=np.int64) - first_row + 1
+    due = anchor[loan_index] + (period * days[loan_index]).astype("timedelta64[D]")
+
+    # Format each distinct date once
+    unique_due, due_index = np.unique(due, return_inverse=True)
+    unique_text = np.array(unique_due.astype(str).tolist(), dtype=object)
+
+    ids = np.array([loan["id"] for loan in loans], dtype=object)
+    planned["loan_id"] = ids[loan_index].tolist()
+    planned["due_date"] = unique_text[due_index].tolist()
+    planned["expected_amount"] = amount[loan_index].astype(np.float64).tolist()
+
+    accrued = np.nonzero(counts)[0]
+    last = (anchor[accrued] + (counts[accrued] * days[accrued]).astype("timedelta64[D]")).astype(str).tolist()
+    generated_through = dict(zip(ids[accrued].tolist(), last))
+    return planned, generated_through
+
+
+async def fetch_candidates(db: AsyncDatabase, user_id: Optional[str] = None,
+                           loan_id: Optional[str] = None) -> List[dict]:
+    """Active DAILY_RATE loans (every user's when user_id is None) with generated_through"""
+    try:
+        params = {"p_user_id": user_id, "p_loan_id": loan_id}
+        return await fetch_all(lambda: db.rpc("interest_accrual_candidates", params))
+    except APIError as e:
+        logging.warning(f"interest_accrual_candidates unavailable, reading loans: {e.message}")
+
+    def scoped(query, user_column: str, loan_column: str):
+        if user_id:
+            query = query.eq(user_column, user_id)
+        if loan_id:
+            query = query.eq(loan_column, loan_id)
+        return query.order("id")
+
+    loans = await fetch_all(lambda: scoped(
+        db.table("loans").select(f"{CANDIDATE_FIELDS}, last_interest_generation_date")
+        .eq("type", "DAILY_RATE").eq("status", "ACTIVE"),
+        "user_id", "id"
+    ))
+    interest = await fetch_all(lambda: scoped(
+        db.table("installments").select("id, loan_id, due_date").eq("type", "INTEREST_ONLY"),
+        "user_id", "loan_id"
+    ))
+    latest: Dict[str, str] = {}
+    for inst in interest:
+        if inst["due_date"] > latest.get(inst["loan_id"], ""):
+            latest[inst["loan_id"]] = inst["due_date"]
+    for loan in loans:
+        dates = [d for d in (loan.pop("last_interest_generation_date"), latest.get(loan["id"])) if d]
+        loan["generated_through"] = max(dates) if dates else None
+    return loans
+
+
+async def _apply_fallback(db: AsyncDatabase, loans: List[dict], planned: Dict[str, list],
+                          generated_through: Dict[str, str]) -> int:
+    """Plain bulk inserts and updates (no locking; callers hold _fallback_lock)"""
+    by_id = {loan["id"]: loan for loan in loans}
+    records = [
+        {
+            "loan_id": loan_id,
+            "due_date": due_date,
+            "expected_amount": amount,
+            "user_id": by_id[loan_id]["user_id"],
+            "client_name": by_id[loan_id]["client_name"],
+            "paid_amount": 0,
+            "penalty": 0,
+            "type": "INTEREST_ONLY",
+            "status": "PENDING",
+        }
+        for loan_id, due_date, amount in zip(planned["loan_id"], planned["due_date"], planned["expected_amount"])
+    ]
+    for i in range(0, len(records), APPLY_CHUNK_SIZE):
+        await db.table("installments").insert(records[i:i + APPLY_CHUNK_SIZE]).execute()
+
+    loans_by_date: Dict[str, List[str]] = defaultdict(list)
+    for loan_id, through in generated_through.items():
+        loans_by_date[through].append(loan_id)
+    for through, loan_ids in loans_by_date.items():
+        for i in range(0, len(loan_ids), UPDATE_CHUNK_SIZE):
+            await db.table("loans").update({"last_interest_generation_date": through}) \
+                .in_("id", loan_ids[i:i + UPDATE_CHUNK_SIZE]) \
+                .execute()
+    return len(records)
+
+
+async def accrue_interest(db: AsyncDatabase, user_id: Optional[str] = None, loan_id: Optional[str] = None,
+                          as_of: Optional[date] = None) -> Dict[str, Any]:
+    """Generate the missing interest installments of active DAILY_RATE loans
+
+    Scoped to one user and/or loan, or every user's loans when both are None.
+    Returns counts and the ids of the users whose data changed.
+    """
+    as_of = as_of or date.today()
+    loans = await fetch_candidates(db, user_id, loan_id)
+    planned, generated_through = await run_in_threadpool(plan_accrual, loans, as_of)
+
+    created = 0
+    total = len(planned["loan_id"])
+    if total:
+        try:
+            # Sent as parallel arrays; rows are ordered by loan and due date,
+            # so a loan split across chunks still advances in order
+            for i in range(0, total, APPLY_CHUNK_SIZE):
+                response = await db.rpc("apply_interest_accrual", {
+                    "p_loan_ids": planned["loan_id"][i:i + APPLY_CHUNK_SIZE],
+                    "p_due_dates": planned["due_date"][i:i + APPLY_CHUNK_SIZE],
+                    "p_amounts": planned["expected_amount"][i:i + APPLY_CHUNK_SIZE],
+                }).execute()
+                created += int(response.data or 0)
+        except APIError as e:
+            if i > 0:
+                raise
+            logging.warning(f"apply_interest_accrual unavailable, inserting directly: {e.message}")
+            async with _fallback_lock:
+                # Planned again under the lock: the run that held it may have
+                # generated some of these installments already
+                loans = await fetch_candidates(db, user_id, loan_id)
+                planned, generated_through = await run_in_threadpool(plan_accrual, loans, as_of)
+                created = await _apply_fallback(db, loans, planned, generated_through)
+
+    users = sorted(set(str(loan["user_id"]) for loan in loans if loan["id"] in generated_through))
+    return {"loans_accrued": len(generated_through), "installments_created": created, "user_ids": users}
+
+
+async def run_accrual_job(db: AsyncDatabase, interval_hours: float):
+    """Accrue every user's loans now and then every `interval_hours` (runs until cancelled)"""
+    while True:
+        try:
+            result = await accrue_interest(db)
+            for accrued_user in result["user_ids"]:
+                bump_data_version(accrued_user)
+            logging.info(
+                f"Interest accrual: {result['installments_created']} installments "
+                f"for {result['loans_accrued']} loans"
+            )
+        except Exception:
+            logging.exception("Interest accrual failed")
+        await asyncio.sleep(interval_hours * 3600)
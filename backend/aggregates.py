@@ -0,0 +1,129 @@
+"""Maintained per-user portfolio aggregates (see migrations/add_portfolio_aggregates.sql).
+
+Triggers on loans, installments and transactions keep one
+`portfolio_aggregates` row per user current, so the dashboard summary is a
+primary-key read plus one indexed overdue count instead of a full scan of
+every table.
+"""
+import logging
+from datetime import date
+from typing import Dict, Any
+from postgrest.exceptions import APIError
+from database import AsyncDatabase, fetch_all
+from analytics import compute_financial_summary
+import reports
+from overdue import overdue_filter
+
+# Fields kept current by the triggers; cash_in_hand and the overdue figures
+# are derived at read time.
+MAINTAINED_FIELDS = (
+    "total_loans",
+    "active_loans",
+    "total_disbursed",
+    "market_amount",
+    "market_principal",
+    "market_interest",
+    "total_interest_expected",
+    "total_collected",
+    "total_inflow",
+    "total_outflow",
+)
+
+
+def _to_summary(row: dict) -> Dict[str, Any]:
+    """Convert an aggregates row (NUMERIC comes back as strings) to summary values"""
+    summary = {
+        field: int(row.get(field) or 0) if field in ("total_loans", "active_loans") else float(row.get(field) or 0)
+        for field in MAINTAINED_FIELDS
+    }
+    summary["cash_in_hand"] = max(0, summary["total_inflow"] - summary["total_outflow"])
+    return summary
+
+
+async def fetch_overdue(db: AsyncDatabase, user_id: str) -> Dict[str, Any]:
+    """Overdue count and amount - depends on today's date, so it is never stored
+
+    Counted and summed in the database (migrations/add_overdue_summary.sql)
+    over the (user_id, status, due_date) index, see overdue.py.
+    """
+    today = date.today()
+    try:
+        response = await db.rpc("overdue_summary", {"p_user_id": user_id, "p_today": today.isoformat()}).execute()
+        row = response.data[0] if response.data else {}
+        return {
+            "overdue_count": int(row.get("overdue_count") or 0),
+            "overdue_amount": float(row.get("overdue_amount") or 0),
+        }
+    except APIError as e:
+        logging.warning(f"overdue_summary unavailable, summing overdue installments: {e.message}")
+
+    rows = await fetch_all(
+        lambda: overdue_filter(
+            db.table("installments")
+            .select("id, expected_amount, paid_amount")
+            .eq("user_id", user_id),
+            today
+        )
+        .order("id")
+    )
+    return {
+        "overdue_count": len(rows),
+        "overdue_amount": sum(
+            float(inst.get("expected_amount", 0)) - float(inst.get("paid_amount") or 0)
+            for inst in rows
+        ),
+    }
+
+
+async def rebuild_portfolio_aggregates(db: AsyncDatabase, user_id: str) -> Dict[str, Any]:
+    """Recompute the user's aggregates row from the live tables (repair)"""
+    response = await db.rpc("rebuild_portfolio_aggregates", {"p_user_id": user_id}).execute()
+    return _to_summary(response.data[0] if response.data else {})
+
+
+async def get_financial_summary(db: AsyncDatabase, user_id: str) -> Dict[str, Any]:
+    """Financial summary from the maintained aggregates"""
+    try:
+        response = await db.table("portfolio_aggregates").select("*").eq("user_id", user_id).execute()
+    except APIError as e:
+        # Aggregates migration not applied - aggregate on demand instead
+        logging.warning(f"portfolio_aggregates unavailable, aggregating on demand: {e.message}")
+        return await reports.get_financial_summary(db, user_id)
+
+    if response.data:
+        summary = _to_summary(response.data[0])
+    else:
+        # No row yet (user created before the migration ran)
+        summary = await rebuild_portfolio_aggregates(db, user_id)
+
+    summary.update(await fetch_overdue(db, user_id))
+    return summary
+
+
+async def recompute_financial_summary(db: AsyncDatabase, user_id: str) -> Dict[str, Any]:
+    """Financial summary computed from scratch over every row (slow, reference only)"""
+    loans = await fetch_all(lambda: db.table("loans").select("*").eq("user_id", user_id).order("id"))
+    installments = await fetch_all(lambda: db.table("installments").select("*").eq("user_id", user_id).order("id"))
+    transactions = await fetch_all(lambda: db.table("transactions").select("*").eq("user_id", user_id).order("id"))
+    return compute_financial_summary(loans, installments, transactions)
+
+
+async def check_portfolio_aggregates(
+    db: AsyncDatabase,
+    user_id: str,
+    tolerance: float = 0.01
+) -> Dict[str, Any]:
+    """Compare the maintained aggregates against a from-scratch recompute"""
+    response = await db.table("portfolio_aggregates").select("*").eq("user_id", user_id).execute()
+    maintained = _to_summary(response.data[0]) if response.data else None
+    recomputed = await recompute_financial_summary(db, user_id)
+
+    if maintained is None:
+        return {"consistent": False, "missing": True, "mismatches": {}}
+
+    mismatches = {
+        field: {"maintained": maintained[field], "recomputed": recomputed[field]}
+        for field in MAINTAINED_FIELDS + ("cash_in_hand",)
+        if abs(maintained[field] - recomputed[field]) > tolerance
+    }
+    return {"consistent": not mismatches, "missing": False, "mismatches": mismatches}
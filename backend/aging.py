@@ -0,0 +1,121 @@
+"""Receivables aging (GET /installments/aging).
+
+Outstanding amounts (expected - paid) of unpaid installments, bucketed by
+days past due and broken down per client and per loan type.
+
+The user's unpaid installments are read once into an index sorted by due
+date. Bucket edges are due dates (today - 60, - 30, - 7, today), so each
+bucket is a contiguous slice found with `bisect` on the ISO date strings -
+no per-row date parsing - and the report is one pass over the slices. The
+index does not depend on the day, so it is cached per user until the user's
+data version changes (any write to installments or loans), and each report
+is cached alongside it for the day it was computed for.
+"""
+from bisect import bisect_left
+from datetime import date, timedelta
+from itertools import accumulate
+from typing import Any, Dict, List, Optional
+from database import AsyncDatabase, fetch_all
+from data_versions import VersionedCache, data_version
+from overdue import UNPAID_STATUSES
+from config import settings
+
+# (label, days past due the bucket starts at), oldest last
+BUCKETS = (("current", 0), ("1-7", 1), ("8-30", 8), ("31-60", 31), ("60+", 61))
+
+BUCKET_LABELS = tuple(label for label, _ in BUCKETS)
+
+
+class AgingIndex:
+    """Unpaid installments of one user as parallel lists sorted by due date"""
+
+    def __init__(self, rows: List[dict]):
+        rows = sorted(rows, key=lambda inst: inst["due_date"])
+        self.due_dates = [str(inst["due_date"])[:10] for inst in rows]
+        self.amounts = [
+            float(inst.get("expected_amount") or 0) - float(inst.get("paid_amount") or 0) for inst in rows
+        ]
+        self.clients = [inst.get("client_name") or "" for inst in rows]
+        self.loan_types = [(inst.get("loans") or {}).get("type") or "" for inst in rows]
+        # amount_prefix[i] = sum of amounts[:i], for bucket totals
+        self.amount_prefix = [0.0] + list(accumulate(self.amounts))
+        self._reports: Dict[str, Dict[str, Any]] = {}
+
+    def bounds(self, today: date) -> List[int]:
+        """Descending row offsets: bucket b is rows[bounds[b + 1]:bounds[b]]"""
+        # A bucket starting `start` days past due holds rows due before today - (start - 1)
+        edges = [bisect_left(self.due_dates, (today - timedelta(days=start - 1)).isoformat())
+                 for _, start in BUCKETS[1:]]
+        return [len(self.due_dates)] + edges + [0]
+
+    def report(self, today: date) -> Dict[str, Any]:
+        key = today.isoformat()
+        if key not in self._reports:
+            self._reports = {key: self._build(today)}  # Keep only the latest day
+        return self._reports[key]
+
+    def _build(self, today: date) -> Dict[str, Any]:
+        bounds = self.bounds(today)
+        total = _empty()
+        groups: Dict[str, Dict[str, Dict[str, Any]]] = {"client": {}, "loan_type": {}}
+        for b, label in enumerate(BUCKET_LABELS):
+            lo, hi = bounds[b + 1], bounds[b]
+            total["counts"][label] = hi - lo
+            total["amounts"][label] = self.amount_prefix[hi] - self.amount_prefix[lo]
+            for i in range(lo, hi):
+                for group, name in (("client", self.clients[i]), ("loan_type", self.loan_types[i])):
+                    entry = groups[group].get(name)
+                    if entry is None:
+                        entry = groups[group][name] = _empty()
+                    entry["counts"][label] += 1
+                    entry["amounts"][label] += self.amounts[i]
+
+        return {
+            "as_of": today.isoformat(),
+            "buckets": list(BUCKET_LABELS),
+            "total": _finish("total", total),
+            "by_client": [_finish(name, entry) for name, entry in sorted(groups["client"].items())],
+            "by_loan_type": [_finish(name, entry) for name, entry in sorted(groups["loan_type"].items())],
+        }
+
+
+def _empty() -> Dict[str, Dict[str, Any]]:
+    return {"counts": dict.fromkeys(BUCKET_LABELS, 0), "amounts": dict.fromkeys(BUCKET_LABELS, 0.0)}
+
+
+def _finish(name: str, entry: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    amounts = {label: round(amount, 2) for label, amount in entry["amounts"].items()}
+    return {
+        "name": name,
+        "count": sum(entry["counts"].values()),
+        "amount": round(sum(entry["amounts"].values()), 2),
+        "counts": entry["counts"],
+        "amounts": amounts,
+    }
+
+
+_index_cache = VersionedCache(settings.report_cache_size)
+
+
+async def get_aging_index(db: AsyncDatabase, user_id: str) -> AgingIndex:
+    """The user's aging index, from cache unless their data changed"""
+    index = _index_cache.get(user_id)
+    if index is None:
+        version = data_version(user_id)
+        rows = await fetch_all(
+            lambda: db.table("installments")
+            .select("id, due_date, expected_amount, paid_amount, client_name, loans!inner(type)")
+            .eq("user_id", user_id)
+            .in_("status", list(UNPAID_STATUSES))
+            .order("due_date")
+            .order("id")
+        )
+        index = AgingIndex(rows)
+        _index_cache.put(user_id, index, version=version)
+    return index
+
+
+async def get_aging_report(db: AsyncDatabase, user_id: str, today: Optional[date] = None) -> Dict[str, Any]:
+    """Aging buckets as of `today` in total, per client and per loan type"""
+    index = await get_aging_index(db, user_id)
+    return index.report(today or date.today())
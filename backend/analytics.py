@@ -0,0 +1,205 @@
+"""Portfolio calculations over raw loan, installment and transaction rows.
+
+These are the from-scratch reference implementations. The live dashboard
+reads maintained aggregates (see aggregates.py) and reports are computed in
+Postgres (see reports.py); these functions are the fallback when the SQL
+functions are unavailable and what both are checked against.
+"""
+from datetime import date
+from typing import Dict, Any, List, Optional
+
+
+def compute_financial_summary(
+    loans: List[dict],
+    installments: List[dict],
+    transactions: List[dict],
+    today: Optional[str] = None
+) -> Dict[str, Any]:
+    """Compute every FinancialSummary field from raw rows
+
+    Money In Hand = sum(CREDITs) - sum(DEBITs) from transactions table
+      - This naturally handles the reinvestment cycle
+      - Disbursements are DEBIT, repayments are CREDIT
+    """
+    total_loans = len(loans)
+    active_loans = len([l for l in loans if l.get("status") == "ACTIVE"])
+    total_disbursed = sum(float(l.get("principal_amount", 0)) for l in loans)
+
+    # Group installments by loan once instead of rescanning per loan
+    installments_by_loan: Dict[str, List[dict]] = {}
+    for inst in installments:
+        installments_by_loan.setdefault(inst.get("loan_id"), []).append(inst)
+
+    # Market amount calculation (original logic — based on unpaid installments)
+    market_amount = 0.0
+    market_principal = 0.0
+    market_interest = 0.0
+    total_interest_expected = 0.0
+
+    for loan in loans:
+        l_principal = float(loan.get("principal_amount", 0))
+        loan_type = loan.get("type", "")
+        loan_status = loan.get("status", "ACTIVE")
+        loan_insts = installments_by_loan.get(loan.get("id"), [])
+
+        if loan_type == "TOTAL_RATE":
+            multiplier = float(loan.get("total_rate_multiplier") or 1.2)
+            total_repay = l_principal * multiplier
+            l_interest = total_repay - l_principal
+            total_interest_expected += l_interest
+
+            if loan_status != "COMPLETED":
+                for inst in loan_insts:
+                    if inst.get("status") != "PAID":
+                        # Amortized Principal vs Interest
+                        remaining = float(inst.get("expected_amount", 0)) - float(inst.get("paid_amount") or 0)
+                        market_amount += remaining
+                        market_principal += remaining * (l_principal / total_repay)
+                        market_interest += remaining * (l_interest / total_repay)
+        else:
+            # DAILY_RATE
+            total_interest_expected += sum(float(i.get("expected_amount", 0)) for i in loan_insts if i.get("type") == "INTEREST_ONLY")
+
+            if loan_status == "ACTIVE":
+                market_amount += l_principal
+                market_principal += l_principal
+
+            for inst in loan_insts:
+                if inst.get("status") != "PAID":
+                    remaining = float(inst.get("expected_amount", 0)) - float(inst.get("paid_amount") or 0)
+                    market_amount += remaining
+                    market_interest += remaining
+
+    # ─── Money In Hand (Reinvestment Cycle) ───────────────────
+    # Pure transaction-based: CREDITs - DEBITs
+    # Loan disbursements are already recorded as DEBIT transactions
+    # Repayments are already recorded as CREDIT transactions
+    total_inflow = sum(float(txn.get("amount", 0)) for txn in transactions if txn.get("type") == "CREDIT")
+    total_outflow = sum(float(txn.get("amount", 0)) for txn in transactions if txn.get("type") == "DEBIT")
+    cash_in_hand = max(0, total_inflow - total_outflow)
+
+    # Total collected from installments (for reference)
+    total_collected = sum(float(inst.get("paid_amount") or 0) for inst in installments)
+
+    # Overdue metrics — date-based detection
+    today_str = today or date.today().isoformat()
+    overdue_installments = [
+        inst for inst in installments
+        if inst.get("status") != "PAID" and (inst.get("due_date", "") < today_str)
+    ]
+    overdue_count = len(overdue_installments)
+    overdue_amount = sum(
+        float(inst.get("expected_amount", 0)) - float(inst.get("paid_amount") or 0)
+        for inst in overdue_installments
+    )
+
+    return {
+        "total_loans": total_loans,
+        "active_loans": active_loans,
+        "total_disbursed": total_disbursed,
+        "market_amount": market_amount,
+        "market_principal": market_principal,
+        "market_interest": market_interest,
+        "total_interest_expected": total_interest_expected,
+        "cash_in_hand": cash_in_hand,
+        "total_collected": total_collected,
+        "total_inflow": total_inflow,
+        "total_outflow": total_outflow,
+        "overdue_count": overdue_count,
+        "overdue_amount": overdue_amount,
+    }
+
+
+def compute_investment_breakdown(loans: List[dict], installments: List[dict]) -> List[Dict[str, Any]]:
+    """Per-loan investment breakdown as raw values (one entry per loan)
+
+    Same market-value rules as compute_financial_summary.
+    """
+    installments_by_loan: Dict[str, List[dict]] = {}
+    for inst in installments:
+        installments_by_loan.setdefault(inst.get("loan_id"), []).append(inst)
+
+    breakdown = []
+    for loan in loans:
+        principal = float(loan.get("principal_amount", 0))
+        loan_type = loan.get("type", "")
+        loan_status = loan.get("status", "ACTIVE")
+        frequency = str(loan.get("frequency", ""))
+        loan_insts = installments_by_loan.get(loan.get("id"), [])
+
+        received = sum(float(i.get("paid_amount") or 0) for i in loan_insts)
+        unpaid_remaining = sum(
+            float(i.get("expected_amount", 0)) - float(i.get("paid_amount") or 0)
+            for i in loan_insts if i.get("status") != "PAID"
+        )
+
+        mkt_principal = 0.0
+        mkt_interest = 0.0
+
+        if loan_type == "TOTAL_RATE":
+            multiplier = float(loan.get("total_rate_multiplier") or 1.2)
+            total_repay = principal * multiplier
+            total_interest = total_repay - principal
+            int_pct = (multiplier - 1) * 100
+
+            if loan_status != "COMPLETED":
+                # Amortize principal vs interest
+                mkt_principal = unpaid_remaining * (principal / total_repay)
+                mkt_interest = unpaid_remaining * (total_interest / total_repay)
+        else:
+            # DAILY_RATE - rate per lakh per day
+            int_pct = float(loan.get("daily_rate_per_lakh") or 100)
+
+            if loan_status == "ACTIVE":
+                mkt_principal = principal
+            mkt_interest = unpaid_remaining
+
+        breakdown.append({
+            "loan_id": loan.get("id"),
+            "person": loan.get("client_name", "Unknown"),
+            "start_date": loan.get("start_date", ""),
+            "cycle": f"{frequency}d" if frequency.isdigit() else frequency,
+            "capital": principal,
+            "interest_percentage": int_pct,
+            "received": received,
+            "mkt_principal": mkt_principal,
+            "mkt_interest": mkt_interest,
+            "total_market_value": mkt_principal + mkt_interest,
+        })
+
+    return breakdown
+
+
+def compute_monthly_summary(
+    loans: List[dict],
+    installments: List[dict],
+    transactions: List[dict],
+    today: Optional[str] = None
+) -> Dict[str, Any]:
+    """Metrics for the Monthly_Summary sheet of the archive spreadsheet
+
+    Pending / overdue are split by due date, as in compute_financial_summary.
+    """
+    total_disbursed = sum(float(loan.get("principal_amount", 0)) for loan in loans)
+
+    # Total Collected (Installments only)
+    total_installments_collected = sum(float(inst.get("paid_amount") or 0) for inst in installments)
+
+    total_txn_credit = sum(float(txn.get("amount", 0)) for txn in transactions if txn.get("type") == "CREDIT")
+    total_txn_debit = sum(float(txn.get("amount", 0)) for txn in transactions if txn.get("type") == "DEBIT")
+
+    today_str = today or date.today().isoformat()
+    unpaid = [inst for inst in installments if inst.get("status") != "PAID"]
+
+    return {
+        "total_loans": len(loans),
+        "active_loans": len([l for l in loans if l.get("status") == "ACTIVE"]),
+        "total_disbursed": total_disbursed,
+        "total_installments_collected": total_installments_collected,
+        # Total Inflow = Installments + Credit Txns
+        "total_inflow": total_installments_collected + total_txn_credit,
+        # Total Outflow = Disbursements + Debit Txns
+        "total_outflow": total_disbursed + total_txn_debit,
+        "pending_installments": len([i for i in unpaid if i.get("due_date", "") >= today_str]),
+        "overdue_installments": len([i for i in unpaid if i.get("due_date", "") < today_str]),
+    }
@@ -1,5 +1,9 @@
+import hashlib
+import heapq
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
@@ -39,8 +43,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def decode_access_token(token: str) -> TokenData:
-    """Decode and validate a JWT access token"""
+def _verify_access_token(token: str) -> Tuple[str, Optional[float]]:
+    """Verify a JWT's signature and claims; returns (user_id, exp)"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -54,12 +58,120 @@ def decode_access_token(token: str) -> TokenData:
         if user_id is None:
             raise credentials_exception
         
-        return TokenData(user_id=user_id)
+        exp = payload.get("exp")
+        return user_id, float(exp) if exp is not None else None
     
     except JWTError:
         raise credentials_exception
 
 
+class TokenCache:
+    """Bounded LRU of verified tokens, keyed by token digest
+
+    An entry lives until the token's `exp` or `ttl` seconds, whichever comes
+    first. Revoked tokens are remembered until their `exp` so they cannot be
+    re-verified after logout; that deny-list is not bounded by `max_size`
+    (only logged-in users can add to it) and only drops expired entries.
+    Only touched from the event loop.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._revoked: Dict[str, float] = {}
+        # (revoked_until, key) min-heap, to drop expired revocations in order
+        self._revoked_expiry: List[Tuple[float, str]] = []
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, key: str, now: float) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        user_id, expires_at = entry
+        if expires_at <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return user_id
+
+    def put(self, key: str, user_id: str, exp: Optional[float], now: float):
+        expires_at = now + self.ttl if exp is None else min(exp, now + self.ttl)
+        if expires_at <= now or self.max_size <= 0:
+            return
+        self._entries[key] = (user_id, expires_at)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._purge_expired(now)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def is_revoked(self, key: str, now: float) -> bool:
+        revoked_until = self._revoked.get(key)
+        if revoked_until is None:
+            return False
+        if revoked_until <= now:
+            del self._revoked[key]
+            return False
+        return True
+
+    def revoke(self, key: str, exp: Optional[float], now: float):
+        self._entries.pop(key, None)
+        # A token without `exp` never expires, so neither does its revocation
+        revoked_until = max(exp if exp is not None else float("inf"), self._revoked.get(key, 0.0))
+        self._revoked[key] = revoked_until
+        heapq.heappush(self._revoked_expiry, (revoked_until, key))
+        while self._revoked_expiry and self._revoked_expiry[0][0] <= now:
+            expired_at, expired = heapq.heappop(self._revoked_expiry)
+            if self._revoked.get(expired) == expired_at:
+                del self._revoked[expired]
+
+    def _purge_expired(self, now: float):
+        expired = [key for key, (_, expires_at) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+        self._revoked.clear()
+        self._revoked_expiry.clear()
+
+
+token_cache = TokenCache(settings.token_cache_size, settings.token_cache_ttl_seconds)
+
+
+def decode_access_token(token: str) -> TokenData:
+    """Decode and validate a JWT access token (verified tokens are cached)"""
+    now = time.time()
+    key = TokenCache.digest(token)
+
+    if token_cache.is_revoked(key, now):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    user_id = token_cache.get(key, now)
+    if user_id is None:
+        user_id, exp = _verify_access_token(token)
+        token_cache.put(key, user_id, exp, now)
+
+    return TokenData(user_id=user_id)
+
+
+def revoke_access_token(token: str):
+    """Reject `token` from now on (called on logout)"""
+    try:
+        exp = jwt.get_unverified_claims(token).get("exp")
+    except JWTError:
+        return  # Malformed tokens are rejected anyway
+    token_cache.revoke(TokenCache.digest(token), float(exp) if exp is not None else None, time.time())
+
+
 async def get_current_user_id(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> str:
@@ -0,0 +1,100 @@
+"""Interest accrual benchmark: vectorized plan_accrual vs accruing loan by loan.
+
+Plans the missing INTEREST_ONLY installments of a synthetic book of active
+DAILY_RATE loans, each generated through some point in the past (a few
+loans never accrued).
+
+    python benchmarks/bench_accrual.py [--loans 100000] [--repeat 3]
+
+"per-loan"   = one loan at a time with Decimal amounts and date arithmetic,
+               the way the client generated the next installment
+"vectorized" = accrual.plan_accrual() as the accrual job uses it
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import accrual  # noqa: E402
+import schedule  # noqa: E402
+
+PRINCIPALS = ("10000.00", "20000.00", "25000.00", "50000.00", "100000.00", "200000.00")
+DAILY_RATES = (("100.00", "30"), ("120.00", "15"), ("150.00", "7"), ("100.00", "1"))
+
+AS_OF = date(2025, 1, 1)
+
+
+def make_loans(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    loans = []
+    for i in range(count):
+        rate, frequency = rng.choice(DAILY_RATES)
+        start = AS_OF - timedelta(days=rng.randrange(30, 400))
+        through = None
+        if rng.random() < 0.95:
+            # Generated up to some recent period
+            periods = (AS_OF - start).days // int(frequency) - rng.randrange(0, 4)
+            if periods > 0:
+                through = (start + timedelta(days=periods * int(frequency))).isoformat()
+        loans.append({
+            "id": f"loan-{i}",
+            "principal_amount": rng.choice(PRINCIPALS),
+            "daily_rate_per_lakh": rate,
+            "frequency": frequency,
+            "start_date": start.isoformat(),
+            "generated_through": through,
+        })
+    return loans
+
+
+def per_loan(loans, as_of: date):
+    planned, generated_through = {"loan_id": [], "due_date": [], "expected_amount": []}, {}
+    for loan in loans:
+        days = schedule.frequency_days(loan["frequency"])
+        amount = float(schedule._ceil(
+            Decimal(str(loan["principal_amount"])) / schedule.LAKH * Decimal(str(loan["daily_rate_per_lakh"])) * days
+        ))
+        due = date.fromisoformat(loan["generated_through"] or loan["start_date"]) + timedelta(days=days)
+        while due - timedelta(days=days) <= as_of:
+            planned["loan_id"].append(loan["id"])
+            planned["due_date"].append(due.isoformat())
+            planned["expected_amount"].append(amount)
+            generated_through[loan["id"]] = due.isoformat()
+            due += timedelta(days=days)
+    return planned, generated_through
+
+
+def timed(fn, loans, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(loans, AS_OF)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--loans", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    loans = make_loans(args.loans)
+    expected = per_loan(loans, AS_OF)
+    assert accrual.plan_accrual(loans, AS_OF) == expected, "vectorized plan differs from per-loan plan"
+    print(f"{args.loans} loans, {len(expected[0]['loan_id'])} installments for {len(expected[1])} loans")
+
+    slow = timed(per_loan, loans, args.repeat)
+    fast = timed(accrual.plan_accrual, loans, args.repeat)
+    print(f"per-loan:   {slow * 1000:8.1f} ms  ({slow / args.loans * 1e6:.2f} us/loan)")
+    print(f"vectorized: {fast * 1000:8.1f} ms  ({fast / args.loans * 1e6:.2f} us/loan)")
+    print(f"speedup:    {slow / fast:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
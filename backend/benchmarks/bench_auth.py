@@ -0,0 +1,64 @@
+"""Auth overhead benchmark: full JWT verification vs the verified-token cache.
+
+Replays a request stream in which each active user's dashboard fans out to
+several endpoints with the same bearer token, and times the auth step alone.
+
+    python benchmarks/bench_auth.py [--users 500] [--requests 200000] [--fanout 8]
+
+"verify" = jose.jwt.decode with signature verification on every request
+"cached" = auth.decode_access_token (cache hit after the first request per token)
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54329")
+os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "bench.bench.bench")
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+
+import auth  # noqa: E402
+
+
+def request_stream(tokens, requests, fanout, seed=3):
+    """Bursts of `fanout` requests per page load, users picked at random"""
+    rng = random.Random(seed)
+    stream = []
+    while len(stream) < requests:
+        stream.extend([rng.choice(tokens)] * fanout)
+    return stream[:requests]
+
+
+def run(stream, authenticate) -> float:
+    started = time.perf_counter()
+    for token in stream:
+        authenticate(token)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--fanout", type=int, default=8)
+    args = parser.parse_args()
+
+    tokens = [auth.create_access_token({"sub": f"user-{i}"}) for i in range(args.users)]
+    stream = request_stream(tokens, args.requests, args.fanout)
+
+    verify = run(stream, auth._verify_access_token)
+    auth.token_cache.clear()
+    cached = run(stream, auth.decode_access_token)
+
+    for name, elapsed in (("verify", verify), ("cached", cached)):
+        per_request = elapsed / len(stream)
+        print(f"{name}: {per_request * 1e6:7.2f} us/request  ({1 / per_request:>10,.0f} req/s per core on auth alone)")
+    print(f"speedup: {verify / cached:.1f}x  ({len(auth.token_cache._entries)} cached tokens)")
+
+
+if __name__ == "__main__":
+    main()
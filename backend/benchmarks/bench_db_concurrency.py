@@ -0,0 +1,142 @@
+"""Concurrency benchmark: sync Supabase client vs pooled async client.
+
+Starts a local PostgREST stand-in (fixed per-query latency, keep-alive
+HTTP/1.1) and drives it from N concurrent "request handlers" running on a
+single event loop, the same way uvicorn runs our async routes.
+
+    python benchmarks/bench_db_concurrency.py [--latency-ms 20] [--requests 2000]
+
+"before" = sync client called inside `async def` handlers (blocks the loop)
+"after"  = AsyncDatabase from database.py (awaited, pooled connections)
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings are read at import time; point them at the stand-in server
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54329")
+# create_client() only checks that the keys look like JWTs
+os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "bench.bench.bench")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from postgrest import SyncPostgrestClient  # noqa: E402
+import httpx  # noqa: E402
+from database import AsyncDatabase  # noqa: E402
+
+BODY = b'[{"id": "00000000-0000-0000-0000-000000000001", "status": "ACTIVE"}]'
+
+
+async def _handle(reader, writer, latency):
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            if length:
+                await reader.readexactly(length)
+            await asyncio.sleep(latency)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                b"Content-Length: " + str(len(BODY)).encode() + b"\r\n\r\n" + BODY
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def _serve_forever(port, latency):
+    async def serve():
+        server = await asyncio.start_server(
+            lambda r, w: _handle(r, w, latency), "127.0.0.1", port, backlog=1024
+        )
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+def start_stand_in(port, latency):
+    """Run the PostgREST stand-in in its own process (no GIL sharing with the client)"""
+    process = multiprocessing.Process(target=_serve_forever, args=(port, latency), daemon=True)
+    process.start()
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("PostgREST stand-in did not start")
+
+
+async def run_sync(base_url, clients, total):
+    db = SyncPostgrestClient(base_url, headers={"apiKey": "bench"})
+
+    async def handler():
+        # What every router did before: a blocking call inside async def
+        db.from_("loans").select("*").eq("user_id", "u").execute()
+
+    start = time.perf_counter()
+    await _drive(handler, clients, total)
+    elapsed = time.perf_counter() - start
+    db.session.close()
+    return elapsed
+
+
+async def run_async(base_url, clients, total):
+    db = AsyncDatabase(base_url, headers={"apiKey": "bench"}, timeout=httpx.Timeout(30.0))
+
+    async def handler():
+        await db.table("loans").select("*").eq("user_id", "u").execute()
+
+    start = time.perf_counter()
+    await _drive(handler, clients, total)
+    elapsed = time.perf_counter() - start
+    await db.aclose()
+    return elapsed
+
+
+async def _drive(handler, clients, total):
+    per_client = total // clients
+
+    async def client():
+        for _ in range(per_client):
+            await handler()
+
+    await asyncio.gather(*(client() for _ in range(clients)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=54329)
+    args = parser.parse_args()
+
+    stand_in = start_stand_in(args.port, args.latency_ms / 1000)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    print(f"PostgREST stand-in latency: {args.latency_ms:.0f} ms, {args.requests} requests per run")
+    print(f"{'clients':>8} {'before (req/s)':>16} {'after (req/s)':>15} {'speedup':>9}")
+    for clients in (50, 200):
+        before = asyncio.run(run_sync(base_url, clients, args.requests))
+        after = asyncio.run(run_async(base_url, clients, args.requests))
+        print(
+            f"{clients:>8} {args.requests / before:>16.1f} "
+            f"{args.requests / after:>15.1f} {before / after:>8.1f}x"
+        )
+    stand_in.terminate()
+
+
+if __name__ == "__main__":
+    main()
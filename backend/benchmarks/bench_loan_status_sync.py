@@ -0,0 +1,165 @@
+"""Loan status sync benchmark: per-loan loop vs set-based sync.
+
+Runs each implementation of POST /installments/sync-loan-statuses against an
+in-memory stand-in for PostgREST that counts round trips, and reports the
+network time they cost at a given per-request latency - the cost that
+dominates against a hosted database.
+
+    python benchmarks/bench_loan_status_sync.py [--loans 5000] [--latency-ms 20]
+
+"per-loan"  = the original loop (one installments query per loan, one update per change)
+"fallback"  = loan_status.sync_loan_statuses_fallback (paged reads, bulk updates)
+"rpc"       = loan_status.sync_loan_statuses (sync_loan_statuses() SQL function)
+"""
+import argparse
+import asyncio
+import copy
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54329")
+os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "bench.bench.bench")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+import loan_status  # noqa: E402
+
+USER_ID = "user-1"
+
+
+class Response:
+    def __init__(self, data):
+        self.data = data
+
+
+class Query:
+    """Just enough of the PostgREST query builder for the code under test"""
+
+    def __init__(self, db, table):
+        self.db, self.table, self.filters, self.values = db, table, [], None
+        self.window = None
+
+    def select(self, *_):
+        return self
+
+    def update(self, values):
+        self.values = values
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row[column] == value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row[column] in values)
+        return self
+
+    def order(self, *_, **__):
+        return self
+
+    def range(self, start, end):
+        self.window = (start, end + 1)
+        return self
+
+    async def execute(self):
+        await self.db.round_trip()
+        rows = [row for row in self.db.tables[self.table] if all(f(row) for f in self.filters)]
+        if self.values is not None:
+            for row in rows:
+                row.update(self.values)
+        elif self.window:
+            rows = rows[self.window[0]:self.window[1]]
+        return Response([dict(row) for row in rows])
+
+
+class RpcCall:
+    def __init__(self, db):
+        self.db = db
+
+    async def execute(self):
+        # What the SQL function does, in one round trip
+        await self.db.round_trip()
+        tables = self.db.tables
+        to_complete, to_reactivate = loan_status.status_changes(tables["loans"], tables["installments"])
+        by_id = {loan["id"]: loan for loan in tables["loans"]}
+        for loan_id in to_complete:
+            by_id[loan_id]["status"] = "COMPLETED"
+        for loan_id in to_reactivate:
+            by_id[loan_id]["status"] = "ACTIVE"
+        return Response(len(to_complete) + len(to_reactivate))
+
+
+class FakeDatabase:
+    def __init__(self, tables):
+        self.tables = tables
+        self.round_trips = 0
+
+    async def round_trip(self):
+        self.round_trips += 1
+
+    def table(self, name):
+        return Query(self, name)
+
+    def rpc(self, name, params):
+        return RpcCall(self)
+
+
+async def per_loan_sync(db, user_id):
+    """The original implementation of the endpoint"""
+    loans_response = await db.table("loans").select("*").eq("user_id", user_id).execute()
+    updated_count = 0
+    for loan in loans_response.data:
+        loan_id = loan.get("id")
+        current_status = loan.get("status")
+        installments = await db.table("installments").select("*").eq("loan_id", loan_id).execute()
+        if installments.data:
+            all_paid = all(inst.get("status") == "PAID" for inst in installments.data)
+            if all_paid and current_status != "COMPLETED":
+                await db.table("loans").update({"status": "COMPLETED"}).eq("id", loan_id).execute()
+                updated_count += 1
+            elif not all_paid and current_status == "COMPLETED":
+                await db.table("loans").update({"status": "ACTIVE"}).eq("id", loan_id).execute()
+                updated_count += 1
+    return updated_count
+
+
+def make_tables(count, seed=11):
+    rng = random.Random(seed)
+    loans, installments = [], []
+    for i in range(count):
+        loan_id = f"loan-{i}"
+        loans.append({"id": loan_id, "user_id": USER_ID, "status": rng.choice(("ACTIVE", "ACTIVE", "COMPLETED"))})
+        paid_share = rng.choice((0.0, 0.5, 1.0))
+        for _ in range(rng.choice((0, 4, 10))):
+            status = "PAID" if rng.random() < paid_share else "PENDING"
+            installments.append({"loan_id": loan_id, "user_id": USER_ID, "status": status})
+    return {"loans": loans, "installments": installments}
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--loans", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    tables = make_tables(args.loans)
+    print(f"{args.loans} loans, {len(tables['installments'])} installments, {args.latency_ms:g} ms per round trip")
+
+    runs = (
+        ("per-loan", per_loan_sync),
+        ("fallback", loan_status.sync_loan_statuses_fallback),
+        ("rpc", loan_status.sync_loan_statuses),
+    )
+    for name, sync in runs:
+        db = FakeDatabase(copy.deepcopy(tables))
+        updated = await sync(db, USER_ID)
+        network = db.round_trips * args.latency_ms / 1000
+        print(f"{name:9} updated {updated:5}  round trips {db.round_trips:6}  network {network:8.2f} s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""Schedule generation benchmark: memoized templates vs building every loan from scratch.
+
+Generates installment schedules for a synthetic book of loans drawn from the
+handful of principal / rate / tenure combinations a lender actually offers.
+
+    python benchmarks/bench_schedule.py [--loans 10000] [--repeat 5]
+
+"cold"     = schedule_template.__wrapped__ (no memoization, every loan computed)
+"memoized" = build_schedule() as POST /loans uses it
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import schedule  # noqa: E402
+
+PRINCIPALS = (10000, 20000, 25000, 50000, 100000, 200000)
+TOTAL_RATE_TERMS = ((1.2, 10, "7"), (1.2, 12, "30"), (1.3, 20, "7"), (1.25, 4, "15"), (1.2, 70, "1"))
+DAILY_RATES = ((100, "30"), (120, "15"), (150, "7"))
+
+
+def make_loans(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    loans = []
+    for i in range(count):
+        loan = {
+            "client_name": f"Client {i}",
+            "principal_amount": rng.choice(PRINCIPALS),
+            "start_date": (start + timedelta(days=rng.randrange(365))).isoformat(),
+        }
+        if rng.random() < 0.7:
+            multiplier, tenure, frequency = rng.choice(TOTAL_RATE_TERMS)
+            loan.update(type="TOTAL_RATE", total_rate_multiplier=multiplier, tenure=tenure, frequency=frequency)
+        else:
+            rate, frequency = rng.choice(DAILY_RATES)
+            loan.update(type="DAILY_RATE", daily_rate_per_lakh=rate, frequency=frequency)
+        loans.append((loan, rng.random() < 0.2))
+    return loans
+
+
+def run(loans) -> float:
+    started = time.perf_counter()
+    for loan, advanced in loans:
+        schedule.build_schedule(loan, advanced=advanced)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--loans", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    loans = make_loans(args.loans)
+    installments = sum(len(schedule.build_schedule(loan, advanced=advanced)[0]) for loan, advanced in loans)
+    print(f"{args.loans} loans, {installments} installments")
+
+    memoized = schedule.schedule_template
+    schedule.schedule_template = memoized.__wrapped__
+    try:
+        cold = min(run(loans) for _ in range(args.repeat))
+    finally:
+        schedule.schedule_template = memoized
+
+    memoized.cache_clear()
+    warm = min(run(loans) for _ in range(args.repeat))
+    info = memoized.cache_info()
+
+    print(f"cold:     {cold * 1000:8.1f} ms  ({cold / args.loans * 1e6:.1f} us/loan)")
+    print(f"memoized: {warm * 1000:8.1f} ms  ({warm / args.loans * 1e6:.1f} us/loan)  "
+          f"{info.currsize} distinct schedules, {info.hits} hits / {info.misses} misses")
+    print(f"speedup:  {cold / warm:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
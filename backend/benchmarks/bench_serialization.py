@@ -0,0 +1,95 @@
+"""List response serialization benchmark: per-row models + FastAPI vs json_response.
+
+Renders one page of synthetic transaction rows, shaped like PostgREST
+returns them, to JSON bytes the way GET /transactions used to and the way it
+does now.
+
+    python benchmarks/bench_serialization.py [--rows 5000] [--repeat 5]
+
+"models"   = TransactionResponse(**row) per row in a TransactionPage, then
+             FastAPI's response_model validation / dump and JSONResponse
+             (stdlib json)
+"one-pass" = serialization.json_response (cached TypeAdapter, orjson)
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+
+import serialization  # noqa: E402
+from schemas import TransactionPage, TransactionResponse  # noqa: E402
+
+CATEGORIES = ("Loan Disbursement", "Installment Payment", "Capital", "Expense")
+
+
+def make_rows(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(count):
+        when = start + timedelta(minutes=rng.randrange(0, 500000))
+        rows.append({
+            "id": f"00000000-0000-4000-8000-{i:012d}",
+            "user_id": "11111111-1111-4111-8111-111111111111",
+            "date": when.isoformat(),
+            "amount": round(rng.uniform(100, 100000), 2),
+            "type": rng.choice(("CREDIT", "DEBIT")),
+            "category": rng.choice(CATEGORIES),
+            "description": f"Payment for loan {rng.randrange(1000)}",
+            "related_entity_id": None,
+            "created_at": when.isoformat(),
+        })
+    return rows
+
+
+RESPONSE_FIELD = create_model_field(name="Response_get_transactions", type_=TransactionPage, mode="serialization")
+
+
+def models(rows) -> bytes:
+    page = TransactionPage(items=[TransactionResponse(**txn) for txn in rows], next_cursor="next")
+    content = asyncio.run(serialize_response(field=RESPONSE_FIELD, response_content=page))
+    return JSONResponse(content).body
+
+
+def one_pass(rows) -> bytes:
+    return serialization.json_response(TransactionPage, {"items": rows, "next_cursor": "next"}).body
+
+
+def timed(fn, rows, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(rows)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    assert json.loads(models(rows)) == json.loads(one_pass(rows)), "responses differ"
+
+    slow = timed(models, rows, args.repeat)
+    fast = timed(one_pass, rows, args.repeat)
+    print(f"{args.rows} transaction rows")
+    print(f"models:   {slow * 1000:8.1f} ms  ({slow / args.rows * 1e6:.2f} us/row)")
+    print(f"one-pass: {fast * 1000:8.1f} ms  ({fast / args.rows * 1e6:.2f} us/row)")
+    print(f"speedup:  {slow / fast:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
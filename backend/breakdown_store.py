@@ -0,0 +1,124 @@
+"""Incremental maintenance of the investment_breakdown table.
+
+With migrations/add_investment_breakdown_maintenance.sql applied, a trigger
+on loans keeps every loan's row current and `refresh_investment_breakdown`
+only repairs drift. Without it, the rows are computed with the shared
+calculator (reports / analytics.compute_investment_breakdown) and diffed
+against the stored ones: only loans whose values changed are written, rows
+of loans that no longer exist are deleted, and unchanged rows are left alone.
+"""
+import logging
+from typing import Any, Dict, List, Tuple, Union
+from postgrest.exceptions import APIError
+from supabase import Client
+from database import AsyncDatabase, fetch_all, fetch_all_sync
+import reports
+
+STORED_FIELDS = ("user_id",) + reports.BREAKDOWN_FIELDS
+
+# Rows per insert/upsert request, to stay under payload limits
+CHUNK_SIZE = 50
+
+
+def _comparable(field: str, value: Any) -> Any:
+    """Value as the DECIMAL(15, 2) / DATE / TEXT column would store it"""
+    if field in reports.BREAKDOWN_NUMERIC_FIELDS:
+        return round(float(value or 0), 2)
+    return None if value is None else str(value)
+
+
+def diff_breakdown(
+    user_id: str,
+    entries: List[Dict[str, Any]],
+    stored: List[dict]
+) -> Tuple[List[dict], List[dict], List[str]]:
+    """Writes that turn the stored rows into `entries`
+
+    Returns (rows to update, each with its id; rows to insert; ids to delete).
+    """
+    existing: Dict[str, dict] = {}
+    deletes = []
+    for row in stored:
+        loan_id = str(row.get("loan_id"))
+        if loan_id in existing:
+            deletes.append(row["id"])  # Duplicate from an older full refresh
+        else:
+            existing[loan_id] = row
+
+    updates, inserts = [], []
+    for entry in entries:
+        record = {**{field: entry.get(field) for field in reports.BREAKDOWN_FIELDS}, "user_id": user_id}
+        for field in reports.BREAKDOWN_NUMERIC_FIELDS:
+            record[field] = _comparable(field, record[field])
+        row = existing.pop(str(entry.get("loan_id")), None)
+        if row is None:
+            inserts.append(record)
+        elif any(_comparable(f, row.get(f)) != _comparable(f, record[f]) for f in STORED_FIELDS):
+            updates.append({**record, "id": row["id"]})
+
+    deletes.extend(row["id"] for row in existing.values())
+    return updates, inserts, deletes
+
+
+def _chunks(rows: List[dict]):
+    for i in range(0, len(rows), CHUNK_SIZE):
+        yield rows[i:i + CHUNK_SIZE]
+
+
+def _stored_query(db: Union[AsyncDatabase, Client], user_id: str):
+    return db.table("investment_breakdown").select(", ".join(("id",) + STORED_FIELDS)) \
+        .eq("user_id", user_id).order("updated_at", desc=True).order("id")
+
+
+def plan_writes(
+    db: Union[AsyncDatabase, Client],
+    user_id: str,
+    entries: List[Dict[str, Any]],
+    stored: List[dict]
+) -> Tuple[list, int]:
+    """Requests (unexecuted query builders) that apply diff_breakdown, and the rows they write
+
+    The sync and async clients build the same queries, so both refresh paths
+    share this and differ only in how they execute them.
+    """
+    updates, inserts, deletes = diff_breakdown(user_id, entries, stored)
+    writes = [db.table("investment_breakdown").upsert(chunk, on_conflict="id") for chunk in _chunks(updates)]
+    writes += [db.table("investment_breakdown").insert(chunk) for chunk in _chunks(inserts)]
+    if deletes:
+        writes.append(db.table("investment_breakdown").delete().in_("id", deletes))
+    return writes, len(updates) + len(inserts)
+
+
+async def refresh_breakdown(db: AsyncDatabase, user_id: str) -> int:
+    """Bring the user's investment_breakdown rows up to date; returns rows written"""
+    try:
+        response = await db.rpc("refresh_investment_breakdown", {"p_user_id": user_id}).execute()
+        return int(response.data or 0)
+    except APIError as e:
+        logging.warning(f"refresh_investment_breakdown unavailable, diffing in Python: {e.message}")
+
+    entries = await reports.get_investment_breakdown(db, user_id)
+    stored = await fetch_all(lambda: _stored_query(db, user_id))
+    writes, written = plan_writes(db, user_id, entries, stored)
+    for query in writes:
+        await query.execute()
+    return written
+
+
+def refresh_breakdown_sync(db: Client, user_id: str, entries: List[Dict[str, Any]]) -> int:
+    """refresh_breakdown for the Google Sheets background sync
+
+    `entries` (already computed by the sync) are used for the fallback and
+    must cover every loan: stored rows of loans missing from them are deleted.
+    """
+    try:
+        response = db.rpc("refresh_investment_breakdown", {"p_user_id": user_id}).execute()
+        return int(response.data or 0)
+    except APIError as e:
+        logging.warning(f"refresh_investment_breakdown unavailable, diffing in Python: {e.message}")
+
+    stored = fetch_all_sync(lambda: _stored_query(db, user_id))
+    writes, written = plan_writes(db, user_id, entries, stored)
+    for query in writes:
+        query.execute()
+    return written
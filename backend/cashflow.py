@@ -0,0 +1,296 @@
+"""Cash-flow time series (GET /transactions/summary/cash-flow).
+
+CREDIT and DEBIT totals per day, week or month over a date range, with the
+running cash-in-hand balance (all CREDITs - all DEBITs up to the end of each
+period).
+
+Each user gets an index of per-day totals in two Fenwick trees (prefix sums
+that also take point updates) over the sorted days that have transactions,
+amounts in cents. The total of any date range is a bisect and two prefix
+lookups, O(log n), so a series of k periods costs O(k log n) whatever the
+number of transactions; an outlier date costs one slot, not a dense range.
+
+The index is built from every transaction once and cached per user. When the
+user's data version changes it is not rebuilt: the transactions changed
+since its change-feed cursor (migrations/add_cash_flow_index.sql) are applied
+as point updates. Without the migration it is rebuilt after each change.
+"""
+import asyncio
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from postgrest.exceptions import APIError
+from database import AsyncDatabase, fetch_all
+from data_versions import VersionedCache, data_version
+from config import settings
+
+GRANULARITIES = ("daily", "weekly", "monthly")
+
+# Periods returned when no start date is given
+DEFAULT_PERIODS = 30
+
+
+class _Fenwick:
+    """Prefix sums over a fixed number of slots with O(log n) updates"""
+
+    def __init__(self, values: List[int]):
+        self.tree = [0] + list(values)
+        for i in range(1, len(self.tree)):
+            parent = i + (i & -i)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[i]
+
+    def add(self, slot: int, delta: int):
+        i = slot + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, count: int) -> int:
+        """Sum of the first `count` slots"""
+        total = 0
+        i = min(count, len(self.tree) - 1)
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+
+class CashFlowIndex:
+    """Per-day CREDIT / DEBIT totals of one user's transactions"""
+
+    def __init__(self, rows: List[dict] = ()):
+        # Sorted day ordinals that have (or had) transactions, and their totals
+        self.days: List[int] = []
+        self.credit_days: List[int] = []
+        self.debit_days: List[int] = []
+        self._credit = _Fenwick([])
+        self._debit = _Fenwick([])
+        # Contribution of each transaction: id -> (day ordinal, is_credit, cents)
+        self.rows: Dict[str, Tuple[int, bool, int]] = {}
+        # Change-feed position (txid, seq), None when the feed is unavailable
+        self.cursor: Optional[Tuple[str, int]] = None
+        self.lock = asyncio.Lock()
+        totals: Dict[int, List[int]] = {}
+        for entry in (_entry(row) for row in rows):
+            if entry:
+                row_id, day, is_credit, cents = entry
+                self.rows[row_id] = (day, is_credit, cents)
+                totals.setdefault(day, [0, 0])[0 if is_credit else 1] += cents
+        self.days = sorted(totals)
+        self.credit_days = [totals[day][0] for day in self.days]
+        self.debit_days = [totals[day][1] for day in self.days]
+        self._rebuild()
+
+    def _slot(self, day: int) -> int:
+        """Slot of `day`, inserted (an O(n) rebuild) the first time it is seen"""
+        slot = bisect_left(self.days, day)
+        if slot == len(self.days) or self.days[slot] != day:
+            self.days.insert(slot, day)
+            self.credit_days.insert(slot, 0)
+            self.debit_days.insert(slot, 0)
+            self._rebuild()
+        return slot
+
+    def _rebuild(self):
+        self._credit = _Fenwick(self.credit_days)
+        self._debit = _Fenwick(self.debit_days)
+
+    def _add(self, day: int, is_credit: bool, cents: int):
+        slot = self._slot(day)
+        (self.credit_days if is_credit else self.debit_days)[slot] += cents
+        (self._credit if is_credit else self._debit).add(slot, cents)
+
+    def remove(self, row_id: str):
+        old = self.rows.pop(row_id, None)
+        if old:
+            day, is_credit, cents = old
+            self._add(day, is_credit, -cents)
+
+    def upsert(self, row: dict):
+        """Apply an inserted or updated transaction (idempotent)"""
+        self.remove(str(row["id"]))
+        entry = _entry(row)
+        if entry:
+            row_id, day, is_credit, cents = entry
+            self.rows[row_id] = (day, is_credit, cents)
+            self._add(day, is_credit, cents)
+
+    def through(self, day: date) -> Tuple[int, int]:
+        """(credit, debit) cents of every transaction on or before `day`"""
+        count = bisect_right(self.days, day.toordinal())
+        return self._credit.prefix(count), self._debit.prefix(count)
+
+
+def _day(value: Any) -> Optional[int]:
+    """Day ordinal of a date / timestamp; years past 9999 count as date.max"""
+    text = str(value)
+    try:
+        return date.fromisoformat(text[:10]).toordinal()
+    except ValueError:
+        pass
+    year = text.split("-", 1)[0]
+    if year.isdigit() and int(year) > 9999:
+        return date.max.toordinal()
+    logging.warning(f"Unreadable transaction date {text!r}, left out of the cash-flow index")
+    return None
+
+
+def _entry(row: dict) -> Optional[Tuple[str, int, bool, int]]:
+    if row.get("type") not in ("CREDIT", "DEBIT") or not row.get("date"):
+        return None
+    day = _day(row["date"])
+    if day is None:
+        return None
+    return str(row["id"]), day, row["type"] == "CREDIT", round(float(row.get("amount") or 0) * 100)
+
+
+def periods(start: date, end: date, granularity: str) -> List[Tuple[date, date]]:
+    """Calendar days, ISO weeks or months overlapping start..end, clipped to it"""
+    result = []
+    current = start
+    while current <= end:
+        # Clipped before stepping, so ranges ending at date.max don't overflow
+        remaining = (end - current).days
+        if granularity == "daily":
+            last = current
+        elif granularity == "weekly":
+            last = current + timedelta(days=min(6 - current.weekday(), remaining))
+        elif current.year == date.max.year and current.month == 12:
+            last = end
+        else:
+            following = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+            last = following - timedelta(days=1)
+        last = min(last, end)
+        result.append((current, last))
+        if last == end:
+            break
+        current = last + timedelta(days=1)
+    return result
+
+
+def count_periods(start: date, end: date, granularity: str) -> int:
+    if granularity == "daily":
+        return (end - start).days + 1
+    if granularity == "weekly":
+        return ((end - timedelta(days=end.weekday())) - (start - timedelta(days=start.weekday()))).days // 7 + 1
+    return (end.year - start.year) * 12 + end.month - start.month + 1
+
+
+def default_start(end: date, granularity: str) -> date:
+    """Start of the DEFAULT_PERIODS periods ending with the one containing `end`"""
+    if granularity == "daily":
+        return end - timedelta(days=DEFAULT_PERIODS - 1)
+    if granularity == "weekly":
+        return end - timedelta(days=end.weekday() + 7 * (DEFAULT_PERIODS - 1))
+    months = end.year * 12 + end.month - 1 - (DEFAULT_PERIODS - 1)
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def build_series(index: CashFlowIndex, start: date, end: date, granularity: str) -> Dict[str, Any]:
+    """CREDIT / DEBIT per period of start..end and the balance at each period's end"""
+    opening_credit, opening_debit = index.through(start - timedelta(days=1)) if start > date.min else (0, 0)
+    previous = (opening_credit, opening_debit)
+    points = []
+    for first, last in periods(start, end, granularity):
+        credit, debit = index.through(last)
+        period_credit, period_debit = credit - previous[0], debit - previous[1]
+        points.append({
+            "period_start": first.isoformat(),
+            "period_end": last.isoformat(),
+            "credit": period_credit / 100,
+            "debit": period_debit / 100,
+            "net": (period_credit - period_debit) / 100,
+            "balance": (credit - debit) / 100,
+        })
+        previous = (credit, debit)
+
+    credit, debit = previous[0] - opening_credit, previous[1] - opening_debit
+    return {
+        "granularity": granularity,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "opening_balance": (opening_credit - opening_debit) / 100,
+        "credit": credit / 100,
+        "debit": debit / 100,
+        "net": (credit - debit) / 100,
+        "closing_balance": (previous[0] - previous[1]) / 100,
+        "points": points,
+    }
+
+
+async def _build_index(db: AsyncDatabase, user_id: str) -> CashFlowIndex:
+    """Load every transaction, positioned at the change-feed head taken first"""
+    head = None
+    try:
+        response = await db.rpc("change_log_head", {}).execute()
+        head = (str(response.data), 0)
+    except APIError as e:
+        logging.warning(f"change_log_head unavailable, cash-flow index will be rebuilt on change: {e.message}")
+
+    rows = await fetch_all(
+        lambda: db.table("transactions").select("id, date, amount, type").eq("user_id", user_id).order("id")
+    )
+    index = CashFlowIndex(rows)
+    index.cursor = head
+    return index
+
+
+async def _catch_up(db: AsyncDatabase, user_id: str, index: CashFlowIndex) -> bool:
+    """Apply transactions changed since the index's cursor; False if some are still held back"""
+    while True:
+        txid, seq = index.cursor
+        response = await db.rpc("transaction_changes_since", {
+            "p_user_id": user_id,
+            "p_txid": txid,
+            "p_seq": seq,
+            "p_limit": settings.page_size_max,
+        }).execute()
+        result = response.data or {}
+        changes = result.get("changes") or []
+        for change in changes:
+            if change["deleted"]:
+                index.remove(str(change["row_id"]))
+            else:
+                index.upsert({**change, "id": change["row_id"]})
+            index.cursor = (str(change["txid"]), int(change["seq"]))
+        if len(changes) < settings.page_size_max:
+            return not result.get("pending")
+
+
+_index_cache = VersionedCache(settings.report_cache_size)
+
+
+async def get_cash_flow_index(db: AsyncDatabase, user_id: str) -> CashFlowIndex:
+    """The user's index, brought up to date with their data version"""
+    version = data_version(user_id)
+    entry = _index_cache.get_any(user_id)
+    if entry is None:
+        index = await _build_index(db, user_id)
+        _index_cache.put(user_id, index, version=version)
+        return index
+
+    cached_version, index = entry
+    if cached_version == version:
+        return index
+
+    async with index.lock:
+        current = True
+        if index.cursor is not None:
+            try:
+                current = await _catch_up(db, user_id, index)
+            except APIError as e:
+                logging.warning(f"transaction_changes_since unavailable, rebuilding cash-flow index: {e.message}")
+                index.cursor = None
+        if index.cursor is None:
+            index = await _build_index(db, user_id)
+        # Changes not visible yet leave the entry stale, so the next read retries
+        _index_cache.put(user_id, index, version=version if current else cached_version)
+    return index
+
+
+async def get_cash_flow(db: AsyncDatabase, user_id: str, start: date, end: date,
+                        granularity: str) -> Dict[str, Any]:
+    index = await get_cash_flow_index(db, user_id)
+    return build_series(index, start, end, granularity)
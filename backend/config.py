@@ -9,11 +9,39 @@ class Settings(BaseSettings):
     supabase_url: str
     supabase_key: str
     supabase_service_key: str
-    
+
+    # Async database client (connection pool and per-call timeouts, in seconds)
+    db_pool_max_connections: int = 100
+    db_pool_max_keepalive: int = 50
+    db_pool_keepalive_expiry: float = 30.0
+    db_request_timeout: float = 15.0
+    db_connect_timeout: float = 5.0
+
+    # Cursor pagination for list endpoints (PostgREST caps responses at 1000 rows)
+    page_size_default: int = 200
+    page_size_max: int = 1000
+
+    # CSV transaction import
+    import_chunk_size: int = 500
+    import_max_reported_errors: int = 1000
+
     # JWT Configuration
     secret_key: str
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+
+    # Verified-token cache (entries also expire at the token's exp)
+    token_cache_size: int = 10000
+    token_cache_ttl_seconds: float = 300.0
+
+    # Per-user dashboard report caches (entries; dropped on any write)
+    report_cache_size: int = 1000
+
+    # Most periods in one cash-flow series
+    cash_flow_max_points: int = 1000
+
+    # Longest collections forecast, in periods (days or weeks)
+    forecast_max_periods: int = 366
     
     # API Configuration
     api_host: str = "0.0.0.0"
@@ -31,6 +59,18 @@ class Settings(BaseSettings):
     # Google Sheets Integration
     google_sheets_credentials_json: str | None = None
     google_spreadsheet_id: str | None = None
+
+    # Columnar monthly archive snapshots (local path, or a mounted bucket)
+    archive_dir: str = "archives"
+
+    # Sync job worker threads (separate from the request threadpool)
+    sync_workers: int = 2
+
+    # DAILY_RATE interest accrual job (hours between runs; 0 disables it)
+    interest_accrual_interval_hours: float = 24.0
+
+    # Overdue status job (hours between runs; 0 disables it)
+    overdue_check_interval_hours: float = 1.0
     
     @property
     def cors_origins_list(self) -> List[str]:
@@ -0,0 +1,207 @@
+"""Streaming CSV import of ledger transactions.
+
+The upload is parsed one record at a time and valid rows are inserted in
+fixed-size chunks, so memory stays bounded by the chunk size however large
+the file is. Duplicates are detected by `transaction_hash`, which matches
+the `import_hash` column maintained by migrations/add_transaction_import_hash.sql.
+"""
+import codecs
+import csv
+import hashlib
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from postgrest.types import ReturnMethod
+from pydantic import ValidationError
+from config import settings
+from database import AsyncDatabase
+from schemas import TransactionCreate
+
+# Header names accepted for each field (case-insensitive); files without a
+# recognised header are read positionally in this order.
+COLUMNS = ("date", "amount", "type", "category", "description")
+
+DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%Y/%m/%d")
+
+
+def transaction_hash(date_str: str, amount: Decimal, txn_type: str, description: str) -> str:
+    """Duplicate-detection key over (date, amount, type, description)
+
+    Must stay in step with public.transaction_import_hash() in SQL.
+    """
+    key = f"{date_str[:10]}|{amount:.2f}|{txn_type}|{description.strip(' ').lower()}"
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def parse_amount(value: str) -> Decimal:
+    try:
+        amount = Decimal(value.replace("₹", "").replace(",", "").strip())
+    except InvalidOperation:
+        raise ValueError(f'Invalid amount "{value}"')
+    if not amount.is_finite() or amount <= 0:
+        raise ValueError(f'Invalid amount "{value}"')
+    return amount.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def parse_date(value: str) -> str:
+    """Parse the date formats the ledger accepts to an ISO timestamp (UTC)"""
+    value = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).replace(tzinfo=timezone.utc).isoformat()
+        except ValueError:
+            continue
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid date format "{value}"')
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+
+def parse_row(values: Dict[str, str]) -> Tuple[Dict[str, Any], str]:
+    """Validate one CSV record; returns the insert payload and its hash"""
+    date_value = values.get("date", "").strip()
+    amount_value = values.get("amount", "").strip()
+    type_value = values.get("type", "").strip().upper()
+
+    if not date_value or not amount_value or not type_value:
+        raise ValueError("Missing required fields")
+
+    amount = parse_amount(amount_value)
+    date_str = parse_date(date_value)
+
+    transaction = TransactionCreate(
+        date=date_str,
+        amount=float(amount),
+        type=type_value,
+        category=values.get("category", "").strip() or "Imported",
+        description=values.get("description", "").strip() or "CSV Import"
+    )
+    txn_hash = transaction_hash(date_str, amount, transaction.type.value, transaction.description)
+    return transaction.model_dump(mode="json"), txn_hash
+
+
+def iter_lines(upload, encoding: str = "utf-8-sig", chunk_size: int = 64 * 1024) -> Iterator[str]:
+    """Decode a binary file object into lines (endings kept), one read at a time"""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ""
+    while True:
+        chunk = upload.read(chunk_size)
+        pending += decoder.decode(chunk, final=not chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+        if not chunk:
+            if pending:
+                yield pending
+            return
+
+
+def iter_records(upload) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Yield (line number, record) from a binary file object, one record at a time"""
+    reader = csv.reader(iter_lines(upload))
+    columns: Optional[List[str]] = None
+
+    for values in reader:
+        if not any(value.strip() for value in values):
+            continue
+        if columns is None:
+            header = [value.strip().lower() for value in values]
+            columns = header if {"date", "amount", "type"} <= set(header) else list(COLUMNS)
+            if columns is header:
+                continue
+        yield reader.line_num, dict(zip(columns, values))
+
+
+class ImportTally:
+    """Per-row outcome of an import; keeps at most `max_errors` error entries"""
+
+    def __init__(self, max_errors: int):
+        self.total_rows = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.max_errors = max_errors
+
+    def error(self, line: int, message: str, duplicate: bool = False):
+        if duplicate:
+            self.duplicates += 1
+        else:
+            self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "message": message})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "total_rows": self.total_rows,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda error: error["line"]),
+            "errors_truncated": self.duplicates + self.failed > len(self.errors),
+        }
+
+
+async def _insert_chunk(db: AsyncDatabase, user_id: str, chunk: List[Tuple[int, dict, str]], report: ImportTally):
+    """Insert one chunk, skipping rows whose hash already exists for the user"""
+    try:
+        existing = await db.table("transactions").select("import_hash") \
+            .eq("user_id", user_id) \
+            .in_("import_hash", [txn_hash for _, _, txn_hash in chunk]) \
+            .execute()
+        existing_hashes = {row["import_hash"] for row in existing.data}
+
+        rows = []
+        for line, payload, txn_hash in chunk:
+            if txn_hash in existing_hashes:
+                report.error(line, "Duplicate of an existing transaction", duplicate=True)
+            else:
+                rows.append({**payload, "user_id": user_id})
+
+        if rows:
+            await db.table("transactions").insert(rows, returning=ReturnMethod.minimal).execute()
+            report.inserted += len(rows)
+
+    except Exception as e:
+        for line, _, _ in chunk:
+            report.error(line, f"Failed to insert: {str(e)}")
+
+
+async def import_transactions(db: AsyncDatabase, user_id: str, upload) -> Dict[str, Any]:
+    """Parse, validate, de-duplicate and insert transactions from a CSV file object"""
+    report = ImportTally(settings.import_max_reported_errors)
+    seen_hashes: Dict[str, int] = {}
+    chunk: List[Tuple[int, dict, str]] = []
+
+    try:
+        for line, values in iter_records(upload):
+            report.total_rows += 1
+            try:
+                payload, txn_hash = parse_row(values)
+            except ValidationError as e:
+                first = e.errors()[0]
+                report.error(line, f"{'.'.join(str(p) for p in first['loc'])}: {first['msg']}")
+                continue
+            except ValueError as e:
+                report.error(line, str(e))
+                continue
+
+            if txn_hash in seen_hashes:
+                report.error(line, f"Duplicate of line {seen_hashes[txn_hash]}", duplicate=True)
+                continue
+            seen_hashes[txn_hash] = line
+
+            chunk.append((line, payload, txn_hash))
+            if len(chunk) >= settings.import_chunk_size:
+                await _insert_chunk(db, user_id, chunk, report)
+                chunk = []
+    except (UnicodeDecodeError, csv.Error) as e:
+        report.error(report.total_rows + 1, f"Could not read CSV: {str(e)}")
+
+    if chunk:
+        await _insert_chunk(db, user_id, chunk, report)
+
+    return report.as_dict()
@@ -0,0 +1,164 @@
+"""Per-user data versions and conditional GET (ETag / If-None-Match).
+
+Every user has an in-process version number that is bumped after any
+mutating request to the data routers. GET responses from those routers
+carry an ETag derived from the version, so a client revalidating with
+`If-None-Match` gets a 304 without the route - or the database - running.
+
+Versions live in this process (the API runs as a single uvicorn process);
+a restart changes every ETag, which only costs one full refetch. Code that
+changes a user's data outside a request (background jobs) must call
+`bump_data_version`.
+"""
+import hashlib
+import uuid
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, Hashable, Optional, Tuple
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+from auth import decode_access_token
+
+# GET responses under these prefixes are versioned
+VERSIONED_PREFIXES = ("/loans", "/installments", "/transactions", "/investment-breakdown")
+
+# Non-GET requests under these prefixes bump the user's version
+MUTATING_PREFIXES = VERSIONED_PREFIXES + ("/sync",)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Distinguishes versions issued by different runs of the process
+_BOOT_ID = uuid.uuid4().hex[:8]
+
+_versions: Dict[str, int] = {}
+
+
+def data_version(user_id: str) -> int:
+    return _versions.get(user_id, 0)
+
+
+def bump_data_version(user_id: str):
+    """Invalidate every ETag issued for the user's data"""
+    _versions[user_id] = _versions.get(user_id, 0) + 1
+
+
+class VersionedCache:
+    """Bounded LRU of per-user derived values (reports, indexes)
+
+    An entry is only returned while the user's data version is the one it was
+    computed at, so any write that bumps the version invalidates it. Only
+    touched from the event loop.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[int, Any]]" = OrderedDict()
+
+    def get(self, user_id: str, key: Hashable = None) -> Optional[Any]:
+        entry = self._entries.get((user_id, key))
+        if entry is None:
+            return None
+        version, value = entry
+        if version != data_version(user_id):
+            del self._entries[(user_id, key)]
+            return None
+        self._entries.move_to_end((user_id, key))
+        return value
+
+    def get_any(self, user_id: str, key: Hashable = None) -> Optional[Tuple[int, Any]]:
+        """(version, value) whatever the version, for values that can be brought up to date"""
+        entry = self._entries.get((user_id, key))
+        if entry is not None:
+            self._entries.move_to_end((user_id, key))
+        return entry
+
+    def put(self, user_id: str, value: Any, key: Hashable = None, version: Optional[int] = None):
+        """Store `value`; pass the version read before computing it, so a write
+        that lands while it was being computed leaves it stale"""
+        if self.max_size <= 0:
+            return
+        self._entries[(user_id, key)] = (data_version(user_id) if version is None else version, value)
+        self._entries.move_to_end((user_id, key))
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+def etag_for(user_id: str, path: str, query: str) -> str:
+    """Weak ETag of a versioned GET
+
+    Includes today's date because overdue figures change at midnight with no
+    write, and the URL so a tag is never valid for another resource.
+    """
+    key = f"{_BOOT_ID}|{user_id}|{data_version(user_id)}|{date.today().isoformat()}|{path}?{query}"
+    return f'W/"{hashlib.blake2b(key.encode(), digest_size=12).hexdigest()}"'
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison: W/"x" matches "x"
+    return "*" in tags or etag in tags or etag[2:] in tags
+
+
+def _user_id(headers: Headers) -> Optional[str]:
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return decode_access_token(token).user_id
+    except HTTPException:
+        return None  # The route itself answers 401
+
+
+class ConditionalGetMiddleware:
+    """ASGI middleware adding ETags to versioned GETs and bumping versions on writes"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(MUTATING_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        user_id = _user_id(headers)
+        if user_id is None:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        if method not in SAFE_METHODS:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                # Even a failed write may have changed something
+                bump_data_version(user_id)
+            return
+
+        if method not in ("GET", "HEAD") or not scope["path"].startswith(VERSIONED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        etag = etag_for(user_id, scope["path"], scope.get("query_string", b"").decode("latin-1"))
+        cache_headers = [
+            (b"etag", etag.encode()),
+            (b"cache-control", b"private, no-cache"),
+            (b"vary", b"Authorization"),
+        ]
+
+        if _matches(headers.get("if-none-match"), etag):
+            await send({"type": "http.response.start", "status": 304, "headers": cache_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_etag(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                message = {**message, "headers": list(message.get("headers", [])) + cache_headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
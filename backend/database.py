@@ -1,3 +1,6 @@
+import httpx
+from postgrest import AsyncPostgrestClient
+from postgrest.utils import AsyncClient as AsyncHTTPClient
 from supabase import create_client, Client
 from config import settings
 
@@ -8,17 +11,99 @@ supabase: Client = create_client(
 )
 
 # Service role client (for admin operations)
+# Sync client - only used from background threads (Google Sheets sync),
+# never from inside async request handlers.
 supabase_admin: Client = create_client(
     supabase_url=settings.supabase_url,
     supabase_key=settings.supabase_service_key
 )
 
 
+class AsyncDatabase(AsyncPostgrestClient):
+    """Async PostgREST client for request handlers.
+
+    Exposes the same query builder as the sync Supabase client
+    (`await db.table(...).select(...).execute()`, `await db.rpc(...).execute()`)
+    but runs on a shared pool of keep-alive connections, so concurrent
+    requests overlap their database round trips instead of blocking the
+    event loop.
+    """
+
+    def create_session(self, base_url, headers, timeout, verify=True, proxy=None):
+        return AsyncHTTPClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            verify=verify,
+            proxy=proxy,
+            follow_redirects=True,
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=settings.db_pool_max_connections,
+                max_keepalive_connections=settings.db_pool_max_keepalive,
+                keepalive_expiry=settings.db_pool_keepalive_expiry
+            )
+        )
+
+
+# Service role async client (for admin operations from request handlers)
+supabase_admin_async = AsyncDatabase(
+    f"{settings.supabase_url}/rest/v1",
+    headers={
+        "apiKey": settings.supabase_service_key,
+        "Authorization": f"Bearer {settings.supabase_service_key}",
+    },
+    timeout=httpx.Timeout(
+        settings.db_request_timeout,
+        connect=settings.db_connect_timeout
+    )
+)
+
+
 def get_supabase() -> Client:
     """Dependency to get Supabase client"""
     return supabase
 
 
-def get_supabase_admin() -> Client:
-    """Dependency to get Supabase admin client"""
+def get_supabase_admin() -> AsyncDatabase:
+    """Dependency to get the async Supabase admin data-access client"""
+    return supabase_admin_async
+
+
+def get_supabase_admin_sync() -> Client:
+    """Dependency to get the sync Supabase admin client (background work only)"""
     return supabase_admin
+
+
+async def fetch_all(build_query, page_size: int = 1000) -> list:
+    """Fetch every row of a query page by page.
+
+    PostgREST caps the number of rows per response, so a plain
+    `select("*")` silently truncates large tables. `build_query` must return
+    a fresh, deterministically ordered query builder on each call.
+    """
+    rows = []
+    offset = 0
+    while True:
+        response = await build_query().range(offset, offset + page_size - 1).execute()
+        rows.extend(response.data)
+        if len(response.data) < page_size:
+            return rows
+        offset += page_size
+
+
+def fetch_all_sync(build_query, page_size: int = 1000) -> list:
+    """fetch_all for the sync client (background threads)"""
+    rows = []
+    offset = 0
+    while True:
+        response = build_query().range(offset, offset + page_size - 1).execute()
+        rows.extend(response.data)
+        if len(response.data) < page_size:
+            return rows
+        offset += page_size
+
+
+async def close_database():
+    """Release pooled database connections on shutdown"""
+    await supabase_admin_async.aclose()
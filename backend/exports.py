@@ -0,0 +1,177 @@
+"""Streaming exports of loans, installments and transactions.
+
+Rows are read from the database one keyset page at a time and encoded as
+they arrive, so a response never holds more than one page in memory
+regardless of table size. XLSX and ZIP output are written through
+`zipfile` into a buffer that is drained after every page.
+"""
+import csv
+import io
+import json
+import re
+import zipfile
+from typing import AsyncIterator, List, Optional
+from xml.sax.saxutils import escape
+from config import settings
+from database import AsyncDatabase
+from pagination import fetch_page
+
+# Exportable tables and the order their rows are exported in
+ENTITIES = {
+    "loans": (("created_at", False), ("id", False)),
+    "installments": (("due_date", False), ("id", False)),
+    "transactions": (("date", False), ("id", False)),
+}
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+}
+
+
+async def iter_rows(db: AsyncDatabase, entity: str, user_id: str) -> AsyncIterator[List[dict]]:
+    """Yield the user's rows of `entity` one page at a time"""
+    sort_key = ENTITIES[entity]
+    cursor = None
+    while True:
+        query = db.table(entity).select("*").eq("user_id", user_id)
+        rows, cursor = await fetch_page(query, sort_key, cursor, settings.page_size_max)
+        if rows:
+            yield rows
+        if not cursor:
+            return
+
+
+def _cell(value) -> str:
+    return "" if value is None else str(value)
+
+
+async def csv_stream(pages: AsyncIterator[List[dict]]) -> AsyncIterator[bytes]:
+    columns: Optional[List[str]] = None
+    async for rows in pages:
+        out = io.StringIO()
+        writer = csv.writer(out)
+        if columns is None:
+            columns = list(rows[0].keys())
+            writer.writerow(columns)
+        for row in rows:
+            writer.writerow([_cell(row.get(column)) for column in columns])
+        yield out.getvalue().encode()
+
+
+async def ndjson_stream(pages: AsyncIterator[List[dict]]) -> AsyncIterator[bytes]:
+    async for rows in pages:
+        yield "".join(json.dumps(row, default=str) + "\n" for row in rows).encode()
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Write-only, unseekable sink for zipfile; drained by the streaming generator"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+# Minimal SpreadsheetML package with a single worksheet
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+# Characters XML 1.0 does not allow, even escaped
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _xlsx_cell(value) -> str:
+    if isinstance(value, bool) or value is None or not isinstance(value, (int, float)):
+        text = _XML_ILLEGAL.sub("", escape(_cell(value)))
+        return f'<c t="inlineStr"><is><t>{text}</t></is></c>'
+    return f"<c><v>{value}</v></c>"
+
+
+def _xlsx_row(values) -> str:
+    return "<row>" + "".join(_xlsx_cell(value) for value in values) + "</row>"
+
+
+async def xlsx_stream(pages: AsyncIterator[List[dict]], sheet_name: str) -> AsyncIterator[bytes]:
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in _XLSX_PARTS.items():
+            workbook.writestr(name, content)
+        workbook.writestr("xl/workbook.xml", _XLSX_WORKBOOK.format(name=escape(sheet_name)))
+
+        with workbook.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            columns: Optional[List[str]] = None
+            async for rows in pages:
+                if columns is None:
+                    columns = list(rows[0].keys())
+                    sheet.write(_xlsx_row(columns).encode())
+                sheet.write("".join(_xlsx_row(row.get(column) for column in columns) for row in rows).encode())
+                yield buffer.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield buffer.drain()
+
+
+def export_stream(db: AsyncDatabase, entity: str, user_id: str, fmt: str) -> AsyncIterator[bytes]:
+    """Encoded byte stream of one entity in one format"""
+    pages = iter_rows(db, entity, user_id)
+    if fmt == "csv":
+        return csv_stream(pages)
+    if fmt == "ndjson":
+        return ndjson_stream(pages)
+    return xlsx_stream(pages, entity.capitalize())
+
+
+async def bundle_stream(db: AsyncDatabase, user_id: str, fmt: str) -> AsyncIterator[bytes]:
+    """ZIP of every entity, each as one CSV or NDJSON member"""
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as bundle:
+        for entity in ENTITIES:
+            with bundle.open(f"{entity}.{FORMATS[fmt][1]}", "w", force_zip64=True) as member:
+                async for chunk in export_stream(db, entity, user_id, fmt):
+                    member.write(chunk)
+                    yield buffer.drain()
+    yield buffer.drain()
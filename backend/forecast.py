@@ -0,0 +1,170 @@
+"""Collections forecast (GET /installments/forecast).
+
+Expected collections for the next N days or weeks, split into principal and
+interest (see migrations/add_collections_forecast.sql):
+
+- scheduled: the outstanding amount of unpaid installments, summed per
+  period in the database. TOTAL_RATE amounts are split with the financial
+  summary's rule (principal share = 1 / multiplier); DAILY_RATE
+  PRINCIPAL_SETTLEMENT installments are principal, the rest interest.
+- accruing: DAILY_RATE interest installments that the accrual job has not
+  generated yet but will fall due within the horizon (accrual.plan_accrual).
+
+Unpaid installments due before today are reported separately as overdue.
+Rows are bucketed with one `np.bincount` per column. Forecasts are cached per
+user, day and horizon until the user's data version changes.
+"""
+import logging
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from postgrest.exceptions import APIError
+from database import AsyncDatabase, fetch_all
+from data_versions import VersionedCache, data_version
+from overdue import UNPAID_STATUSES
+from config import settings
+import accrual
+
+BUCKET_DAYS = {"daily": 1, "weekly": 7}
+
+# Columns summed per bucket
+COLUMNS = ("count", "amount", "principal", "interest", "accruing_count", "accruing_interest")
+
+
+def _buckets(due_dates: List[Any], start: date, bucket_days: int) -> np.ndarray:
+    """Bucket of each due date: 0 = before start (overdue), then 1, 2, ... per period"""
+    due = np.array([str(d)[:10] for d in due_dates], dtype="datetime64[D]")
+    offset = (due - np.datetime64(start, "D")).astype(np.int64)
+    return np.where(offset < 0, 0, offset // bucket_days + 1)
+
+
+def _principal_share(rows: List[dict]) -> np.ndarray:
+    shares = []
+    for inst in rows:
+        loan = inst.get("loans") or {}
+        if loan.get("type") == "TOTAL_RATE":
+            multiplier = float(loan.get("total_rate_multiplier") or 1.2)
+            shares.append(1 / multiplier if float(loan.get("principal_amount") or 0) * multiplier else 0.0)
+        else:
+            shares.append(1.0 if inst.get("type") == "PRINCIPAL_SETTLEMENT" else 0.0)
+    return np.array(shares, dtype=np.float64)
+
+
+def aggregate_scheduled(rows: List[dict], start: date, bucket_days: int, buckets: int) -> Dict[str, np.ndarray]:
+    """Per-bucket count / amount / principal / interest of unpaid installment rows"""
+    size = buckets + 1
+    totals = {column: np.zeros(size) for column in COLUMNS}
+    if not rows:
+        return totals
+    bucket = _buckets([inst["due_date"] for inst in rows], start, bucket_days)
+    keep = bucket < size
+    remaining = np.array(
+        [float(inst.get("expected_amount") or 0) - float(inst.get("paid_amount") or 0) for inst in rows]
+    )
+    principal = remaining * _principal_share(rows)
+    bucket, remaining, principal = bucket[keep], remaining[keep], principal[keep]
+    totals["count"] = np.bincount(bucket, minlength=size).astype(np.float64)
+    totals["amount"] = np.bincount(bucket, weights=remaining, minlength=size)
+    totals["principal"] = np.bincount(bucket, weights=principal, minlength=size)
+    totals["interest"] = np.bincount(bucket, weights=remaining - principal, minlength=size)
+    return totals
+
+
+def aggregate_accruing(loans: List[dict], start: date, bucket_days: int, buckets: int) -> Dict[str, np.ndarray]:
+    """Per-bucket DAILY_RATE interest the accrual job will generate by the horizon's end"""
+    size = buckets + 1
+    totals = {column: np.zeros(size) for column in ("accruing_count", "accruing_interest")}
+    end = start + timedelta(days=bucket_days * buckets)
+    planned, _ = accrual.plan_accrual(loans, end - timedelta(days=1))
+    if not planned["due_date"]:
+        return totals
+    bucket = _buckets(planned["due_date"], start, bucket_days)
+    keep = bucket < size
+    amounts = np.array(planned["expected_amount"], dtype=np.float64)[keep]
+    totals["accruing_count"] = np.bincount(bucket[keep], minlength=size).astype(np.float64)
+    totals["accruing_interest"] = np.bincount(bucket[keep], weights=amounts, minlength=size)
+    return totals
+
+
+async def fetch_scheduled(db: AsyncDatabase, user_id: str, start: date, bucket_days: int,
+                          buckets: int) -> Dict[str, np.ndarray]:
+    try:
+        response = await db.rpc("collections_forecast", {
+            "p_user_id": user_id,
+            "p_start": start.isoformat(),
+            "p_bucket_days": bucket_days,
+            "p_buckets": buckets,
+        }).execute()
+        totals = {column: np.zeros(buckets + 1) for column in COLUMNS}
+        for row in response.data or []:
+            b = int(row["bucket"]) + 1
+            totals["count"][b] = int(row["installment_count"])
+            for column in ("amount", "principal", "interest"):
+                totals[column][b] = float(row[column] or 0)
+        return totals
+    except APIError as e:
+        logging.warning(f"collections_forecast unavailable, aggregating installments: {e.message}")
+
+    end = start + timedelta(days=bucket_days * buckets)
+    rows = await fetch_all(
+        lambda: db.table("installments")
+        .select("id, due_date, expected_amount, paid_amount, type, "
+                "loans!inner(type, principal_amount, total_rate_multiplier)")
+        .eq("user_id", user_id)
+        .in_("status", list(UNPAID_STATUSES))
+        .lt("due_date", end.isoformat())
+        .order("due_date")
+        .order("id")
+    )
+    return await run_in_threadpool(aggregate_scheduled, rows, start, bucket_days, buckets)
+
+
+def _amounts(totals: Dict[str, np.ndarray], b: Any) -> Dict[str, Any]:
+    """Totals of one bucket (an index) or a range of them (a slice)"""
+    value = {column: float(np.sum(totals[column][b])) for column in COLUMNS}
+    return {
+        "count": int(value["count"]),
+        "projected_count": int(value["accruing_count"]),
+        "amount": round(value["amount"] + value["accruing_interest"], 2),
+        "principal": round(value["principal"], 2),
+        "interest": round(value["interest"] + value["accruing_interest"], 2),
+        "accruing_interest": round(value["accruing_interest"], 2),
+    }
+
+
+_forecast_cache = VersionedCache(settings.report_cache_size)
+
+
+async def get_forecast(db: AsyncDatabase, user_id: str, granularity: str, periods: int,
+                       today: Optional[date] = None) -> Dict[str, Any]:
+    """Expected collections per period for `periods` days or weeks from today"""
+    today = today or date.today()
+    key = (today.isoformat(), granularity, periods)
+    cached = _forecast_cache.get(user_id, key)
+    if cached is not None:
+        return cached
+
+    version = data_version(user_id)
+    bucket_days = BUCKET_DAYS[granularity]
+    totals = await fetch_scheduled(db, user_id, today, bucket_days, periods)
+    loans = await accrual.fetch_candidates(db, user_id)
+    totals.update(await run_in_threadpool(aggregate_accruing, loans, today, bucket_days, periods))
+
+    forecast = {
+        "granularity": granularity,
+        "start": today.isoformat(),
+        "end": (today + timedelta(days=bucket_days * periods - 1)).isoformat(),
+        "overdue": _amounts(totals, 0),
+        "total": _amounts(totals, slice(1, None)),
+        "periods": [
+            {
+                "period_start": (today + timedelta(days=bucket_days * (b - 1))).isoformat(),
+                "period_end": (today + timedelta(days=bucket_days * b - 1)).isoformat(),
+                **_amounts(totals, b),
+            }
+            for b in range(1, periods + 1)
+        ],
+    }
+    _forecast_cache.put(user_id, forecast, key=key, version=version)
+    return forecast
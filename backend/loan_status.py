@@ -0,0 +1,79 @@
+"""Loan status derived from installments (see migrations/add_sync_loan_statuses.sql).
+
+A loan is COMPLETED when it has installments and all of them are PAID, and
+goes back to ACTIVE when a COMPLETED loan has an unpaid installment. A single
+loan is judged from the counters on its row (migrations/add_loan_stats.sql);
+the whole portfolio is reconciled with one grouped count and at most two
+bulk updates instead of a query per loan.
+"""
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+from postgrest.exceptions import APIError
+from database import AsyncDatabase, fetch_all
+
+# Ids per `in` filter in the fallback path, to keep request URLs short
+UPDATE_CHUNK_SIZE = 200
+
+
+def status_changes(loans: Iterable[dict], installments: Iterable[dict]) -> Tuple[List[str], List[str]]:
+    """Loan ids to mark COMPLETED and to revert to ACTIVE"""
+    unpaid: Dict[str, int] = defaultdict(int)
+    for inst in installments:
+        unpaid[inst["loan_id"]] += inst.get("status") != "PAID"
+
+    to_complete, to_reactivate = [], []
+    for loan in loans:
+        if loan["id"] not in unpaid:
+            continue  # No installments - nothing to judge by
+        if unpaid[loan["id"]] == 0 and loan.get("status") != "COMPLETED":
+            to_complete.append(loan["id"])
+        elif unpaid[loan["id"]] > 0 and loan.get("status") == "COMPLETED":
+            to_reactivate.append(loan["id"])
+    return to_complete, to_reactivate
+
+
+async def all_installments_paid(db: AsyncDatabase, loan: dict) -> Optional[bool]:
+    """Whether every installment of `loan` is PAID; None if it has no installments"""
+    if "unpaid_count" in loan:
+        # Maintained on the loan row by migrations/add_loan_stats.sql
+        if not loan["installment_count"]:
+            return None
+        return loan["unpaid_count"] == 0
+
+    installments = await db.table("installments").select("status").eq("loan_id", loan["id"]).execute()
+    if not installments.data:
+        return None
+    return all(inst.get("status") == "PAID" for inst in installments.data)
+
+
+async def _bulk_update_status(db: AsyncDatabase, loan_ids: List[str], new_status: str):
+    for i in range(0, len(loan_ids), UPDATE_CHUNK_SIZE):
+        await db.table("loans").update({"status": new_status}) \
+            .in_("id", loan_ids[i:i + UPDATE_CHUNK_SIZE]) \
+            .execute()
+
+
+async def sync_loan_statuses_fallback(db: AsyncDatabase, user_id: str) -> int:
+    """Same reconciliation over paged reads, for databases without the SQL function"""
+    loans = await fetch_all(
+        lambda: db.table("loans").select("id, status").eq("user_id", user_id).order("id")
+    )
+    installments = await fetch_all(
+        lambda: db.table("installments").select("loan_id, status").eq("user_id", user_id).order("id")
+    )
+    to_complete, to_reactivate = status_changes(loans, installments)
+
+    await _bulk_update_status(db, to_complete, "COMPLETED")
+    await _bulk_update_status(db, to_reactivate, "ACTIVE")
+    return len(to_complete) + len(to_reactivate)
+
+
+async def sync_loan_statuses(db: AsyncDatabase, user_id: str) -> int:
+    """Reconcile every loan's status with its installments; returns loans updated"""
+    try:
+        response = await db.rpc("sync_loan_statuses", {"p_user_id": user_id}).execute()
+        return int(response.data or 0)
+    except APIError as e:
+        logging.warning(f"sync_loan_statuses unavailable, syncing from paged reads: {e.message}")
+        return await sync_loan_statuses_fallback(db, user_id)
@@ -1,8 +1,38 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from config import settings
-from routers import auth_router, loans_router, installments_router, transactions_router, sync_router, investment_breakdown_router
+from database import close_database, get_supabase_admin, get_supabase_admin_sync
+from data_versions import ConditionalGetMiddleware
+import accrual
+import overdue
+from routers import auth_router, loans_router, installments_router, transactions_router, sync_router, investment_breakdown_router, export_router, changes_router, archives_router
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup/shutdown hooks"""
+    # Sync job workers (resume jobs queued before a restart)
+    sync_router.job_queue.start(get_supabase_admin_sync())
+    # Scheduled batch jobs: daily interest accrual for DAILY_RATE loans,
+    # overdue installment status
+    jobs = []
+    if settings.interest_accrual_interval_hours > 0:
+        jobs.append(asyncio.create_task(
+            accrual.run_accrual_job(get_supabase_admin(), settings.interest_accrual_interval_hours)
+        ))
+    if settings.overdue_check_interval_hours > 0:
+        jobs.append(asyncio.create_task(
+            overdue.run_overdue_job(get_supabase_admin(), settings.overdue_check_interval_hours)
+        ))
+    yield
+    for job in jobs:
+        job.cancel()
+    sync_router.job_queue.shutdown()
+    # Close pooled database connections
+    await close_database()
+
 
 # Create FastAPI app
 app = FastAPI(
@@ -10,9 +40,13 @@ app = FastAPI(
     description="Backend API for Debtsify Loan Management System",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
+# ETags / 304 for unchanged data (added first so CORS headers wrap its 304s)
+app.add_middleware(ConditionalGetMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -29,6 +63,9 @@ app.include_router(installments_router.router)
 app.include_router(transactions_router.router)
 app.include_router(sync_router.router)
 app.include_router(investment_breakdown_router.router)
+app.include_router(export_router.router)
+app.include_router(changes_router.router)
+app.include_router(archives_router.router)
 
 
 @app.get("/")
@@ -0,0 +1,57 @@
+-- Incremental updates for the cash-flow index (GET /transactions/summary/cash-flow,
+-- see cashflow.py). Requires add_change_log.sql.
+-- Run this in Supabase SQL Editor
+--
+-- The API keeps a per-user prefix-sum index of CREDIT and DEBIT totals per
+-- day. After a write it reads only the transactions changed since its
+-- change-feed cursor (with their date, amount and type, or a tombstone) and
+-- applies them, instead of reloading every transaction.
+
+-- Transaction entries of one user's feed, without scanning the other tables'
+CREATE INDEX IF NOT EXISTS idx_change_log_user_table_txid_seq
+    ON public.change_log(user_id, table_name, txid, seq);
+
+
+-- Transaction changes after the (p_txid, p_seq) cursor, oldest first, as
+-- {"changes": [{row_id, deleted, txid, seq, date, amount, type}], "pending": bool}.
+-- Like changes_since, entries of transactions newer than the snapshot xmin
+-- are held back; `pending` is true when some are already committed, so the
+-- caller knows its index is not yet current.
+CREATE OR REPLACE FUNCTION public.transaction_changes_since(
+    p_user_id UUID,
+    p_txid TEXT,
+    p_seq BIGINT,
+    p_limit INTEGER
+)
+RETURNS JSONB AS $$
+    WITH horizon AS (
+        SELECT pg_snapshot_xmin(pg_current_snapshot()) AS xmin
+    ),
+    changes AS (
+        SELECT
+            c.row_id,
+            c.deleted OR t.id IS NULL AS deleted,
+            c.txid::text AS txid,
+            c.seq,
+            t.date,
+            t.amount,
+            t.type
+        FROM public.change_log c
+        LEFT JOIN public.transactions t ON NOT c.deleted AND t.id = c.row_id
+        WHERE c.user_id = p_user_id
+          AND c.table_name = 'transactions'
+          AND (c.txid, c.seq) > (p_txid::xid8, p_seq)
+          AND c.txid < (SELECT xmin FROM horizon)
+        ORDER BY c.txid, c.seq
+        LIMIT p_limit
+    )
+    SELECT jsonb_build_object(
+        'changes', COALESCE((SELECT jsonb_agg(to_jsonb(changes) ORDER BY changes.txid::xid8, changes.seq) FROM changes), '[]'::jsonb),
+        'pending', EXISTS (
+            SELECT 1 FROM public.change_log c
+            WHERE c.user_id = p_user_id
+              AND c.table_name = 'transactions'
+              AND c.txid >= (SELECT xmin FROM horizon)
+        )
+    );
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,143 @@
+-- Change feed for GET /changes
+-- Run this in Supabase SQL Editor
+--
+-- One change_log entry per row of loans, installments, transactions and
+-- investment_breakdown, rewritten by triggers on every insert, update and
+-- delete (a delete leaves a tombstone), so cascaded and manual hard deletes
+-- are recorded too.
+--
+-- Entries are ordered by the id of the transaction that last wrote them.
+-- changes_since() only returns entries of transactions older than every
+-- transaction still in flight (the snapshot xmin), so an entry can never
+-- appear behind a cursor a client has already moved past.
+
+CREATE TABLE IF NOT EXISTS public.change_log (
+    user_id UUID NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+    table_name TEXT NOT NULL,
+    row_id UUID NOT NULL,
+    deleted BOOLEAN NOT NULL DEFAULT FALSE,
+    txid XID8 NOT NULL DEFAULT pg_current_xact_id(),
+    seq BIGSERIAL NOT NULL,
+    changed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_id, table_name, row_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_change_log_user_txid_seq
+    ON public.change_log(user_id, txid, seq);
+
+ALTER TABLE public.change_log ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view their own changes" ON public.change_log;
+CREATE POLICY "Users can view their own changes" ON public.change_log
+    FOR SELECT USING (auth.uid() = user_id);
+
+
+CREATE OR REPLACE FUNCTION public.record_change(p_user_id UUID, p_table TEXT, p_row_id UUID, p_deleted BOOLEAN)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO public.change_log AS c (user_id, table_name, row_id, deleted)
+    VALUES (p_user_id, p_table, p_row_id, p_deleted)
+    ON CONFLICT (user_id, table_name, row_id) DO UPDATE SET
+        deleted = EXCLUDED.deleted,
+        txid = pg_current_xact_id(),
+        seq = nextval(pg_get_serial_sequence('public.change_log', 'seq')),
+        changed_at = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION public.change_log_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        -- The user row itself is gone when this is a cascade from users
+        IF EXISTS (SELECT 1 FROM public.users WHERE id = OLD.user_id) THEN
+            PERFORM public.record_change(OLD.user_id, TG_TABLE_NAME, OLD.id, TRUE);
+        END IF;
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'UPDATE' AND OLD.user_id IS DISTINCT FROM NEW.user_id THEN
+        PERFORM public.record_change(OLD.user_id, TG_TABLE_NAME, OLD.id, TRUE);
+    END IF;
+
+    PERFORM public.record_change(NEW.user_id, TG_TABLE_NAME, NEW.id, FALSE);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS change_log_loans ON public.loans;
+CREATE TRIGGER change_log_loans
+    AFTER INSERT OR UPDATE OR DELETE ON public.loans
+    FOR EACH ROW EXECUTE FUNCTION public.change_log_trigger();
+
+DROP TRIGGER IF EXISTS change_log_installments ON public.installments;
+CREATE TRIGGER change_log_installments
+    AFTER INSERT OR UPDATE OR DELETE ON public.installments
+    FOR EACH ROW EXECUTE FUNCTION public.change_log_trigger();
+
+DROP TRIGGER IF EXISTS change_log_transactions ON public.transactions;
+CREATE TRIGGER change_log_transactions
+    AFTER INSERT OR UPDATE OR DELETE ON public.transactions
+    FOR EACH ROW EXECUTE FUNCTION public.change_log_trigger();
+
+DROP TRIGGER IF EXISTS change_log_investment_breakdown ON public.investment_breakdown;
+CREATE TRIGGER change_log_investment_breakdown
+    AFTER INSERT OR UPDATE OR DELETE ON public.investment_breakdown
+    FOR EACH ROW EXECUTE FUNCTION public.change_log_trigger();
+
+
+-- Changes after the (p_txid, p_seq) cursor, with the current row for
+-- upserts. Pass p_txid = '0' for everything.
+CREATE OR REPLACE FUNCTION public.changes_since(
+    p_user_id UUID,
+    p_txid TEXT,
+    p_seq BIGINT,
+    p_limit INTEGER
+)
+RETURNS TABLE (
+    table_name TEXT,
+    row_id UUID,
+    deleted BOOLEAN,
+    txid TEXT,
+    seq BIGINT,
+    "row" JSONB
+) AS $$
+    SELECT
+        c.table_name,
+        c.row_id,
+        c.deleted,
+        c.txid::text,
+        c.seq,
+        CASE WHEN NOT c.deleted THEN
+            CASE c.table_name
+                WHEN 'loans' THEN (SELECT to_jsonb(l) FROM public.loans l WHERE l.id = c.row_id)
+                WHEN 'installments' THEN (SELECT to_jsonb(i) FROM public.installments i WHERE i.id = c.row_id)
+                WHEN 'transactions' THEN (SELECT to_jsonb(t) FROM public.transactions t WHERE t.id = c.row_id)
+                WHEN 'investment_breakdown' THEN (SELECT to_jsonb(b) FROM public.investment_breakdown b WHERE b.id = c.row_id)
+            END
+        END
+    FROM public.change_log c
+    WHERE c.user_id = p_user_id
+      AND (c.txid, c.seq) > (p_txid::xid8, p_seq)
+      AND c.txid < pg_snapshot_xmin(pg_current_snapshot())
+    ORDER BY c.txid, c.seq
+    LIMIT p_limit;
+$$ LANGUAGE sql STABLE;
+
+
+-- Cursor position covering everything committed so far (for clients that
+-- load full tables first and then follow the feed)
+CREATE OR REPLACE FUNCTION public.change_log_head()
+RETURNS TEXT AS $$
+    SELECT pg_snapshot_xmin(pg_current_snapshot())::text;
+$$ LANGUAGE sql STABLE;
+
+
+-- Backfill: every existing row starts as one change
+INSERT INTO public.change_log (user_id, table_name, row_id)
+SELECT user_id, 'loans', id FROM public.loans
+UNION ALL SELECT user_id, 'installments', id FROM public.installments
+UNION ALL SELECT user_id, 'transactions', id FROM public.transactions
+UNION ALL SELECT user_id, 'investment_breakdown', id FROM public.investment_breakdown
+ON CONFLICT DO NOTHING;
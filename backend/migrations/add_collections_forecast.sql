@@ -0,0 +1,59 @@
+-- Collections forecast (GET /installments/forecast, see forecast.py)
+-- Run this in Supabase SQL Editor
+--
+-- Sums the outstanding amount (expected - paid) of a user's unpaid
+-- installments per period of p_bucket_days days from p_start, split into
+-- principal and interest:
+--   TOTAL_RATE  principal share = principal / (principal * multiplier), as in
+--               the financial summary's market_principal / market_interest
+--   DAILY_RATE  PRINCIPAL_SETTLEMENT installments are principal, the rest
+--               (INTEREST_ONLY) interest
+-- Installments due before p_start are returned as bucket -1 (overdue).
+-- Interest not generated yet is projected by the API (accrual.plan_accrual).
+-- Reads through idx_installments_user_status_due_id (add_overdue_status.sql).
+
+CREATE OR REPLACE FUNCTION public.collections_forecast(
+    p_user_id UUID,
+    p_start DATE,
+    p_bucket_days INTEGER,
+    p_buckets INTEGER
+)
+RETURNS TABLE (
+    bucket INTEGER,
+    installment_count BIGINT,
+    amount NUMERIC,
+    principal NUMERIC,
+    interest NUMERIC
+)
+AS $$
+    WITH unpaid AS (
+        SELECT
+            CASE WHEN i.due_date < p_start THEN -1
+                 ELSE (i.due_date - p_start) / p_bucket_days
+            END AS bucket,
+            i.expected_amount - COALESCE(i.paid_amount, 0) AS remaining,
+            CASE
+                WHEN l.type = 'TOTAL_RATE' THEN
+                    CASE WHEN l.principal_amount * COALESCE(NULLIF(l.total_rate_multiplier, 0), 1.2) <> 0
+                         THEN 1 / COALESCE(NULLIF(l.total_rate_multiplier, 0), 1.2)
+                         ELSE 0
+                    END
+                WHEN i.type = 'PRINCIPAL_SETTLEMENT' THEN 1
+                ELSE 0
+            END AS principal_share
+        FROM public.installments i
+        JOIN public.loans l ON l.id = i.loan_id
+        WHERE i.user_id = p_user_id
+          AND i.status IN ('PENDING', 'OVERDUE')
+          AND i.due_date < p_start + p_bucket_days * p_buckets
+    )
+    SELECT
+        u.bucket,
+        COUNT(*),
+        SUM(u.remaining),
+        SUM(u.remaining * u.principal_share),
+        SUM(u.remaining * (1 - u.principal_share))
+    FROM unpaid u
+    GROUP BY u.bucket
+    ORDER BY u.bucket;
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,99 @@
+-- Atomic loan creation for POST /loans
+-- Run this in Supabase SQL Editor
+--
+-- Inserts a loan together with its installment schedule (built by
+-- schedule.py) and any advance-payment transactions in one database
+-- transaction, so a loan can never exist without its installments.
+--
+-- p_loan:         loans columns (client_name, type, principal_amount, ...)
+-- p_installments: [{"client_name", "due_date", "expected_amount", "paid_amount",
+--                   "penalty", "type", "status", "paid_date"}, ...]
+-- p_transactions: [{"amount", "type", "category", "description"}, ...]
+
+CREATE OR REPLACE FUNCTION public.create_loan_with_schedule(
+    p_user_id UUID,
+    p_loan JSONB,
+    p_installments JSONB,
+    p_transactions JSONB DEFAULT '[]'::jsonb
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_loan public.loans;
+    v_installments JSONB;
+    v_transactions JSONB;
+BEGIN
+    INSERT INTO public.loans (
+        user_id, client_name, type, principal_amount, start_date, frequency,
+        disbursement_date, status, total_rate_multiplier, tenure,
+        daily_rate_per_lakh, process_rate, payout_rate
+    )
+    SELECT
+        p_user_id, l.client_name, l.type, l.principal_amount, l.start_date, l.frequency,
+        l.disbursement_date, COALESCE(l.status, 'ACTIVE'), l.total_rate_multiplier, l.tenure,
+        l.daily_rate_per_lakh, COALESCE(l.process_rate, 0), COALESCE(l.payout_rate, 0)
+    FROM jsonb_to_record(p_loan) AS l(
+        client_name TEXT,
+        type TEXT,
+        principal_amount NUMERIC,
+        start_date DATE,
+        frequency TEXT,
+        disbursement_date DATE,
+        status TEXT,
+        total_rate_multiplier NUMERIC,
+        tenure INTEGER,
+        daily_rate_per_lakh NUMERIC,
+        process_rate NUMERIC,
+        payout_rate NUMERIC
+    )
+    RETURNING * INTO v_loan;
+
+    WITH inserted AS (
+        INSERT INTO public.installments (
+            user_id, loan_id, client_name, due_date, expected_amount,
+            paid_amount, penalty, type, status, paid_date
+        )
+        SELECT
+            p_user_id, v_loan.id, i.client_name, i.due_date, i.expected_amount,
+            COALESCE(i.paid_amount, 0), COALESCE(i.penalty, 0), i.type,
+            COALESCE(i.status, 'PENDING'), i.paid_date
+        FROM jsonb_to_recordset(p_installments) AS i(
+            client_name TEXT,
+            due_date DATE,
+            expected_amount NUMERIC,
+            paid_amount NUMERIC,
+            penalty NUMERIC,
+            type TEXT,
+            status TEXT,
+            paid_date DATE
+        )
+        RETURNING *
+    )
+    SELECT COALESCE(jsonb_agg(to_jsonb(inserted) ORDER BY inserted.due_date), '[]'::jsonb)
+    INTO v_installments
+    FROM inserted;
+
+    WITH inserted AS (
+        INSERT INTO public.transactions (user_id, date, amount, type, category, description, related_entity_id)
+        SELECT p_user_id, NOW(), t.amount, t.type, t.category, t.description, v_loan.id
+        FROM jsonb_to_recordset(COALESCE(p_transactions, '[]'::jsonb)) AS t(
+            amount NUMERIC,
+            type TEXT,
+            category TEXT,
+            description TEXT
+        )
+        RETURNING *
+    )
+    SELECT COALESCE(jsonb_agg(to_jsonb(inserted)), '[]'::jsonb)
+    INTO v_transactions
+    FROM inserted;
+
+    -- Re-read the loan so triggers on installments (loan stats) are reflected
+    SELECT * INTO v_loan FROM public.loans WHERE id = v_loan.id;
+
+    RETURN jsonb_build_object(
+        'loan', to_jsonb(v_loan),
+        'installments', v_installments,
+        'transactions', v_transactions
+    );
+END;
+$$ LANGUAGE plpgsql;
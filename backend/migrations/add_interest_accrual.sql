@@ -0,0 +1,107 @@
+-- Server-side interest accrual for DAILY_RATE loans (POST /loans/accrue-interest
+-- and the daily accrual job, see accrual.py)
+-- Run this in Supabase SQL Editor
+--
+-- A DAILY_RATE loan owes one INTEREST_ONLY installment per period of
+-- `frequency` days. The job reads every active daily-rate loan with the due
+-- date of its latest interest installment, computes the missing ones in one
+-- vectorized pass and writes them back in bulk. last_interest_generation_date
+-- records how far a loan has been generated, so running the job again (or
+-- two runs at once) never duplicates an installment.
+
+-- Latest interest installment of a loan is one index probe
+CREATE INDEX IF NOT EXISTS idx_installments_loan_interest_due
+    ON public.installments(loan_id, due_date)
+    WHERE type = 'INTEREST_ONLY';
+
+CREATE INDEX IF NOT EXISTS idx_loans_daily_rate_active
+    ON public.loans(user_id, id)
+    WHERE type = 'DAILY_RATE' AND status = 'ACTIVE';
+
+
+-- Active DAILY_RATE loans (all users when p_user_id is NULL) and the due date
+-- their interest has been generated through
+CREATE OR REPLACE FUNCTION public.interest_accrual_candidates(p_user_id UUID DEFAULT NULL, p_loan_id UUID DEFAULT NULL)
+RETURNS TABLE (
+    id UUID,
+    user_id UUID,
+    client_name TEXT,
+    principal_amount NUMERIC,
+    daily_rate_per_lakh NUMERIC,
+    frequency TEXT,
+    start_date DATE,
+    generated_through DATE
+)
+AS $$
+    SELECT
+        l.id,
+        l.user_id,
+        l.client_name,
+        l.principal_amount,
+        l.daily_rate_per_lakh,
+        l.frequency,
+        l.start_date,
+        -- Installments added by hand or by older clients count too
+        GREATEST(
+            l.last_interest_generation_date,
+            (SELECT MAX(i.due_date) FROM public.installments i
+             WHERE i.loan_id = l.id AND i.type = 'INTEREST_ONLY')
+        )
+    FROM public.loans l
+    WHERE l.type = 'DAILY_RATE'
+      AND l.status = 'ACTIVE'
+      AND (p_user_id IS NULL OR l.user_id = p_user_id)
+      AND (p_loan_id IS NULL OR l.id = p_loan_id)
+    ORDER BY l.id;
+$$ LANGUAGE sql STABLE;
+
+
+-- Insert generated interest installments (parallel arrays, one element per
+-- installment) and advance each loan's last_interest_generation_date, in one
+-- transaction. Loans are locked and rows at or before what a loan has already
+-- been generated through are skipped, so overlapping runs can't duplicate.
+-- Returns rows inserted.
+CREATE OR REPLACE FUNCTION public.apply_interest_accrual(
+    p_loan_ids UUID[],
+    p_due_dates DATE[],
+    p_amounts NUMERIC[]
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_inserted INTEGER;
+BEGIN
+    DROP TABLE IF EXISTS _accrual;
+    CREATE TEMP TABLE _accrual ON COMMIT DROP AS
+    SELECT r.loan_id, r.due_date, r.expected_amount, l.user_id, l.client_name
+    FROM unnest(p_loan_ids, p_due_dates, p_amounts) AS r(loan_id, due_date, expected_amount)
+    JOIN public.loans l ON l.id = r.loan_id;
+
+    PERFORM 1 FROM public.loans
+    WHERE id IN (SELECT DISTINCT loan_id FROM _accrual)
+    ORDER BY id
+    FOR UPDATE;
+
+    INSERT INTO public.installments (
+        user_id, loan_id, client_name, due_date, expected_amount, paid_amount, penalty, type, status
+    )
+    SELECT a.user_id, a.loan_id, a.client_name, a.due_date, a.expected_amount, 0, 0, 'INTEREST_ONLY', 'PENDING'
+    FROM _accrual a
+    JOIN public.loans l ON l.id = a.loan_id
+    WHERE a.due_date > COALESCE(
+        GREATEST(
+            l.last_interest_generation_date,
+            (SELECT MAX(i.due_date) FROM public.installments i
+             WHERE i.loan_id = a.loan_id AND i.type = 'INTEREST_ONLY')
+        ),
+        '-infinity'::DATE
+    );
+    GET DIAGNOSTICS v_inserted = ROW_COUNT;
+
+    UPDATE public.loans l
+    SET last_interest_generation_date = GREATEST(l.last_interest_generation_date, g.through)
+    FROM (SELECT loan_id, MAX(due_date) AS through FROM _accrual GROUP BY loan_id) g
+    WHERE l.id = g.loan_id;
+
+    RETURN v_inserted;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,121 @@
+-- Incremental maintenance of investment_breakdown
+-- Run this in Supabase SQL Editor (after add_loan_stats.sql)
+--
+-- A loan's breakdown row only depends on the loan row itself: its terms and
+-- the installment totals kept on it by add_loan_stats.sql (paid_total is
+-- "received", outstanding_amount the unpaid remainder). A trigger on loans
+-- upserts the row of every loan whose terms or totals change, so
+-- GET /investment-breakdown stays current without a full sync. Rows whose
+-- values didn't change are not rewritten. Mirrors
+-- analytics.compute_investment_breakdown (a zero rate counts as unset, as
+-- there).
+
+-- One row per loan (keep the most recently updated duplicate)
+DELETE FROM public.investment_breakdown b
+USING public.investment_breakdown newer
+WHERE b.loan_id = newer.loan_id
+  AND (newer.updated_at, newer.id) > (b.updated_at, b.id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_investment_breakdown_loan_unique
+    ON public.investment_breakdown(loan_id);
+
+
+-- Upsert the breakdown rows of a user's loans (one loan with p_loan_id);
+-- returns the number of rows inserted or changed
+CREATE OR REPLACE FUNCTION public.upsert_investment_breakdown(p_user_id UUID, p_loan_id UUID DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    v_changed INTEGER;
+BEGIN
+    INSERT INTO public.investment_breakdown AS b (
+        user_id, loan_id, person, start_date, cycle, capital, interest_percentage,
+        received, mkt_principal, mkt_interest, total_market_value
+    )
+    SELECT
+        user_id, id, client_name, start_date, cycle, principal, interest_percentage,
+        paid_total, mkt_principal, mkt_interest, mkt_principal + mkt_interest
+    FROM (
+        SELECT
+            l.user_id,
+            l.id,
+            l.client_name,
+            l.start_date,
+            CASE WHEN l.frequency ~ '^[0-9]+$' THEN l.frequency || 'd' ELSE l.frequency END AS cycle,
+            l.principal_amount AS principal,
+            CASE
+                WHEN l.type = 'TOTAL_RATE' THEN (COALESCE(NULLIF(l.total_rate_multiplier, 0), 1.2) - 1) * 100
+                ELSE COALESCE(NULLIF(l.daily_rate_per_lakh, 0), 100)
+            END AS interest_percentage,
+            l.paid_total,
+            CASE
+                WHEN l.type = 'TOTAL_RATE' THEN
+                    CASE WHEN l.status <> 'COMPLETED'
+                        THEN l.outstanding_amount / COALESCE(NULLIF(l.total_rate_multiplier, 0), 1.2)
+                        ELSE 0 END
+                ELSE
+                    CASE WHEN l.status = 'ACTIVE' THEN l.principal_amount ELSE 0 END
+            END AS mkt_principal,
+            CASE
+                WHEN l.type = 'TOTAL_RATE' THEN
+                    CASE WHEN l.status <> 'COMPLETED'
+                        THEN l.outstanding_amount - l.outstanding_amount / COALESCE(NULLIF(l.total_rate_multiplier, 0), 1.2)
+                        ELSE 0 END
+                ELSE l.outstanding_amount
+            END AS mkt_interest
+        FROM public.loans l
+        WHERE l.user_id = p_user_id
+          AND (p_loan_id IS NULL OR l.id = p_loan_id)
+    ) v
+    ON CONFLICT (loan_id) DO UPDATE SET
+        user_id = EXCLUDED.user_id,
+        person = EXCLUDED.person,
+        start_date = EXCLUDED.start_date,
+        cycle = EXCLUDED.cycle,
+        capital = EXCLUDED.capital,
+        interest_percentage = EXCLUDED.interest_percentage,
+        received = EXCLUDED.received,
+        mkt_principal = EXCLUDED.mkt_principal,
+        mkt_interest = EXCLUDED.mkt_interest,
+        total_market_value = EXCLUDED.total_market_value,
+        updated_at = NOW()
+    -- EXCLUDED is already rounded to the column types, so unchanged loans are left alone
+    WHERE (b.user_id, b.person, b.start_date, b.cycle, b.capital, b.interest_percentage,
+           b.received, b.mkt_principal, b.mkt_interest, b.total_market_value)
+        IS DISTINCT FROM
+          (EXCLUDED.user_id, EXCLUDED.person, EXCLUDED.start_date, EXCLUDED.cycle, EXCLUDED.capital,
+           EXCLUDED.interest_percentage, EXCLUDED.received, EXCLUDED.mkt_principal,
+           EXCLUDED.mkt_interest, EXCLUDED.total_market_value);
+    GET DIAGNOSTICS v_changed = ROW_COUNT;
+
+    RETURN v_changed;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION public.investment_breakdown_loans_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM public.upsert_investment_breakdown(NEW.user_id, NEW.id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Deleted loans take their row with them (ON DELETE CASCADE)
+DROP TRIGGER IF EXISTS investment_breakdown_loans_changed ON public.loans;
+CREATE TRIGGER investment_breakdown_loans_changed
+    AFTER INSERT OR UPDATE OF
+        user_id, client_name, start_date, frequency, type, status, principal_amount,
+        total_rate_multiplier, daily_rate_per_lakh, paid_total, outstanding_amount
+    ON public.loans
+    FOR EACH ROW EXECUTE FUNCTION public.investment_breakdown_loans_trigger();
+
+
+-- Refresh every loan of a user (repair / POST /investment-breakdown/sync-from-loans)
+CREATE OR REPLACE FUNCTION public.refresh_investment_breakdown(p_user_id UUID)
+RETURNS INTEGER AS $$
+    SELECT public.upsert_investment_breakdown(p_user_id, NULL);
+$$ LANGUAGE sql;
+
+
+-- Backfill existing users
+SELECT public.refresh_investment_breakdown(id) FROM public.users;
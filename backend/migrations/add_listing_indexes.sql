@@ -0,0 +1,24 @@
+-- Indexes for cursor pagination and filtering of GET /loans and GET /installments
+-- Run this in Supabase SQL Editor
+
+-- Loans: newest first, (created_at DESC, id DESC)
+CREATE INDEX IF NOT EXISTS idx_loans_user_created_id
+    ON public.loans(user_id, created_at DESC, id DESC);
+
+-- Installments: earliest due first, (due_date, id); serves due-date ranges
+CREATE INDEX IF NOT EXISTS idx_installments_user_due_id
+    ON public.installments(user_id, due_date, id);
+
+-- Unpaid-only listing stays small as the book matures
+CREATE INDEX IF NOT EXISTS idx_installments_user_unpaid_due_id
+    ON public.installments(user_id, due_date, id)
+    WHERE status <> 'PAID';
+
+-- Case-insensitive client name substring search (ilike '%name%')
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_loans_client_name_trgm
+    ON public.loans USING GIN (client_name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_installments_client_name_trgm
+    ON public.installments USING GIN (client_name gin_trgm_ops);
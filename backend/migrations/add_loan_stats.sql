@@ -0,0 +1,148 @@
+-- Denormalized per-loan installment statistics
+-- Run this in Supabase SQL Editor
+--
+-- Keeps counters and totals of each loan's installments on the loan row,
+-- maintained by a trigger on installments, so the loan list can show the
+-- outstanding balance and next due date, and a status check is a single
+-- row read instead of a scan of the loan's installments.
+--
+--   installment_count   all installments
+--   unpaid_count        installments not PAID
+--   outstanding_amount  expected - paid over unpaid installments
+--   paid_total          paid_amount over all installments
+--   next_due_date       earliest due date of an unpaid installment
+--   last_paid_date      latest paid date
+
+ALTER TABLE public.loans ADD COLUMN IF NOT EXISTS installment_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE public.loans ADD COLUMN IF NOT EXISTS unpaid_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE public.loans ADD COLUMN IF NOT EXISTS outstanding_amount DECIMAL(15, 2) NOT NULL DEFAULT 0;
+ALTER TABLE public.loans ADD COLUMN IF NOT EXISTS paid_total DECIMAL(15, 2) NOT NULL DEFAULT 0;
+ALTER TABLE public.loans ADD COLUMN IF NOT EXISTS next_due_date DATE;
+ALTER TABLE public.loans ADD COLUMN IF NOT EXISTS last_paid_date DATE;
+
+-- Keep the date lookups below to an index probe
+CREATE INDEX IF NOT EXISTS idx_installments_loan_unpaid_due
+    ON public.installments(loan_id, due_date)
+    WHERE status <> 'PAID';
+CREATE INDEX IF NOT EXISTS idx_installments_loan_paid_date
+    ON public.installments(loan_id, paid_date)
+    WHERE paid_date IS NOT NULL;
+
+
+-- Add (p_sign = 1) or remove (p_sign = -1) one installment's contribution
+CREATE OR REPLACE FUNCTION public.apply_loan_stats_delta(p_inst public.installments, p_sign INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    v_unpaid BOOLEAN := p_inst.status <> 'PAID';
+BEGIN
+    UPDATE public.loans
+    SET installment_count = installment_count + p_sign,
+        unpaid_count = unpaid_count + CASE WHEN v_unpaid THEN p_sign ELSE 0 END,
+        outstanding_amount = outstanding_amount + CASE
+            WHEN v_unpaid THEN p_sign * (p_inst.expected_amount - COALESCE(p_inst.paid_amount, 0))
+            ELSE 0
+        END,
+        paid_total = paid_total + p_sign * COALESCE(p_inst.paid_amount, 0),
+        -- Adding can only move the dates one way; removals are refreshed below
+        next_due_date = CASE
+            WHEN p_sign > 0 AND v_unpaid THEN LEAST(next_due_date, p_inst.due_date)
+            ELSE next_due_date
+        END,
+        last_paid_date = CASE
+            WHEN p_sign > 0 THEN GREATEST(last_paid_date, p_inst.paid_date)
+            ELSE last_paid_date
+        END
+    WHERE id = p_inst.loan_id;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Re-derive the dates of one loan (two index probes)
+CREATE OR REPLACE FUNCTION public.refresh_loan_stat_dates(p_loan_id UUID)
+RETURNS VOID AS $$
+BEGIN
+    UPDATE public.loans
+    SET next_due_date = (
+            SELECT MIN(due_date) FROM public.installments
+            WHERE loan_id = p_loan_id AND status <> 'PAID'
+        ),
+        last_paid_date = (
+            SELECT MAX(paid_date) FROM public.installments
+            WHERE loan_id = p_loan_id AND paid_date IS NOT NULL
+        )
+    WHERE id = p_loan_id;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION public.loan_stats_installments_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM public.apply_loan_stats_delta(OLD, -1);
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM public.apply_loan_stats_delta(NEW, 1);
+    END IF;
+
+    -- Removing an installment (or its unpaid / paid state) may remove the
+    -- current next due or last paid date
+    IF TG_OP IN ('UPDATE', 'DELETE') AND (
+        (OLD.status <> 'PAID' AND OLD.due_date IS NOT NULL)
+        OR OLD.paid_date IS NOT NULL
+    ) THEN
+        PERFORM public.refresh_loan_stat_dates(OLD.loan_id);
+        IF TG_OP = 'UPDATE' AND NEW.loan_id IS DISTINCT FROM OLD.loan_id THEN
+            PERFORM public.refresh_loan_stat_dates(NEW.loan_id);
+        END IF;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS loan_stats_installments_changed ON public.installments;
+CREATE TRIGGER loan_stats_installments_changed
+    AFTER INSERT OR UPDATE OR DELETE ON public.installments
+    FOR EACH ROW EXECUTE FUNCTION public.loan_stats_installments_trigger();
+
+
+-- Full rebuild from the installments table (repair / first use)
+CREATE OR REPLACE FUNCTION public.rebuild_loan_stats(p_user_id UUID)
+RETURNS INTEGER AS $$
+DECLARE
+    v_updated INTEGER;
+BEGIN
+    UPDATE public.loans l
+    SET installment_count = COALESCE(s.installment_count, 0),
+        unpaid_count = COALESCE(s.unpaid_count, 0),
+        outstanding_amount = COALESCE(s.outstanding_amount, 0),
+        paid_total = COALESCE(s.paid_total, 0),
+        next_due_date = s.next_due_date,
+        last_paid_date = s.last_paid_date
+    FROM public.loans base
+    LEFT JOIN (
+        SELECT
+            loan_id,
+            COUNT(*) AS installment_count,
+            COUNT(*) FILTER (WHERE status <> 'PAID') AS unpaid_count,
+            SUM(expected_amount - COALESCE(paid_amount, 0)) FILTER (WHERE status <> 'PAID') AS outstanding_amount,
+            SUM(COALESCE(paid_amount, 0)) AS paid_total,
+            MIN(due_date) FILTER (WHERE status <> 'PAID') AS next_due_date,
+            MAX(paid_date) AS last_paid_date
+        FROM public.installments
+        WHERE user_id = p_user_id
+        GROUP BY loan_id
+    ) s ON s.loan_id = base.id
+    WHERE l.id = base.id
+      AND base.user_id = p_user_id;
+    GET DIAGNOSTICS v_updated = ROW_COUNT;
+
+    RETURN v_updated;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Backfill existing users
+SELECT public.rebuild_loan_stats(id) FROM public.users;
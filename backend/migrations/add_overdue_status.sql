@@ -0,0 +1,110 @@
+-- Overdue installment status (overdue job in overdue.py, GET /installments/overdue)
+-- Run this in Supabase SQL Editor
+--
+-- An installment is overdue when it is unpaid and its due date has passed.
+-- A scheduled job stores that in `status`: each run flips PENDING rows that
+-- fell due to OVERDUE (and OVERDUE rows whose due date was moved forward
+-- back to PENDING) in one bulk update. Overdue listings and counts read
+-- `status IN ('PENDING', 'OVERDUE') AND due_date < today`, which matches the
+-- stored status after a run and is exact before it, through the index below.
+
+-- Per-user overdue listings and counts: two index range scans, in
+-- (due_date, id) order for GET /installments/overdue's keyset pages.
+-- The idx_installments_user_status_due (user_id, status, due_date) that older
+-- schema.sql versions created is a prefix of it, so it is dropped. Both
+-- statements run without CONCURRENTLY because the SQL Editor runs the script
+-- in one transaction.
+CREATE INDEX IF NOT EXISTS idx_installments_user_status_due_id
+    ON public.installments(user_id, status, due_date, id);
+
+DROP INDEX IF EXISTS public.idx_installments_user_status_due;
+
+-- The job's bulk update across every user
+CREATE INDEX IF NOT EXISTS idx_installments_status_due
+    ON public.installments(status, due_date)
+    WHERE status <> 'PAID';
+
+
+-- Flip installment statuses to match p_today (one user, or all when NULL);
+-- returns the number of installments changed per user
+CREATE OR REPLACE FUNCTION public.mark_overdue_installments(p_today DATE, p_user_id UUID DEFAULT NULL)
+RETURNS TABLE (user_id UUID, changed BIGINT) AS $$
+    WITH fell_due AS (
+        UPDATE public.installments i
+        SET status = 'OVERDUE', updated_at = NOW()
+        WHERE i.status = 'PENDING'
+          AND i.due_date < p_today
+          AND (p_user_id IS NULL OR i.user_id = p_user_id)
+        RETURNING i.user_id
+    ),
+    not_due AS (
+        UPDATE public.installments i
+        SET status = 'PENDING', updated_at = NOW()
+        WHERE i.status = 'OVERDUE'
+          AND i.due_date >= p_today
+          AND (p_user_id IS NULL OR i.user_id = p_user_id)
+        RETURNING i.user_id
+    )
+    SELECT c.user_id, COUNT(*)
+    FROM (SELECT * FROM fell_due UNION ALL SELECT * FROM not_due) c
+    GROUP BY c.user_id;
+$$ LANGUAGE sql;
+
+
+-- Monthly_Summary counts pending / overdue by due date, like the dashboard
+-- (previously it counted the stored status, which nothing maintained).
+-- Mirrors analytics.compute_monthly_summary.
+DROP FUNCTION IF EXISTS public.portfolio_monthly_summary(UUID);
+
+CREATE OR REPLACE FUNCTION public.portfolio_monthly_summary(p_user_id UUID, p_today DATE DEFAULT CURRENT_DATE)
+RETURNS TABLE (
+    total_loans BIGINT,
+    active_loans BIGINT,
+    total_disbursed NUMERIC,
+    total_installments_collected NUMERIC,
+    total_inflow NUMERIC,
+    total_outflow NUMERIC,
+    pending_installments BIGINT,
+    overdue_installments BIGINT
+)
+AS $$
+    WITH loan_totals AS (
+        SELECT
+            COUNT(*) AS total_loans,
+            COUNT(*) FILTER (WHERE status = 'ACTIVE') AS active_loans,
+            COALESCE(SUM(principal_amount), 0) AS total_disbursed
+        FROM public.loans
+        WHERE user_id = p_user_id
+    ),
+    installment_totals AS (
+        SELECT
+            COALESCE(SUM(COALESCE(paid_amount, 0)), 0) AS collected,
+            COUNT(*) FILTER (WHERE status <> 'PAID' AND due_date >= p_today) AS pending,
+            COUNT(*) FILTER (WHERE status <> 'PAID' AND due_date < p_today) AS overdue
+        FROM public.installments
+        WHERE user_id = p_user_id
+    ),
+    transaction_totals AS (
+        SELECT
+            COALESCE(SUM(amount) FILTER (WHERE type = 'CREDIT'), 0) AS credit,
+            COALESCE(SUM(amount) FILTER (WHERE type = 'DEBIT'), 0) AS debit
+        FROM public.transactions
+        WHERE user_id = p_user_id
+    )
+    SELECT
+        l.total_loans,
+        l.active_loans,
+        l.total_disbursed,
+        i.collected,
+        -- Total Inflow = Installments + Credit Txns
+        i.collected + t.credit,
+        -- Total Outflow = Disbursements + Debit Txns
+        l.total_disbursed + t.debit,
+        i.pending,
+        i.overdue
+    FROM loan_totals l, installment_totals i, transaction_totals t;
+$$ LANGUAGE sql STABLE;
+
+
+-- Backfill
+SELECT * FROM public.mark_overdue_installments(CURRENT_DATE);
@@ -0,0 +1,22 @@
+-- Overdue count and amount for the financial summary (aggregates.fetch_overdue)
+-- Run this in Supabase SQL Editor
+--
+-- Same predicate as overdue.overdue_filter (status IN ('PENDING', 'OVERDUE')
+-- AND due_date < today), aggregated in the database so the summary does not
+-- fetch every overdue row. Reads through idx_installments_user_status_due_id
+-- (add_overdue_status.sql).
+
+CREATE OR REPLACE FUNCTION public.overdue_summary(p_user_id UUID, p_today DATE DEFAULT CURRENT_DATE)
+RETURNS TABLE (
+    overdue_count BIGINT,
+    overdue_amount NUMERIC
+)
+AS $$
+    SELECT
+        COUNT(*),
+        COALESCE(SUM(i.expected_amount - COALESCE(i.paid_amount, 0)), 0)
+    FROM public.installments i
+    WHERE i.user_id = p_user_id
+      AND i.status IN ('PENDING', 'OVERDUE')
+      AND i.due_date < p_today;
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,307 @@
+-- Incrementally maintained portfolio aggregates for GET /transactions/summary/financial
+-- Run this in Supabase SQL Editor
+--
+-- One row per user, kept current by triggers on loans, installments and
+-- transactions, so the dashboard summary is a single primary-key read.
+-- Overdue figures depend on today's date and are still queried at read time.
+
+CREATE TABLE IF NOT EXISTS public.portfolio_aggregates (
+    user_id UUID PRIMARY KEY REFERENCES public.users(id) ON DELETE CASCADE,
+    total_loans INTEGER NOT NULL DEFAULT 0,
+    active_loans INTEGER NOT NULL DEFAULT 0,
+    total_disbursed NUMERIC NOT NULL DEFAULT 0,
+    market_amount NUMERIC NOT NULL DEFAULT 0,
+    market_principal NUMERIC NOT NULL DEFAULT 0,
+    market_interest NUMERIC NOT NULL DEFAULT 0,
+    total_interest_expected NUMERIC NOT NULL DEFAULT 0,
+    total_collected NUMERIC NOT NULL DEFAULT 0,
+    total_inflow NUMERIC NOT NULL DEFAULT 0,
+    total_outflow NUMERIC NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+ALTER TABLE public.portfolio_aggregates ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view their own portfolio aggregates" ON public.portfolio_aggregates;
+CREATE POLICY "Users can view their own portfolio aggregates" ON public.portfolio_aggregates
+    FOR SELECT USING (auth.uid() = user_id);
+
+
+-- Add a delta to a user's aggregates (creates the row on first write)
+CREATE OR REPLACE FUNCTION public.apply_portfolio_delta(
+    p_user_id UUID,
+    p_total_loans INTEGER DEFAULT 0,
+    p_active_loans INTEGER DEFAULT 0,
+    p_total_disbursed NUMERIC DEFAULT 0,
+    p_market_amount NUMERIC DEFAULT 0,
+    p_market_principal NUMERIC DEFAULT 0,
+    p_market_interest NUMERIC DEFAULT 0,
+    p_total_interest_expected NUMERIC DEFAULT 0,
+    p_total_collected NUMERIC DEFAULT 0,
+    p_total_inflow NUMERIC DEFAULT 0,
+    p_total_outflow NUMERIC DEFAULT 0
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO public.portfolio_aggregates AS agg (
+        user_id, total_loans, active_loans, total_disbursed,
+        market_amount, market_principal, market_interest,
+        total_interest_expected, total_collected, total_inflow, total_outflow
+    )
+    VALUES (
+        p_user_id, p_total_loans, p_active_loans, p_total_disbursed,
+        p_market_amount, p_market_principal, p_market_interest,
+        p_total_interest_expected, p_total_collected, p_total_inflow, p_total_outflow
+    )
+    ON CONFLICT (user_id) DO UPDATE SET
+        total_loans = agg.total_loans + EXCLUDED.total_loans,
+        active_loans = agg.active_loans + EXCLUDED.active_loans,
+        total_disbursed = agg.total_disbursed + EXCLUDED.total_disbursed,
+        market_amount = agg.market_amount + EXCLUDED.market_amount,
+        market_principal = agg.market_principal + EXCLUDED.market_principal,
+        market_interest = agg.market_interest + EXCLUDED.market_interest,
+        total_interest_expected = agg.total_interest_expected + EXCLUDED.total_interest_expected,
+        total_collected = agg.total_collected + EXCLUDED.total_collected,
+        total_inflow = agg.total_inflow + EXCLUDED.total_inflow,
+        total_outflow = agg.total_outflow + EXCLUDED.total_outflow,
+        updated_at = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Apply (p_sign = 1) or retract (p_sign = -1) what a loan contributes.
+-- The installment totals are passed in, so the same rule serves a single
+-- installment (p_include_loan = FALSE) and a whole loan with all its
+-- installments (p_include_loan = TRUE). Mirrors analytics.compute_financial_summary.
+CREATE OR REPLACE FUNCTION public.apply_loan_portfolio_delta(
+    p_loan public.loans,
+    p_sign INTEGER,
+    p_include_loan BOOLEAN,
+    p_collected NUMERIC,
+    p_unpaid_remaining NUMERIC,
+    p_interest_only_expected NUMERIC
+)
+RETURNS VOID AS $$
+DECLARE
+    v_principal NUMERIC := COALESCE(p_loan.principal_amount, 0);
+    v_total_repay NUMERIC;
+    v_loans INTEGER := 0;
+    v_active INTEGER := 0;
+    v_disbursed NUMERIC := 0;
+    v_market NUMERIC := 0;
+    v_market_principal NUMERIC := 0;
+    v_market_interest NUMERIC := 0;
+    v_interest_expected NUMERIC := 0;
+BEGIN
+    IF p_include_loan THEN
+        v_loans := 1;
+        v_active := CASE WHEN p_loan.status = 'ACTIVE' THEN 1 ELSE 0 END;
+        v_disbursed := v_principal;
+    END IF;
+
+    IF p_loan.type = 'TOTAL_RATE' THEN
+        v_total_repay := v_principal * COALESCE(p_loan.total_rate_multiplier, 1.2);
+        IF p_include_loan THEN
+            v_interest_expected := v_total_repay - v_principal;
+        END IF;
+        -- Amortized principal vs interest of unpaid installments
+        IF p_loan.status <> 'COMPLETED' AND v_total_repay <> 0 THEN
+            v_market := p_unpaid_remaining;
+            v_market_principal := p_unpaid_remaining * (v_principal / v_total_repay);
+            v_market_interest := p_unpaid_remaining * ((v_total_repay - v_principal) / v_total_repay);
+        END IF;
+    ELSE
+        -- DAILY_RATE
+        v_interest_expected := p_interest_only_expected;
+        IF p_include_loan AND p_loan.status = 'ACTIVE' THEN
+            v_market := v_principal;
+            v_market_principal := v_principal;
+        END IF;
+        v_market := v_market + p_unpaid_remaining;
+        v_market_interest := p_unpaid_remaining;
+    END IF;
+
+    PERFORM public.apply_portfolio_delta(
+        p_loan.user_id,
+        p_sign * v_loans,
+        p_sign * v_active,
+        p_sign * v_disbursed,
+        p_sign * v_market,
+        p_sign * v_market_principal,
+        p_sign * v_market_interest,
+        p_sign * v_interest_expected,
+        p_sign * p_collected
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Installment totals of one loan, in the shape apply_loan_portfolio_delta expects
+CREATE OR REPLACE FUNCTION public.loan_installment_totals(
+    p_loan_id UUID,
+    OUT collected NUMERIC,
+    OUT unpaid_remaining NUMERIC,
+    OUT interest_only_expected NUMERIC
+)
+AS $$
+    SELECT
+        COALESCE(SUM(COALESCE(paid_amount, 0)), 0),
+        COALESCE(SUM(expected_amount - COALESCE(paid_amount, 0)) FILTER (WHERE status <> 'PAID'), 0),
+        COALESCE(SUM(expected_amount) FILTER (WHERE type = 'INTEREST_ONLY'), 0)
+    FROM public.installments
+    WHERE loan_id = p_loan_id;
+$$ LANGUAGE sql STABLE;
+
+
+CREATE OR REPLACE FUNCTION public.portfolio_installments_trigger()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_loan public.loans;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        -- Parent loan missing means it is being deleted; its BEFORE DELETE
+        -- trigger already retracted all of its installments.
+        SELECT * INTO v_loan FROM public.loans WHERE id = OLD.loan_id;
+        IF FOUND THEN
+            PERFORM public.apply_loan_portfolio_delta(
+                v_loan, -1, FALSE,
+                COALESCE(OLD.paid_amount, 0),
+                CASE WHEN OLD.status <> 'PAID' THEN OLD.expected_amount - COALESCE(OLD.paid_amount, 0) ELSE 0 END,
+                CASE WHEN OLD.type = 'INTEREST_ONLY' THEN OLD.expected_amount ELSE 0 END
+            );
+        END IF;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT * INTO v_loan FROM public.loans WHERE id = NEW.loan_id;
+        IF FOUND THEN
+            PERFORM public.apply_loan_portfolio_delta(
+                v_loan, 1, FALSE,
+                COALESCE(NEW.paid_amount, 0),
+                CASE WHEN NEW.status <> 'PAID' THEN NEW.expected_amount - COALESCE(NEW.paid_amount, 0) ELSE 0 END,
+                CASE WHEN NEW.type = 'INTEREST_ONLY' THEN NEW.expected_amount ELSE 0 END
+            );
+        END IF;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION public.portfolio_loans_trigger()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_totals RECORD;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM public.apply_loan_portfolio_delta(NEW, 1, TRUE, 0, 0, 0);
+        RETURN NULL;
+    END IF;
+
+    SELECT * INTO v_totals FROM public.loan_installment_totals(OLD.id);
+    PERFORM public.apply_loan_portfolio_delta(
+        OLD, -1, TRUE, v_totals.collected, v_totals.unpaid_remaining, v_totals.interest_only_expected
+    );
+
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM public.apply_loan_portfolio_delta(
+            NEW, 1, TRUE, v_totals.collected, v_totals.unpaid_remaining, v_totals.interest_only_expected
+        );
+        RETURN NULL;
+    END IF;
+
+    -- BEFORE DELETE: installments are still present here
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION public.portfolio_transactions_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM public.apply_portfolio_delta(
+            OLD.user_id,
+            p_total_inflow => CASE WHEN OLD.type = 'CREDIT' THEN -OLD.amount ELSE 0 END,
+            p_total_outflow => CASE WHEN OLD.type = 'DEBIT' THEN -OLD.amount ELSE 0 END
+        );
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM public.apply_portfolio_delta(
+            NEW.user_id,
+            p_total_inflow => CASE WHEN NEW.type = 'CREDIT' THEN NEW.amount ELSE 0 END,
+            p_total_outflow => CASE WHEN NEW.type = 'DEBIT' THEN NEW.amount ELSE 0 END
+        );
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+DROP TRIGGER IF EXISTS portfolio_installments_changed ON public.installments;
+CREATE TRIGGER portfolio_installments_changed
+    AFTER INSERT OR UPDATE OR DELETE ON public.installments
+    FOR EACH ROW EXECUTE FUNCTION public.portfolio_installments_trigger();
+
+DROP TRIGGER IF EXISTS portfolio_loans_inserted ON public.loans;
+CREATE TRIGGER portfolio_loans_inserted
+    AFTER INSERT ON public.loans
+    FOR EACH ROW EXECUTE FUNCTION public.portfolio_loans_trigger();
+
+DROP TRIGGER IF EXISTS portfolio_loans_updated ON public.loans;
+CREATE TRIGGER portfolio_loans_updated
+    AFTER UPDATE ON public.loans
+    FOR EACH ROW
+    WHEN (
+        OLD.status IS DISTINCT FROM NEW.status
+        OR OLD.type IS DISTINCT FROM NEW.type
+        OR OLD.principal_amount IS DISTINCT FROM NEW.principal_amount
+        OR OLD.total_rate_multiplier IS DISTINCT FROM NEW.total_rate_multiplier
+        OR OLD.user_id IS DISTINCT FROM NEW.user_id
+    )
+    EXECUTE FUNCTION public.portfolio_loans_trigger();
+
+DROP TRIGGER IF EXISTS portfolio_loans_deleted ON public.loans;
+CREATE TRIGGER portfolio_loans_deleted
+    BEFORE DELETE ON public.loans
+    FOR EACH ROW EXECUTE FUNCTION public.portfolio_loans_trigger();
+
+DROP TRIGGER IF EXISTS portfolio_transactions_changed ON public.transactions;
+CREATE TRIGGER portfolio_transactions_changed
+    AFTER INSERT OR UPDATE OR DELETE ON public.transactions
+    FOR EACH ROW EXECUTE FUNCTION public.portfolio_transactions_trigger();
+
+
+-- Full rebuild from the live tables (repair / first use)
+CREATE OR REPLACE FUNCTION public.rebuild_portfolio_aggregates(p_user_id UUID)
+RETURNS SETOF public.portfolio_aggregates AS $$
+BEGIN
+    DELETE FROM public.portfolio_aggregates WHERE user_id = p_user_id;
+
+    INSERT INTO public.portfolio_aggregates (user_id) VALUES (p_user_id);
+
+    PERFORM public.apply_loan_portfolio_delta(
+        l, 1, TRUE, t.collected, t.unpaid_remaining, t.interest_only_expected
+    )
+    FROM public.loans l
+    CROSS JOIN LATERAL public.loan_installment_totals(l.id) t
+    WHERE l.user_id = p_user_id;
+
+    PERFORM public.apply_portfolio_delta(
+        p_user_id,
+        p_total_inflow => COALESCE(SUM(amount) FILTER (WHERE type = 'CREDIT'), 0),
+        p_total_outflow => COALESCE(SUM(amount) FILTER (WHERE type = 'DEBIT'), 0)
+    )
+    FROM public.transactions
+    WHERE user_id = p_user_id;
+
+    RETURN QUERY SELECT * FROM public.portfolio_aggregates WHERE user_id = p_user_id;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Backfill existing users
+SELECT public.rebuild_portfolio_aggregates(id) FROM public.users;
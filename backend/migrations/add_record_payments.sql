@@ -0,0 +1,137 @@
+-- Composite payment recording for POST /installments/payments
+-- Run this in Supabase SQL Editor
+--
+-- Marks installments PAID, writes the matching CREDIT transactions and
+-- recomputes the status of each affected loan once - all in one database
+-- transaction, so a failure leaves nothing half-recorded.
+--
+-- p_payments: [{"installment_id": uuid, "amount": numeric?, "paid_date": date?,
+--               "category": text?, "description": text?}, ...]
+
+CREATE OR REPLACE FUNCTION public.record_payments(p_user_id UUID, p_payments JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    v_requested INTEGER;
+    v_found INTEGER;
+    v_already_paid UUID;
+    v_installments JSONB;
+    v_transactions JSONB;
+    v_loans JSONB;
+BEGIN
+    DROP TABLE IF EXISTS _payments;
+    CREATE TEMP TABLE _payments ON COMMIT DROP AS
+    SELECT *
+    FROM jsonb_to_recordset(p_payments) AS p(
+        installment_id UUID,
+        amount NUMERIC,
+        paid_date DATE,
+        category TEXT,
+        description TEXT
+    );
+
+    SELECT COUNT(DISTINCT installment_id) INTO v_requested FROM _payments;
+    IF v_requested <> (SELECT COUNT(*) FROM _payments) THEN
+        RAISE EXCEPTION 'The same installment appears more than once' USING ERRCODE = 'P0001';
+    END IF;
+
+    -- Lock the installments being paid
+    SELECT COUNT(*) INTO v_found
+    FROM (
+        SELECT i.id
+        FROM public.installments i
+        JOIN _payments p ON p.installment_id = i.id
+        WHERE i.user_id = p_user_id
+        FOR UPDATE OF i
+    ) locked;
+
+    IF v_found <> v_requested THEN
+        RAISE EXCEPTION 'Installment not found' USING ERRCODE = 'P0002';
+    END IF;
+
+    SELECT i.id INTO v_already_paid
+    FROM public.installments i
+    JOIN _payments p ON p.installment_id = i.id
+    WHERE i.status = 'PAID'
+    LIMIT 1;
+
+    IF v_already_paid IS NOT NULL THEN
+        RAISE EXCEPTION 'Installment % is already paid', v_already_paid USING ERRCODE = 'P0001';
+    END IF;
+
+    WITH paid AS (
+        UPDATE public.installments i
+        SET status = 'PAID',
+            paid_amount = COALESCE(p.amount, i.expected_amount + COALESCE(i.penalty, 0)),
+            paid_date = COALESCE(p.paid_date, CURRENT_DATE)
+        FROM _payments p
+        WHERE p.installment_id = i.id
+        RETURNING i.*, p.category AS payment_category, p.description AS payment_description
+    ),
+    credited AS (
+        INSERT INTO public.transactions (user_id, date, amount, type, category, description, related_entity_id)
+        SELECT
+            p_user_id,
+            NOW(),
+            paid.paid_amount,
+            'CREDIT',
+            COALESCE(paid.payment_category, 'Repayment'),
+            COALESCE(paid.payment_description, 'Payment from ' || paid.client_name || ' (' || paid.type || ')'),
+            -- Not linked to the loan: deleting a loan removes its linked
+            -- transactions (loans_router.delete_loan), not its repayments
+            NULL
+        FROM paid
+        WHERE paid.paid_amount > 0
+        RETURNING *
+    )
+    SELECT
+        COALESCE((SELECT jsonb_agg(to_jsonb(paid) - 'payment_category' - 'payment_description') FROM paid), '[]'::jsonb),
+        COALESCE((SELECT jsonb_agg(to_jsonb(credited)) FROM credited), '[]'::jsonb)
+    INTO v_installments, v_transactions;
+
+    -- Recompute status once per affected loan (CLOSED / BAD_DEBT are left alone);
+    -- only loans whose status changes are written, so their triggers don't fire
+    WITH affected AS (
+        SELECT a.loan_id,
+            CASE
+                WHEN EXISTS (
+                    SELECT 1 FROM public.installments u
+                    WHERE u.loan_id = a.loan_id AND u.status <> 'PAID'
+                ) THEN 'ACTIVE'
+                ELSE 'COMPLETED'
+            END AS new_status
+        FROM (
+            SELECT DISTINCT i.loan_id
+            FROM public.installments i
+            JOIN _payments p ON p.installment_id = i.id
+        ) a
+    ),
+    updated AS (
+        UPDATE public.loans l
+        SET status = affected.new_status
+        FROM affected
+        WHERE l.id = affected.loan_id
+          AND l.status IN ('ACTIVE', 'COMPLETED')
+          AND l.status IS DISTINCT FROM affected.new_status
+        RETURNING l.id, l.status
+    )
+    SELECT COALESCE(jsonb_agg(jsonb_build_object('id', id, 'status', status)), '[]'::jsonb)
+    INTO v_loans
+    FROM updated;
+
+    RETURN jsonb_build_object(
+        'installments', v_installments,
+        'transactions', v_transactions,
+        'loans', v_loans
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Earlier versions of record_payments linked repayment CREDITs to their loan,
+-- so deleting the loan erased them. Unlink them; the CREDITs the app links on
+-- purpose (processing fee, advance installment) keep their categories.
+UPDATE public.transactions
+SET related_entity_id = NULL
+WHERE type = 'CREDIT'
+  AND related_entity_id IS NOT NULL
+  AND category NOT IN ('Processing Fee', 'Loan Repayment');
@@ -0,0 +1,215 @@
+-- Set-based reporting functions, called via db.rpc(...) (see reports.py)
+-- Run this in Supabase SQL Editor
+--
+-- Each function returns finished aggregates, so callers no longer pull every
+-- loan, installment and transaction row to sum them in Python. The Python
+-- versions in analytics.py remain the fallback and the reference.
+
+
+-- Per-loan installment totals, one row per loan of the user
+CREATE OR REPLACE FUNCTION public.portfolio_loan_totals(p_user_id UUID)
+RETURNS TABLE (
+    loan_id UUID,
+    received NUMERIC,
+    unpaid_remaining NUMERIC,
+    interest_only_expected NUMERIC
+)
+AS $$
+    SELECT
+        loan_id,
+        COALESCE(SUM(COALESCE(paid_amount, 0)), 0),
+        COALESCE(SUM(expected_amount - COALESCE(paid_amount, 0)) FILTER (WHERE status <> 'PAID'), 0),
+        COALESCE(SUM(expected_amount) FILTER (WHERE type = 'INTEREST_ONLY'), 0)
+    FROM public.installments
+    WHERE user_id = p_user_id
+    GROUP BY loan_id;
+$$ LANGUAGE sql STABLE;
+
+
+-- Market value split of every loan. Mirrors analytics.compute_investment_breakdown.
+CREATE OR REPLACE FUNCTION public.portfolio_investment_breakdown(p_user_id UUID)
+RETURNS TABLE (
+    loan_id UUID,
+    person TEXT,
+    start_date DATE,
+    cycle TEXT,
+    capital NUMERIC,
+    interest_percentage NUMERIC,
+    received NUMERIC,
+    mkt_principal NUMERIC,
+    mkt_interest NUMERIC,
+    total_market_value NUMERIC,
+    interest_expected NUMERIC,
+    status TEXT
+)
+AS $$
+    WITH per_loan AS (
+        SELECT
+            l.id,
+            l.client_name,
+            l.start_date,
+            l.frequency,
+            l.type,
+            l.status,
+            l.principal_amount AS principal,
+            COALESCE(l.total_rate_multiplier, 1.2) AS multiplier,
+            l.principal_amount * COALESCE(l.total_rate_multiplier, 1.2) AS total_repay,
+            COALESCE(l.daily_rate_per_lakh, 100) AS daily_rate,
+            COALESCE(t.received, 0) AS received,
+            COALESCE(t.unpaid_remaining, 0) AS unpaid_remaining,
+            COALESCE(t.interest_only_expected, 0) AS interest_only_expected,
+            l.created_at
+        FROM public.loans l
+        LEFT JOIN public.portfolio_loan_totals(p_user_id) t ON t.loan_id = l.id
+        WHERE l.user_id = p_user_id
+    ),
+    market AS (
+        SELECT
+            per_loan.*,
+            CASE
+                WHEN type = 'TOTAL_RATE' THEN
+                    CASE WHEN status <> 'COMPLETED' THEN unpaid_remaining * (principal / total_repay) ELSE 0 END
+                ELSE
+                    CASE WHEN status = 'ACTIVE' THEN principal ELSE 0 END
+            END AS mkt_principal,
+            CASE
+                WHEN type = 'TOTAL_RATE' THEN
+                    CASE WHEN status <> 'COMPLETED' THEN unpaid_remaining * ((total_repay - principal) / total_repay) ELSE 0 END
+                ELSE
+                    unpaid_remaining
+            END AS mkt_interest
+        FROM per_loan
+    )
+    SELECT
+        id,
+        client_name,
+        start_date,
+        CASE WHEN frequency ~ '^[0-9]+$' THEN frequency || 'd' ELSE frequency END,
+        principal,
+        CASE WHEN type = 'TOTAL_RATE' THEN (multiplier - 1) * 100 ELSE daily_rate END,
+        received,
+        mkt_principal,
+        mkt_interest,
+        mkt_principal + mkt_interest,
+        CASE WHEN type = 'TOTAL_RATE' THEN total_repay - principal ELSE interest_only_expected END,
+        status
+    FROM market
+    ORDER BY created_at, id;
+$$ LANGUAGE sql STABLE;
+
+
+-- Every FinancialSummary field in one row. Mirrors analytics.compute_financial_summary.
+-- market_amount is mkt_principal + mkt_interest of every loan.
+CREATE OR REPLACE FUNCTION public.portfolio_financial_summary(
+    p_user_id UUID,
+    p_today DATE DEFAULT CURRENT_DATE
+)
+RETURNS TABLE (
+    total_loans BIGINT,
+    active_loans BIGINT,
+    total_disbursed NUMERIC,
+    market_amount NUMERIC,
+    market_principal NUMERIC,
+    market_interest NUMERIC,
+    total_interest_expected NUMERIC,
+    cash_in_hand NUMERIC,
+    total_collected NUMERIC,
+    total_inflow NUMERIC,
+    total_outflow NUMERIC,
+    overdue_count BIGINT,
+    overdue_amount NUMERIC
+)
+AS $$
+    WITH loan_totals AS (
+        SELECT
+            COUNT(*) AS total_loans,
+            COUNT(*) FILTER (WHERE status = 'ACTIVE') AS active_loans,
+            COALESCE(SUM(capital), 0) AS total_disbursed,
+            COALESCE(SUM(total_market_value), 0) AS market_amount,
+            COALESCE(SUM(mkt_principal), 0) AS market_principal,
+            COALESCE(SUM(mkt_interest), 0) AS market_interest,
+            COALESCE(SUM(interest_expected), 0) AS total_interest_expected
+        FROM public.portfolio_investment_breakdown(p_user_id)
+    ),
+    installment_totals AS (
+        SELECT
+            COALESCE(SUM(COALESCE(paid_amount, 0)), 0) AS total_collected,
+            COUNT(*) FILTER (WHERE status <> 'PAID' AND due_date < p_today) AS overdue_count,
+            COALESCE(SUM(expected_amount - COALESCE(paid_amount, 0)) FILTER (WHERE status <> 'PAID' AND due_date < p_today), 0) AS overdue_amount
+        FROM public.installments
+        WHERE user_id = p_user_id
+    ),
+    transaction_totals AS (
+        SELECT
+            COALESCE(SUM(amount) FILTER (WHERE type = 'CREDIT'), 0) AS total_inflow,
+            COALESCE(SUM(amount) FILTER (WHERE type = 'DEBIT'), 0) AS total_outflow
+        FROM public.transactions
+        WHERE user_id = p_user_id
+    )
+    SELECT
+        l.total_loans,
+        l.active_loans,
+        l.total_disbursed,
+        l.market_amount,
+        l.market_principal,
+        l.market_interest,
+        l.total_interest_expected,
+        GREATEST(0, t.total_inflow - t.total_outflow),
+        i.total_collected,
+        t.total_inflow,
+        t.total_outflow,
+        i.overdue_count,
+        i.overdue_amount
+    FROM loan_totals l, installment_totals i, transaction_totals t;
+$$ LANGUAGE sql STABLE;
+
+
+-- Metrics for the archive's Monthly_Summary sheet. Mirrors analytics.compute_monthly_summary.
+CREATE OR REPLACE FUNCTION public.portfolio_monthly_summary(p_user_id UUID)
+RETURNS TABLE (
+    total_loans BIGINT,
+    active_loans BIGINT,
+    total_disbursed NUMERIC,
+    total_installments_collected NUMERIC,
+    total_inflow NUMERIC,
+    total_outflow NUMERIC,
+    pending_installments BIGINT,
+    overdue_installments BIGINT
+)
+AS $$
+    WITH loan_totals AS (
+        SELECT
+            COUNT(*) AS total_loans,
+            COUNT(*) FILTER (WHERE status = 'ACTIVE') AS active_loans,
+            COALESCE(SUM(principal_amount), 0) AS total_disbursed
+        FROM public.loans
+        WHERE user_id = p_user_id
+    ),
+    installment_totals AS (
+        SELECT
+            COALESCE(SUM(COALESCE(paid_amount, 0)), 0) AS collected,
+            COUNT(*) FILTER (WHERE status = 'PENDING') AS pending,
+            COUNT(*) FILTER (WHERE status = 'OVERDUE') AS overdue
+        FROM public.installments
+        WHERE user_id = p_user_id
+    ),
+    transaction_totals AS (
+        SELECT
+            COALESCE(SUM(amount) FILTER (WHERE type = 'CREDIT'), 0) AS credit,
+            COALESCE(SUM(amount) FILTER (WHERE type = 'DEBIT'), 0) AS debit
+        FROM public.transactions
+        WHERE user_id = p_user_id
+    )
+    SELECT
+        l.total_loans,
+        l.active_loans,
+        l.total_disbursed,
+        i.collected,
+        -- Total Inflow = Installments + Credit Txns
+        i.collected + t.credit,
+        -- Total Outflow = Disbursements + Debit Txns
+        l.total_disbursed + t.debit,
+        i.pending,
+        i.overdue
+    FROM loan_totals l, installment_totals i, transaction_totals t;
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,23 @@
+-- Spreadsheet / worksheet id map for Google Sheets sync
+-- Run this in Supabase SQL Editor
+--
+-- With worksheet ids and grid sizes recorded next to the sync state, and
+-- spreadsheet ids (plus who they were shared with) recorded per title,
+-- POST /sync can send one batchUpdate per spreadsheet without a metadata
+-- fetch, Drive search or re-share. Run after add_sheet_sync_state.sql.
+
+ALTER TABLE public.sheet_sync_state
+ADD COLUMN IF NOT EXISTS sheet_id INTEGER,
+ADD COLUMN IF NOT EXISTS row_count INTEGER,
+ADD COLUMN IF NOT EXISTS col_count INTEGER;
+
+CREATE TABLE IF NOT EXISTS public.user_spreadsheets (
+    user_id UUID NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+    title TEXT NOT NULL,
+    spreadsheet_id TEXT NOT NULL,
+    shared_with TEXT,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (user_id, title)
+);
+
+ALTER TABLE public.user_spreadsheets ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,20 @@
+-- Incremental Google Sheets sync state
+-- Run this in Supabase SQL Editor
+--
+-- Per worksheet, the header and the (record key, content hash) of every
+-- data row last written by POST /sync, so the next sync only writes rows
+-- that changed. Deleting a row here forces a full rewrite of that sheet.
+
+CREATE TABLE IF NOT EXISTS public.sheet_sync_state (
+    spreadsheet_id TEXT NOT NULL,
+    sheet_name TEXT NOT NULL,
+    user_id UUID NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+    headers JSONB,
+    layout JSONB NOT NULL DEFAULT '[]'::jsonb,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (spreadsheet_id, sheet_name)
+);
+
+CREATE INDEX IF NOT EXISTS idx_sheet_sync_state_user ON public.sheet_sync_state(user_id);
+
+ALTER TABLE public.sheet_sync_state ENABLE ROW LEVEL SECURITY;
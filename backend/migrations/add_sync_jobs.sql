@@ -0,0 +1,37 @@
+-- Google Sheets sync jobs
+-- Run this in Supabase SQL Editor
+--
+-- POST /sync records a job here and the API's sync worker pool runs it
+-- (see sync_jobs.py). A user has at most one queued job - further requests
+-- are merged into it - so the partial unique index below also guards
+-- against two requests queueing at the same moment.
+
+CREATE TABLE IF NOT EXISTS public.sync_jobs (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    user_id UUID NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+    status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+    create_archive BOOLEAN NOT NULL DEFAULT FALSE,
+    full_rewrite BOOLEAN NOT NULL DEFAULT FALSE,
+    coalesced INTEGER NOT NULL DEFAULT 0,
+    rows_written INTEGER,
+    duration_ms INTEGER,
+    error TEXT,
+    result JSONB,
+    requested_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_sync_jobs_one_queued_per_user
+    ON public.sync_jobs(user_id) WHERE status = 'queued';
+
+CREATE INDEX IF NOT EXISTS idx_sync_jobs_status ON public.sync_jobs(status)
+    WHERE status IN ('queued', 'running');
+
+CREATE INDEX IF NOT EXISTS idx_sync_jobs_user_requested ON public.sync_jobs(user_id, requested_at DESC);
+
+ALTER TABLE public.sync_jobs ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view their own sync jobs" ON public.sync_jobs;
+CREATE POLICY "Users can view their own sync jobs" ON public.sync_jobs
+    FOR SELECT USING (auth.uid() = user_id);
@@ -0,0 +1,41 @@
+-- Set-based loan status sync for POST /installments/sync-loan-statuses
+-- Run this in Supabase SQL Editor
+--
+-- One grouped count of unpaid installments per loan and two bulk updates,
+-- replacing a query (and possibly an update) per loan. Loans without
+-- installments are left alone. Returns the number of loans updated.
+
+CREATE OR REPLACE FUNCTION public.sync_loan_statuses(p_user_id UUID)
+RETURNS INTEGER AS $$
+DECLARE
+    v_completed INTEGER;
+    v_reactivated INTEGER;
+BEGIN
+    DROP TABLE IF EXISTS _loan_unpaid;
+    CREATE TEMP TABLE _loan_unpaid ON COMMIT DROP AS
+    SELECT loan_id, COUNT(*) FILTER (WHERE status <> 'PAID') AS unpaid
+    FROM public.installments
+    WHERE user_id = p_user_id
+    GROUP BY loan_id;
+
+    UPDATE public.loans l
+    SET status = 'COMPLETED'
+    FROM _loan_unpaid c
+    WHERE c.loan_id = l.id
+      AND l.user_id = p_user_id
+      AND c.unpaid = 0
+      AND l.status <> 'COMPLETED';
+    GET DIAGNOSTICS v_completed = ROW_COUNT;
+
+    UPDATE public.loans l
+    SET status = 'ACTIVE'
+    FROM _loan_unpaid c
+    WHERE c.loan_id = l.id
+      AND l.user_id = p_user_id
+      AND c.unpaid > 0
+      AND l.status = 'COMPLETED';
+    GET DIAGNOSTICS v_reactivated = ROW_COUNT;
+
+    RETURN v_completed + v_reactivated;
+END;
+$$ LANGUAGE plpgsql;
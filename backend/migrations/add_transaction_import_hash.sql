@@ -0,0 +1,45 @@
+-- Duplicate detection for POST /transactions/import
+-- Run this in Supabase SQL Editor
+--
+-- import_hash identifies a transaction by (date, amount, type, description).
+-- It is computed here for every insert/update so imports also detect rows
+-- entered by hand. Must stay in step with csv_import.transaction_hash().
+-- Not unique: identical manual entries on the same day remain allowed.
+
+CREATE OR REPLACE FUNCTION public.transaction_import_hash(
+    p_date TIMESTAMP WITH TIME ZONE,
+    p_amount NUMERIC,
+    p_type TEXT,
+    p_description TEXT
+)
+RETURNS TEXT AS $$
+    SELECT md5(
+        to_char(p_date AT TIME ZONE 'UTC', 'YYYY-MM-DD')
+        || '|' || to_char(p_amount, 'FM999999999999990.00')
+        || '|' || p_type
+        || '|' || lower(btrim(p_description))
+    );
+$$ LANGUAGE sql STABLE;
+
+ALTER TABLE public.transactions ADD COLUMN IF NOT EXISTS import_hash TEXT;
+
+CREATE OR REPLACE FUNCTION public.set_transaction_import_hash()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.import_hash := public.transaction_import_hash(NEW.date, NEW.amount, NEW.type, NEW.description);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS set_transaction_import_hash ON public.transactions;
+CREATE TRIGGER set_transaction_import_hash
+    BEFORE INSERT OR UPDATE ON public.transactions
+    FOR EACH ROW EXECUTE FUNCTION public.set_transaction_import_hash();
+
+-- Backfill existing rows
+UPDATE public.transactions
+SET import_hash = public.transaction_import_hash(date, amount, type, description)
+WHERE import_hash IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_transactions_user_import_hash
+    ON public.transactions(user_id, import_hash);
@@ -0,0 +1,8 @@
+-- Index for cursor pagination of GET /transactions
+-- Run this in Supabase SQL Editor
+--
+-- Pages are ordered by (date DESC, id DESC); with id in the index each page
+-- is a single range scan starting right after the previous page's last row.
+
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date_id
+    ON public.transactions(user_id, date DESC, id DESC);
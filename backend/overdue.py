@@ -0,0 +1,61 @@
+"""Overdue installments (see migrations/add_overdue_status.sql).
+
+An installment is overdue when it is unpaid and its due date has passed. A
+scheduled job stores that in `status` with one bulk update per run (PENDING
+to OVERDUE, and back for installments whose due date was moved forward).
+Listings and counts filter on `status IN (PENDING, OVERDUE)` and the due
+date, which matches the stored status after a run and is exact before it,
+and is served by the (user_id, status, due_date, id) index.
+"""
+import asyncio
+import logging
+from collections import Counter
+from datetime import date
+from typing import Dict, Optional
+from postgrest.exceptions import APIError
+from database import AsyncDatabase
+from data_versions import bump_data_version
+
+UNPAID_STATUSES = ("PENDING", "OVERDUE")
+
+
+def overdue_filter(query, today: Optional[date] = None):
+    """Restrict an installments query to overdue rows"""
+    return query.in_("status", list(UNPAID_STATUSES)).lt("due_date", (today or date.today()).isoformat())
+
+
+async def mark_overdue(db: AsyncDatabase, today: Optional[date] = None,
+                       user_id: Optional[str] = None) -> Dict[str, int]:
+    """Store overdue status as of `today` (one user, or all); returns changes per user"""
+    today_str = (today or date.today()).isoformat()
+    try:
+        response = await db.rpc(
+            "mark_overdue_installments", {"p_today": today_str, "p_user_id": user_id}
+        ).execute()
+        return {str(row["user_id"]): int(row["changed"]) for row in response.data or []}
+    except APIError as e:
+        logging.warning(f"mark_overdue_installments unavailable, updating directly: {e.message}")
+
+    def scoped(query):
+        return query.eq("user_id", user_id) if user_id else query
+
+    fell_due = await scoped(
+        db.table("installments").update({"status": "OVERDUE"}).eq("status", "PENDING").lt("due_date", today_str)
+    ).execute()
+    not_due = await scoped(
+        db.table("installments").update({"status": "PENDING"}).eq("status", "OVERDUE").gte("due_date", today_str)
+    ).execute()
+    return dict(Counter(str(row["user_id"]) for row in (fell_due.data or []) + (not_due.data or [])))
+
+
+async def run_overdue_job(db: AsyncDatabase, interval_hours: float):
+    """Mark overdue installments now and then every `interval_hours` (runs until cancelled)"""
+    while True:
+        try:
+            changed = await mark_overdue(db)
+            for changed_user in changed:
+                bump_data_version(changed_user)
+            logging.info(f"Overdue check: {sum(changed.values())} installments for {len(changed)} users")
+        except Exception:
+            logging.exception("Overdue check failed")
+        await asyncio.sleep(interval_hours * 3600)
@@ -0,0 +1,104 @@
+"""Keyset (cursor) pagination over PostgREST queries.
+
+A cursor is an opaque token encoding the sort-key values of the last row of
+a page. The next page is filtered to rows strictly after those values, so
+every page is one index range scan of `page_size + 1` rows however deep the
+client scrolls - unlike OFFSET, which reads and discards every earlier row.
+"""
+import base64
+import json
+from typing import Any, List, Optional, Sequence, Tuple
+from fastapi import HTTPException, status
+from config import settings
+
+# (column, descending) pairs; the last column must be unique (e.g. id)
+SortKey = Sequence[Tuple[str, bool]]
+
+
+def encode_cursor(row: dict, sort_key: SortKey) -> str:
+    """Encode the sort-key values of a row as an opaque cursor token"""
+    values = [row.get(column) for column, _ in sort_key]
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_key: SortKey) -> List[Any]:
+    """Decode a cursor token back to sort-key values"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        values = None
+
+    if not isinstance(values, list) or len(values) != len(sort_key) or None in values:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return values
+
+
+def _quote(value: Any) -> str:
+    """Quote a value for a PostgREST logic tree (dates contain ':' and '+')"""
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
+def keyset_filter(sort_key: SortKey, values: List[Any]) -> str:
+    """PostgREST `or` filter selecting rows strictly after `values`
+
+    For (a desc, b desc) this is: a < va OR (a = va AND b < vb)
+    """
+    branches = []
+    for i, (column, desc) in enumerate(sort_key):
+        conditions = [f"{c}.eq.{_quote(v)}" for (c, _), v in zip(sort_key[:i], values[:i])]
+        conditions.append(f"{column}.{'lt' if desc else 'gt'}.{_quote(values[i])}")
+        branches.append(conditions[0] if len(conditions) == 1 else f"and({','.join(conditions)})")
+    return ",".join(branches)
+
+
+def name_pattern(text: str) -> str:
+    """Case-insensitive substring pattern for `ilike`, with LIKE wildcards escaped"""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def clamp_page_size(limit: Optional[int]) -> int:
+    """Requested page size bounded by the configured maximum"""
+    if not limit:
+        return settings.page_size_default
+    return max(1, min(limit, settings.page_size_max))
+
+
+async def fetch_page(
+    query,
+    sort_key: SortKey,
+    cursor: Optional[str],
+    limit: Optional[int]
+) -> Tuple[List[dict], Optional[str]]:
+    """Run one page of `query` ordered by `sort_key`
+
+    Returns the rows and the cursor of the next page (None on the last page).
+    """
+    page_size = clamp_page_size(limit)
+
+    if cursor:
+        values = decode_cursor(cursor, sort_key)
+        # Redundant bound on the leading column: Postgres can't start an
+        # index scan from the `or` alone, this makes the scan begin at the cursor
+        column, desc = sort_key[0]
+        query = query.lte(column, values[0]) if desc else query.gte(column, values[0])
+        query = query.or_(keyset_filter(sort_key, values))
+
+    for column, desc in sort_key:
+        query = query.order(column, desc=desc)
+
+    # One extra row tells us whether another page exists
+    response = await query.limit(page_size + 1).execute()
+    rows = response.data
+
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_cursor(rows[-1], sort_key)
+
@@ -0,0 +1,114 @@
+"""Reports computed in Postgres (see migrations/add_reporting_functions.sql).
+
+Each report calls a set-based RPC function that returns finished
+aggregates. If the function is missing or fails, the report falls back to
+fetching the raw rows and running the Python reference in analytics.py.
+"""
+import logging
+from datetime import date
+from typing import Dict, Any, List
+from postgrest.exceptions import APIError
+from supabase import Client
+from database import AsyncDatabase, fetch_all, fetch_all_sync
+import analytics
+
+BREAKDOWN_FIELDS = (
+    "loan_id",
+    "person",
+    "start_date",
+    "cycle",
+    "capital",
+    "interest_percentage",
+    "received",
+    "mkt_principal",
+    "mkt_interest",
+    "total_market_value",
+)
+
+BREAKDOWN_NUMERIC_FIELDS = BREAKDOWN_FIELDS[4:]
+
+SUMMARY_COUNT_FIELDS = ("total_loans", "active_loans", "overdue_count")
+
+MONTHLY_COUNT_FIELDS = ("total_loans", "active_loans", "pending_installments", "overdue_installments")
+
+
+def _numbers(row: dict, count_fields: tuple) -> Dict[str, Any]:
+    """Coerce an RPC row (NUMERIC may arrive as strings) to ints and floats"""
+    return {
+        key: int(value or 0) if key in count_fields else float(value or 0)
+        for key, value in row.items()
+    }
+
+
+def _breakdown_row(row: dict) -> Dict[str, Any]:
+    entry = {field: row.get(field) for field in BREAKDOWN_FIELDS}
+    for field in BREAKDOWN_NUMERIC_FIELDS:
+        entry[field] = float(entry[field] or 0)
+    return entry
+
+
+async def get_financial_summary(db: AsyncDatabase, user_id: str) -> Dict[str, Any]:
+    """Every FinancialSummary field, aggregated in the database"""
+    try:
+        response = await db.rpc(
+            "portfolio_financial_summary",
+            {"p_user_id": user_id, "p_today": date.today().isoformat()}
+        ).execute()
+        return _numbers(response.data[0], SUMMARY_COUNT_FIELDS)
+    except APIError as e:
+        logging.warning(f"portfolio_financial_summary unavailable, computing in Python: {e.message}")
+
+    loans = await fetch_all(lambda: db.table("loans").select("*").eq("user_id", user_id).order("id"))
+    installments = await fetch_all(lambda: db.table("installments").select("*").eq("user_id", user_id).order("id"))
+    transactions = await fetch_all(lambda: db.table("transactions").select("*").eq("user_id", user_id).order("id"))
+    return analytics.compute_financial_summary(loans, installments, transactions)
+
+
+async def get_investment_breakdown(db: AsyncDatabase, user_id: str) -> List[Dict[str, Any]]:
+    """Investment breakdown of every loan, aggregated in the database"""
+    try:
+        rows = await fetch_all(lambda: db.rpc("portfolio_investment_breakdown", {"p_user_id": user_id}))
+        return [_breakdown_row(row) for row in rows]
+    except APIError as e:
+        logging.warning(f"portfolio_investment_breakdown unavailable, computing in Python: {e.message}")
+
+    loans = await fetch_all(lambda: db.table("loans").select("*").eq("user_id", user_id).order("created_at").order("id"))
+    installments = await fetch_all(lambda: db.table("installments").select("*").eq("user_id", user_id).order("id"))
+    return analytics.compute_investment_breakdown(loans, installments)
+
+
+# Sync-client variants for the Google Sheets background sync, which already
+# holds the raw rows it writes to the sheets and passes them in for the fallback.
+
+def get_investment_breakdown_sync(
+    db: Client,
+    user_id: str,
+    loans: List[dict],
+    installments: List[dict]
+) -> List[Dict[str, Any]]:
+    """Investment breakdown of every loan (background sync)"""
+    try:
+        rows = fetch_all_sync(lambda: db.rpc("portfolio_investment_breakdown", {"p_user_id": user_id}))
+        return [_breakdown_row(row) for row in rows]
+    except APIError as e:
+        logging.warning(f"portfolio_investment_breakdown unavailable, computing in Python: {e.message}")
+        return analytics.compute_investment_breakdown(loans, installments)
+
+
+def get_monthly_summary_sync(
+    db: Client,
+    user_id: str,
+    loans: List[dict],
+    installments: List[dict],
+    transactions: List[dict]
+) -> Dict[str, Any]:
+    """Monthly archive summary metrics (background sync)"""
+    try:
+        response = db.rpc(
+            "portfolio_monthly_summary",
+            {"p_user_id": user_id, "p_today": date.today().isoformat()}
+        ).execute()
+        return _numbers(response.data[0], MONTHLY_COUNT_FIELDS)
+    except APIError as e:
+        logging.warning(f"portfolio_monthly_summary unavailable, computing in Python: {e.message}")
+        return analytics.compute_monthly_summary(loans, installments, transactions)
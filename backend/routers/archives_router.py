@@ -0,0 +1,71 @@
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from auth import get_current_user_id
+import snapshots
+
+router = APIRouter(prefix="/archives", tags=["Archives"])
+
+
+@router.get("")
+async def list_archives(
+    user_id: str = Depends(get_current_user_id)
+):
+    """Manifests of the user's monthly archive snapshots, oldest first"""
+    try:
+        return await run_in_threadpool(snapshots.list_snapshots, user_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to list archives: {str(e)}"
+        )
+
+
+@router.get("/query")
+async def query_archives(
+    table: str,
+    metric: List[str] = Query(default=["count"]),
+    group_by: Optional[str] = None,
+    where: List[str] = Query(default=[]),
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    user_id: str = Depends(get_current_user_id)
+):
+    """Aggregate an archived table across monthly snapshots
+
+    `metric` is `count` or `fn:column` with fn one of sum, avg, min, max,
+    count (repeatable); `where` is `column=value` (repeatable); `start` and
+    `end` bound the periods (YYYY-MM). Returns one row per period and
+    `group_by` value. Reads only the snapshot files, never the live tables.
+    """
+    try:
+        for period in (start, end):
+            if period and not snapshots.PERIOD_PATTERN.match(period):
+                raise ValueError(f"Invalid period: {period}")
+
+        metrics = []
+        for m in metric:
+            fn, _, column = m.partition(":")
+            metrics.append((fn, column or None))
+
+        filters = {}
+        for condition in where:
+            column, found, value = condition.partition("=")
+            if not found or not column:
+                raise ValueError(f"Invalid filter: {condition}")
+            filters[column] = value
+
+        results = await run_in_threadpool(
+            snapshots.query, user_id, table, metrics, group_by, filters, start, end
+        )
+        return {"table": table, "group_by": group_by, "results": results}
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to query archives: {str(e)}"
+        )
@@ -1,13 +1,17 @@
 from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.concurrency import run_in_threadpool
 from datetime import timedelta
 from supabase import Client
-from database import get_supabase, get_supabase_admin
+from database import get_supabase, get_supabase_admin, AsyncDatabase
 from schemas import UserCreate, UserLogin, Token, UserResponse, ForgotPasswordRequest, ResetPassword
 from auth import (
     get_password_hash,
     verify_password,
     create_access_token,
-    get_current_user_id
+    get_current_user_id,
+    revoke_access_token,
+    security
 )
 from config import settings
 
@@ -22,7 +26,7 @@ async def signup(
     """Register a new user"""
     try:
         # Create user in Supabase Auth
-        auth_response = db.auth.sign_up({
+        auth_response = await run_in_threadpool(db.auth.sign_up, {
             "email": user_data.email,
             "password": user_data.password,
             "options": {
@@ -68,7 +72,7 @@ async def login(
     """Login with email and password"""
     try:
         # Authenticate with Supabase
-        auth_response = db.auth.sign_in_with_password({
+        auth_response = await run_in_threadpool(db.auth.sign_in_with_password, {
             "email": credentials.email,
             "password": credentials.password
         })
@@ -100,13 +104,13 @@ async def login(
 @router.get("/me", response_model=UserResponse)
 async def get_current_user(
     user_id: str = Depends(get_current_user_id),
-    db_admin: Client = Depends(get_supabase_admin)
+    db_admin: AsyncDatabase = Depends(get_supabase_admin)
 ):
     """Get current authenticated user details"""
     try:
         # Use admin client to bypass RLS since we've already validated the JWT token
         # The regular client would be blocked by RLS policies that check auth.uid()
-        response = db_admin.table("users").select("*").eq("id", user_id).execute()
+        response = await db_admin.table("users").select("*").eq("id", user_id).execute()
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(
@@ -128,11 +132,13 @@ async def get_current_user(
 @router.post("/logout")
 async def logout(
     db: Client = Depends(get_supabase),
-    user_id: str = Depends(get_current_user_id)
+    user_id: str = Depends(get_current_user_id),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     """Logout current user"""
     try:
-        db.auth.sign_out()
+        revoke_access_token(credentials.credentials)
+        await run_in_threadpool(db.auth.sign_out)
         return {"message": "Successfully logged out"}
     except Exception as e:
         raise HTTPException(
@@ -147,7 +153,7 @@ async def forgot_password(
     """Send a password reset email"""
     try:
         # Supabase sends the email automatically
-        db.auth.reset_password_email(request.email)
+        await run_in_threadpool(db.auth.reset_password_email, request.email)
         return {"message": "Password reset email sent. Please check your inbox."}
     except Exception as e:
         raise HTTPException(
@@ -168,9 +174,9 @@ async def reset_password(
         # if we need to bypass or the regular client if the token is passed.
         
         # Validating/Setting session with provided token
-        db.auth.set_session(request.access_token, request.refresh_token) 
+        await run_in_threadpool(db.auth.set_session, request.access_token, request.refresh_token)
         
-        auth_response = db.auth.update_user({
+        auth_response = await run_in_threadpool(db.auth.update_user, {
             "password": request.new_password
         })
         
@@ -0,0 +1,121 @@
+from fastapi import APIRouter, HTTPException, status, Depends
+from postgrest.exceptions import APIError
+from database import get_supabase_admin, AsyncDatabase
+from schemas import ChangeFeed, ChangeCursor
+from auth import get_current_user_id
+from pagination import encode_cursor, decode_cursor, clamp_page_size
+
+router = APIRouter(prefix="/changes", tags=["Changes"])
+
+# Tables covered by the feed (see migrations/add_change_log.sql)
+CHANGE_TABLES = ("loans", "installments", "transactions", "investment_breakdown")
+
+# Order of the feed: id of the writing transaction, then write sequence
+CHANGE_SORT_KEY = (("txid", False), ("seq", False))
+
+
+def _feed_unavailable(e: APIError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"Change feed unavailable (apply migrations/add_change_log.sql): {e.message}"
+    )
+
+
+def _decode_since(since: str):
+    """(txid, seq) of a feed cursor; 400 unless txid is a digit string and seq an int
+
+    Both must also fit the columns (xid8 / bigint), or the database rejects
+    them and the feed would look unavailable.
+    """
+    txid, seq = decode_cursor(since, CHANGE_SORT_KEY)
+    txid = str(txid)
+    if (not (txid.isascii() and txid.isdigit()) or int(txid) >= 2 ** 64
+            or not isinstance(seq, int) or isinstance(seq, bool) or not 0 <= seq < 2 ** 63):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return txid, seq
+
+
+@router.get("", response_model=ChangeFeed)
+async def get_changes(
+    since: str | None = None,
+    limit: int | None = None,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncDatabase = Depends(get_supabase_admin)
+):
+    """Rows inserted/updated and ids deleted since a cursor, across all tables
+
+    Without `since` the feed starts from the beginning (a full initial sync).
+    Store `next_cursor` and pass it back as `since`; keep fetching while
+    `has_more` is true.
+    """
+    try:
+        txid, seq = _decode_since(since) if since else ("0", 0)
+        page_size = clamp_page_size(limit)
+
+        try:
+            response = await db.rpc("changes_since", {
+                "p_user_id": user_id,
+                "p_txid": txid,
+                "p_seq": seq,
+                "p_limit": page_size + 1,
+            }).execute()
+        except APIError as e:
+            raise _feed_unavailable(e)
+
+        entries = response.data or []
+        has_more = len(entries) > page_size
+        entries = entries[:page_size]
+
+        changes = {table: [] for table in CHANGE_TABLES}
+        deleted = {table: [] for table in CHANGE_TABLES}
+        for entry in entries:
+            if entry["deleted"] or entry["row"] is None:
+                deleted[entry["table_name"]].append(entry["row_id"])
+            else:
+                changes[entry["table_name"]].append(entry["row"])
+
+        last = entries[-1] if entries else {"txid": txid, "seq": seq}
+        return ChangeFeed(
+            changes=changes,
+            deleted=deleted,
+            next_cursor=encode_cursor(last, CHANGE_SORT_KEY),
+            has_more=has_more
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch changes: {str(e)}"
+        )
+
+
+@router.get("/head", response_model=ChangeCursor)
+async def get_change_head(
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncDatabase = Depends(get_supabase_admin)
+):
+    """Cursor covering everything committed so far
+
+    Take it before loading full tables, then follow the feed from it; rows
+    written meanwhile may arrive twice, which is harmless for upserts.
+    """
+    try:
+        try:
+            response = await db.rpc("change_log_head", {}).execute()
+        except APIError as e:
+            raise _feed_unavailable(e)
+
+        return ChangeCursor(cursor=encode_cursor({"txid": response.data, "seq": 0}, CHANGE_SORT_KEY))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch change cursor: {str(e)}"
+        )
@@ -0,0 +1,62 @@
+from datetime import date
+from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi.responses import StreamingResponse
+from database import get_supabase_admin, AsyncDatabase
+from auth import get_current_user_id
+import exports
+
+router = APIRouter(prefix="/export", tags=["Export"])
+
+
+def _attachment(filename: str) -> dict:
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+
+@router.get("/bundle")
+async def export_bundle(
+    format: str = "csv",
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncDatabase = Depends(get_supabase_admin)
+):
+    """Stream a ZIP of all loans, installments and transactions (CSV or NDJSON)"""
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Bundle format must be csv or ndjson"
+        )
+    
+    filename = f"debtsify_export_{date.today().isoformat()}.zip"
+    return StreamingResponse(
+        exports.bundle_stream(db, user_id, format),
+        media_type="application/zip",
+        headers=_attachment(filename)
+    )
+
+
+@router.get("/{entity}")
+async def export_entity(
+    entity: str,
+    format: str = "csv",
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncDatabase = Depends(get_supabase_admin)
+):
+    """Stream every row of loans, installments or transactions as CSV, NDJSON or XLSX"""
+    if entity not in exports.ENTITIES:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown export entity: {entity}"
+        )
+    
+    if format not in exports.FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Export format must be csv, ndjson or xlsx"
+        )
+    
+    media_type, extension = exports.FORMATS[format]
+    filename = f"{entity}_{date.today().isoformat()}.{extension}"
+    return StreamingResponse(
+        exports.export_stream(db, entity, user_id, format),
+        media_type=media_type,
+        headers=_attachment(filename)
+    )
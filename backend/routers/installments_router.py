@@ -1,25 +1,46 @@
 from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
-from supabase import Client
-from database import get_supabase_admin
-from schemas import InstallmentCreate, InstallmentUpdate, InstallmentResponse
+from typing import List, Literal, Union
+from datetime import date
+from postgrest.exceptions import APIError
+from database import get_supabase_admin, AsyncDatabase
+from schemas import (
+    InstallmentCreate,
+    InstallmentUpdate,
+    InstallmentResponse,
+    InstallmentPage,
+    LoanType,
+    PaymentCreate,
+    PaymentResult,
+    AgingReport,
+    CollectionsForecast
+)
 from auth import get_current_user_id
+from pagination import fetch_page, name_pattern
+from serialization import json_response
+import loan_status
+import overdue
+import aging
+import forecast
+from config import settings
 
 router = APIRouter(prefix="/installments", tags=["Installments"])
 
+# Earliest due first; id breaks ties between installments due the same day
+INSTALLMENT_SORT_KEY = (("due_date", False), ("id", False))
+
 
 @router.post("", response_model=InstallmentResponse, status_code=status.HTTP_201_CREATED)
 async def create_installment(
     installment: InstallmentCreate,
     user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_supabase_admin)
+    db: AsyncDatabase = Depends(get_supabase_admin)
 ):
     """Create a new installment"""
     try:
         installment_data = installment.model_dump()
         installment_data["user_id"] = user_id
         
-        response = db.table("installments").insert(installment_data).execute()
+        response = await db.table("installments").insert(installment_data).execute()
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(
@@ -42,7 +63,7 @@ async def create_installment(
 async def create_installments_bulk(
     installments: List[InstallmentCreate],
     user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_supabase_admin)
+    db: AsyncDatabase = Depends(get_supabase_admin)
 ):
     """Create multiple installments at once"""
     try:
@@ -51,7 +72,7 @@ async def create_installments_bulk(
             for installment in installments
         ]
         
-        response = db.table("installments").insert(installments_data).execute()
+        response = await db.table("installments").insert(installments_data).execute()
         
         if not response.data:
             raise HTTPException(
@@ -59,7 +80,7 @@ async def create_installments_bulk(
                 detail="Failed to create installments"
             )
         
-        return [InstallmentResponse(**inst) for inst in response.data]
+        return json_response(List[InstallmentResponse], response.data, status.HTTP_201_CREATED)
     
     except HTTPException:
         raise
@@ -70,16 +91,83 @@ async def create_installments_bulk(
         )
 
 
-@router.get("", response_model=List[InstallmentResponse])
+@router.post("/payments", response_model=PaymentResult)
+async def record_payments(
+    payments: Union[List[PaymentCreate], PaymentCreate],
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncDatabase = Depends(get_supabase_admin)
+):
+    """Record one payment or a whole list in a single atomic call
+    
+    Each installment is marked PAID and a matching CREDIT transaction is
+    written; the status of every affected loan is then recomputed once.
+    Either every payment is recorded or none is.
+    """
+    try:
+        if isinstance(payments, PaymentCreate):
+            payments = [payments]
+        
+        if not payments:
+            return PaymentResult(installments=[], transactions=[], loans=[])
+        
+        response = await db.rpc("record_payments", {
+            "p_user_id": user_id,
+            "p_payments": [payment.model_dump(exclude_none=True) for payment in payments]
+        }).execute()
+        
+        return PaymentResult(**response.data)
+    
+    except APIError as e:
+        if e.code == "P0002":
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=e.message
+            )
+        if e.code == "P0001":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=e.message
+            )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to record payments: {e.message}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to record payments: {str(e)}"
+        )
+
+
+@router.get("", response_model=InstallmentPage)
 async def get_installments(
     loan_id: str | None = None,
     status_filter: str | None = None,
+    due_from: str | None = None,
+    due_to: str | None = None,
+    client_name: str | None = None,
+    loan_type: LoanType | None = None,
+    unpaid_only: bool = False,
+    limit: int | None = None,
+    cursor: str | None = None,
     user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_supabase_admin)
+    db: AsyncDatabase = Depends(get_supabase_admin)
 ):
-    """Get all installments for the current user"""
+    """Get one page of the current user's installments, earliest due first
+    
+    `due_from`/`due_to` bound the due date (inclusive, ISO dates),
+    `client_name` is a case-insensitive substring match and `unpaid_only`
+    skips PAID installments. Pass the returned `next_cursor` as `cursor`
+    to fetch the following page.
+    """
     try:
-        query = db.table("installments").select("*").eq("user_id", user_id)
+        if loan_type:
+            # Filter on the parent loan's type through an inner join
+            query = db.table("installments").select("*, loans!inner(type)").eq("loans.type", loan_type.value)
+        else:
+            query = db.table("installments").select("*")
+        
+        query = query.eq("user_id", user_id)
         
         if loan_id:
             query = query.eq("loan_id", loan_id)
@@ -87,10 +175,24 @@ async def get_installments(
         if status_filter:
             query = query.eq("status", status_filter)
         
-        response = query.order("due_date", desc=False).execute()
+        if unpaid_only:
+            query = query.neq("status", "PAID")
+        
+        if due_from:
+            query = query.gte("due_date", due_from)
+        
+        if due_to:
+            query = query.lte("due_date", due_to)
+        
+        if client_name:
+            query = query.ilike("client_name", name_pattern(client_name))
         
-        return [InstallmentResponse(**inst) for inst in response.data]
+        rows, next_cursor = await fetch_page(query, INSTALLMENT_SORT_KEY, cursor, limit)
+        
+        return json_response(InstallmentPage, {"items": rows, "next_cursor": next_cursor})
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -98,15 +200,107 @@ async def get_installments(
         )
 
 
+@router.get("/overdue", response_model=InstallmentPage)
+async def get_overdue_installments(
+    loan_id: str | None = None,
+    client_name: str | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncDatabase = Depends(get_supabase_admin)
+):
+    """Get one page of the current user's overdue installments, most overdue first
+    
+    Unpaid installments due before today, whether or not the overdue job
+    has marked them yet. Pass the returned `next_cursor` as `cursor` to
+    fetch the following page.
+    """
+    try:
+        query = overdue.overdue_filter(db.table("installments").select("*").eq("user_id", user_id))
+        
+        if loan_id:
+            query = query.eq("loan_id", loan_id)
+        
+        if client_name:
+            query = query.ilike("client_name", name_pattern(client_name))
+        
+        rows, next_cursor = await fetch_page(query, INSTALLMENT_SORT_KEY, cursor, limit)
+        
+        return json_response(InstallmentPage, {"items": rows, "next_cursor": next_cursor})
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch overdue installments: {str(e)}"
+        )
+
+
+@router.get("/aging", response_model=AgingReport)
+async def get_aging_report(
+    as_of: date | None = None,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncDatabase = Depends(get_supabase_admin)
+):
+    """Outstanding amounts of unpaid installments by days past due
+    
+    Buckets: current (not yet due), 1-7, 8-30, 31-60 and 60+ days, in total,
+    per client and per loan type. Cached until the user's data changes.
+    """
+    try:
+        return AgingReport(**await aging.get_aging_report(db, user_id, as_of))
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to compute aging report: {str(e)}"
+        )
+
+
+@router.get("/forecast", response_model=CollectionsForecast)
+async def get_collections_forecast(
+    granularity: Literal["daily", "weekly"] = "daily",
+    periods: int = 30,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncDatabase = Depends(get_supabase_admin)
+):
+    """Expected collections for the next `periods` days or weeks, from today
+    
+    Each period sums the outstanding amount of unpaid installments due in
+    it, split into principal and interest, plus the DAILY_RATE interest the
+    accrual job will have generated by then. Unpaid installments already
+    due are returned separately as `overdue`.
+    """
+    try:
+        if periods < 1 or periods > settings.forecast_max_periods:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"periods must be between 1 and {settings.forecast_max_periods}"
+            )
+        
+        return CollectionsForecast(**await forecast.get_forecast(db, user_id, granularity, periods))
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to compute collections forecast: {str(e)}"
+        )
+
+
 @router.get("/{installment_id}", response_model=InstallmentResponse)
 async def get_installment(
     installment_id: str,
     user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_supabase_admin)
+    db: AsyncDatabase = Depends(get_supabase_admin)
 ):
     """Get a specific installment by ID"""
     try:
-        response = db.table("installments").select("*").eq("id", installment_id).eq("user_id", user_id).execute()
+        response = await db.table("installments").select("*").eq("id", installment_id).eq("user_id", user_id).execute()
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(
@@ -130,7 +324,7 @@ async def update_installment(
     installment_id: str,
     installment_update: InstallmentUpdate,
     user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_supabase_admin)
+    db: AsyncDatabase = Depends(get_supabase_admin)
 ):
     """Update an installment (record payment, etc.)"""
     try:
@@ -139,11 +333,11 @@ async def update_installment(
         logging.info(f"Update data: {installment_update.model_dump(exclude_unset=True)}")
         
         # Check if installment exists and belongs to user
-        check_response = db.table("installments").select("*").eq("id", installment_id).eq("user_id", user_id).execute()
+        check_response = await db.table("installments").select("*").eq("id", installment_id).eq("user_id", user_id).execute()
         
         if not check_response.data or len(check_response.data) == 0:
             # Check if installment exists at all
-            exists_check = db.table("installments").select("id, user_id").eq("id", installment_id).execute()
+            exists_check = await db.table("installments").select("id, user_id").eq("id", installment_id).execute()
             if exists_check.data and len(exists_check.data) > 0:
                 logging.warning(f"Installment {installment_id} exists but belongs to user {exists_check.data[0].get('user_id')}, not {user_id}")
                 raise HTTPException(
@@ -161,7 +355,7 @@ async def update_installment(
         # Ensure we can clear paid_date when reverting a payment
         # Supabase can handle null values directly
             
-        response = db.table("installments").update(update_data).eq("id", installment_id).execute()
+        response = await db.table("installments").update(update_data).eq("id", installment_id).execute()
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(
@@ -176,20 +370,16 @@ async def update_installment(
         loan_id = updated_installment.get("loan_id")
         
         if loan_id:
-            # Get all installments for this loan
-            all_installments = db.table("installments").select("*").eq("loan_id", loan_id).execute()
+            loan_response = await db.table("loans").select("*").eq("id", loan_id).execute()
+            loan = loan_response.data[0] if loan_response.data else None
+            all_paid = await loan_status.all_installments_paid(db, loan) if loan else None
             
-            if all_installments.data:
-                # Check if all are paid
-                all_paid = all(inst.get("status") == "PAID" for inst in all_installments.data)
-                
-                if all_paid:
-                    # Update loan status to COMPLETED
-                    db.table("loans").update({"status": "COMPLETED"}).eq("id", loan_id).execute()
-                    logging.info(f"Loan {loan_id} marked as COMPLETED - all installments paid")
-                else:
-                    # Ensure loan is ACTIVE if not all paid (in case it was completed before)
-                    db.table("loans").update({"status": "ACTIVE"}).eq("id", loan_id).execute()
+            if all_paid is not None:
+                new_status = "COMPLETED" if all_paid else "ACTIVE"
+                # Ensure loan is ACTIVE if not all paid (in case it was completed before)
+                if loan.get("status") != new_status:
+                    await db.table("loans").update({"status": new_status}).eq("id", loan_id).execute()
+                    logging.info(f"Loan {loan_id} marked as {new_status}")
         
         return InstallmentResponse(**response.data[0])
     
@@ -208,11 +398,11 @@ async def update_installment(
 async def delete_installment(
     installment_id: str,
     user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_supabase_admin)
+    db: AsyncDatabase = Depends(get_supabase_admin)
 ):
     """Delete an installment"""
     try:
-        check_response = db.table("installments").select("id").eq("id", installment_id).eq("user_id", user_id).execute()
+        check_response = await db.table("installments").select("id").eq("id", installment_id).eq("user_id", user_id).execute()
         
         if not check_response.data or len(check_response.data) == 0:
             raise HTTPException(
@@ -220,7 +410,7 @@ async def delete_installment(
                 detail="Installment not found"
             )
         
-        db.table("installments").delete().eq("id", installment_id).execute()
+        await db.table("installments").delete().eq("id", installment_id).execute()
         
         return None
     
@@ -236,39 +426,12 @@ async def delete_installment(
 @router.post("/sync-loan-statuses", status_code=status.HTTP_200_OK)
 async def sync_all_loan_statuses(
     user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_supabase_admin)
+    db: AsyncDatabase = Depends(get_supabase_admin)
 ):
     """Check all loans and update their status based on installment completion"""
     try:
-        import logging
-        
-        # Get all loans for this user
-        loans_response = db.table("loans").select("*").eq("user_id", user_id).execute()
-        
-        updated_count = 0
-        
-        for loan in loans_response.data:
-            loan_id = loan.get("id")
-            current_status = loan.get("status")
-            
-            # Get all installments for this loan
-            installments = db.table("installments").select("*").eq("loan_id", loan_id).execute()
-            
-            if installments.data:
-                # Check if all are paid
-                all_paid = all(inst.get("status") == "PAID" for inst in installments.data)
-                
-                if all_paid and current_status != "COMPLETED":
-                    # Update to COMPLETED
-                    db.table("loans").update({"status": "COMPLETED"}).eq("id", loan_id).execute()
-                    logging.info(f"Loan {loan_id} updated to COMPLETED")
-                    updated_count += 1
-                elif not all_paid and current_status == "COMPLETED":
-                    # Revert to ACTIVE
-                    db.table("loans").update({"status": "ACTIVE"}).eq("id", loan_id).execute()
-                    logging.info(f"Loan {loan_id} reverted to ACTIVE")
-                    updated_count += 1
-        
+        updated_count = await loan_status.sync_loan_statuses(db, user_id)
+
         return {
             "message": f"Successfully synced {updated_count} loan statuses",
             "updated_count": updated_count
@@ -1,34 +1,77 @@
+from datetime import date
 from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
-from supabase import Client
-from database import get_supabase_admin
-from schemas import LoanCreate, LoanUpdate, LoanResponse
+from database import get_supabase_admin, AsyncDatabase
+from schemas import LoanCreate, LoanUpdate, LoanResponse, LoanWithSchedule, LoanPage, LoanType
 from auth import get_current_user_id
+from pagination import fetch_page, name_pattern
+from serialization import json_response
+from schedule import build_schedule
+import accrual
 
 router = APIRouter(prefix="/loans", tags=["Loans"])
 
+# Newest first; id breaks ties between loans created in the same instant
+LOAN_SORT_KEY = (("created_at", True), ("id", True))
 
-@router.post("", response_model=LoanResponse, status_code=status.HTTP_201_CREATED)
+
+@router.post("", response_model=LoanWithSchedule, status_code=status.HTTP_201_CREATED)
 async def create_loan(
     loan: LoanCreate,
     user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_supabase_admin)
+    db: AsyncDatabase = Depends(get_supabase_admin)
 ):
-    """Create a new loan"""
+    """Create a new loan together with its installment schedule"""
     try:
-        loan_data = loan.model_dump()
-        loan_data["user_id"] = user_id
-        
-        response = db.table("loans").insert(loan_data).execute()
-        
-        if not response.data or len(response.data) == 0:
+        loan_data = loan.model_dump(mode="json", exclude={"generate_schedule", "frequency_days", "advanced_installment"})
+        if loan.frequency.upper() == "CUSTOM" and loan.frequency_days:
+            # Stored as a day count, the way the app records its own frequencies
+            loan_data["frequency"] = str(loan.frequency_days)
+
+        if not loan.generate_schedule:
+            loan_data["user_id"] = user_id
+            response = await db.table("loans").insert(loan_data).execute()
+
+            if not response.data or len(response.data) == 0:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Failed to create loan"
+                )
+
+            return LoanWithSchedule(**response.data[0])
+
+        try:
+            installments, transactions = build_schedule(
+                loan_data,
+                custom_days=loan.frequency_days,
+                advanced=loan.advanced_installment
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+
+        # Loan, schedule and advance payment are written in one transaction
+        response = await db.rpc("create_loan_with_schedule", {
+            "p_user_id": user_id,
+            "p_loan": loan_data,
+            "p_installments": installments,
+            "p_transactions": transactions,
+        }).execute()
+
+        if not response.data:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Failed to create loan"
             )
-        
-        return LoanResponse(**response.data[0])
-    
+
+        created = response.data
+        return LoanWithSchedule(
+            **created["loan"],
+            installments=created["installments"],
+            transactions=created["transactions"]
+        )
+
     except HTTPException:
         raise
     except Exception as e:
@@ -38,23 +81,39 @@ async def create_loan(
         )
 
 
-@router.get("", response_model=List[LoanResponse])
+@router.get("", response_model=LoanPage)
 async def get_loans(
     status_filter: str | None = None,
+    loan_type: LoanType | None = None,
+    client_name: str | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
     user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_supabase_admin)
+    db: AsyncDatabase = Depends(get_supabase_admin)
 ):
-    """Get all loans for the current user"""
+    """Get one page of the current user's loans, newest first
+    
+    `client_name` is a case-insensitive substring match. Pass the returned
+    `next_cursor` as `cursor` to fetch the following page.
+    """
     try:
         query = db.table("loans").select("*").eq("user_id", user_id)
         
         if status_filter:
             query = query.eq("status", status_filter)
         
-        response = query.order("created_at", desc=True).execute()
+        if loan_type:
+            query = query.eq("type", loan_type.value)
+        
+        if client_name:
+            query = query.ilike("client_name", name_pattern(client_name))
         
-        return [LoanResponse(**loan) for loan in response.data]
+        rows, next_cursor = await fetch_page(query, LOAN_SORT_KEY, cursor, limit)
+        
+        return json_response(LoanPage, {"items": rows, "next_cursor": next_cursor})
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -62,15 +121,51 @@ async def get_loans(
         )
 
 
+@router.post("/accrue-interest", status_code=status.HTTP_200_OK)
+async def accrue_interest(
+    loan_id: str | None = None,
+    as_of: date | None = None,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncDatabase = Depends(get_supabase_admin)
+):
+    """Generate the missing INTEREST_ONLY installments of active DAILY_RATE loans
+
+    Covers all of the user's loans, or one with `loan_id`, up to `as_of`
+    (default today). Safe to repeat: loans already accrued get nothing new.
+    """
+    try:
+        if as_of and as_of > date.today():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="as_of cannot be in the future"
+            )
+
+        result = await accrual.accrue_interest(db, user_id, loan_id, as_of)
+
+        return {
+            "message": f"Generated {result['installments_created']} interest installments",
+            "loans_accrued": result["loans_accrued"],
+            "installments_created": result["installments_created"]
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to accrue interest: {str(e)}"
+        )
+
+
 @router.get("/{loan_id}", response_model=LoanResponse)
 async def get_loan(
     loan_id: str,
     user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_supabase_admin)
+    db: AsyncDatabase = Depends(get_supabase_admin)
 ):
     """Get a specific loan by ID"""
     try:
-        response = db.table("loans").select("*").eq("id", loan_id).eq("user_id", user_id).execute()
+        response = await db.table("loans").select("*").eq("id", loan_id).eq("user_id", user_id).execute()
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(
@@ -94,12 +189,12 @@ async def update_loan(
     loan_id: str,
     loan_update: LoanUpdate,
     user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_supabase_admin)
+    db: AsyncDatabase = Depends(get_supabase_admin)
 ):
     """Update a loan"""
     try:
         # Check if loan exists and belongs to user
-        check_response = db.table("loans").select("id").eq("id", loan_id).eq("user_id", user_id).execute()
+        check_response = await db.table("loans").select("id").eq("id", loan_id).eq("user_id", user_id).execute()
         
         if not check_response.data or len(check_response.data) == 0:
             raise HTTPException(
@@ -109,7 +204,7 @@ async def update_loan(
         
         # Update loan
         update_data = loan_update.model_dump(exclude_unset=True)
-        response = db.table("loans").update(update_data).eq("id", loan_id).execute()
+        response = await db.table("loans").update(update_data).eq("id", loan_id).execute()
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(
@@ -132,12 +227,12 @@ async def update_loan(
 async def delete_loan(
     loan_id: str,
     user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_supabase_admin)
+    db: AsyncDatabase = Depends(get_supabase_admin)
 ):
     """Delete a loan"""
     try:
         # Check if loan exists and belongs to user
-        check_response = db.table("loans").select("id").eq("id", loan_id).eq("user_id", user_id).execute()
+        check_response = await db.table("loans").select("id").eq("id", loan_id).eq("user_id", user_id).execute()
         
         if not check_response.data or len(check_response.data) == 0:
             raise HTTPException(
@@ -147,10 +242,10 @@ async def delete_loan(
         
         # Delete loan
         # First delete related transactions (manual cascade if not handled by DB)
-        db.table("transactions").delete().eq("related_entity_id", loan_id).execute()
+        await db.table("transactions").delete().eq("related_entity_id", loan_id).execute()
         
         # Then delete loan (installments cascade automatically via FK)
-        db.table("loans").delete().eq("id", loan_id).execute()
+        await db.table("loans").delete().eq("id", loan_id).execute()
         
         return None
     
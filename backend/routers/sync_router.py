@@ -1,15 +1,37 @@
-from fastapi import APIRouter, HTTPException, status, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi.concurrency import run_in_threadpool
 import gspread
 from google.oauth2.service_account import Credentials
 import json
 from supabase import Client
-from database import get_supabase_admin
 from auth import get_current_user_id
 from config import settings
-from typing import Dict, Any, List
+from database import fetch_all_sync
+import breakdown_store
+import reports
+import sheet_sync
+import snapshots
+import sync_jobs
+from schemas import SyncJobResponse
+from typing import Dict, Any, List, Tuple
+from functools import lru_cache
 
 router = APIRouter(prefix="/sync", tags=["Sync"])
 
+
+@lru_cache(maxsize=1)
+def _authorize(credentials_setting: str) -> gspread.Client:
+    """Authorized client, reused across syncs (google-auth refreshes the access token)"""
+    scopes = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
+    # Check if it's a JSON string or a file path
+    if credentials_setting.startswith('{'):
+        creds_json = json.loads(credentials_setting)
+        creds = Credentials.from_service_account_info(creds_json, scopes=scopes)
+    else:
+        creds = Credentials.from_service_account_file(credentials_setting, scopes=scopes)
+
+    return gspread.authorize(creds)
+
 def get_gspread_client():
     if not settings.google_sheets_credentials_json:
         raise HTTPException(
@@ -18,240 +40,184 @@ def get_gspread_client():
         )
     
     try:
-        scopes = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
-        # Check if it's a JSON string or a file path
-        if settings.google_sheets_credentials_json.startswith('{'):
-            creds_json = json.loads(settings.google_sheets_credentials_json)
-            creds = Credentials.from_service_account_info(creds_json, scopes=scopes)
-        else:
-            creds = Credentials.from_service_account_file(settings.google_sheets_credentials_json, scopes=scopes)
-        
-        return gspread.authorize(creds)
+        return _authorize(settings.google_sheets_credentials_json)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to authorize Google Sheets: {str(e)}"
         )
 
-def perform_sync(user_id: str, db: Client, create_monthly_archive: bool = False):
-    """Actual sync logic to be run in background"""
+def _is_not_found(error: Exception) -> bool:
+    return isinstance(error, gspread.exceptions.APIError) and error.code == 404
+
+def _open_or_create(client, title: str) -> str:
+    """Id of the spreadsheet titled `title`, created if missing (Drive search)"""
+    try:
+        return client.open(title).id
+    except gspread.exceptions.SpreadsheetNotFound:
+        print(f"Creating spreadsheet {title}")
+        return client.create(title).id
+
+def _share(client, db: Client, user_id: str, links: Dict[str, dict], title: str, spreadsheet_id: str,
+           user_email: str):
+    """Share a spreadsheet with the user once, and remember its id"""
+    link = links.get(title) or {}
+    known = link.get("spreadsheet_id") == spreadsheet_id
+    shared_with = link.get("shared_with") if known else None
+    if known and shared_with == user_email:
+        return
+
+    if user_email and shared_with != user_email:
+        try:
+            print(f"Sharing spreadsheet {spreadsheet_id} with {user_email}...")
+            client.insert_permission(spreadsheet_id, user_email, perm_type='user', role='writer')
+            shared_with = user_email
+        except Exception as share_error:
+            print(f"Warning: Failed to share spreadsheet with user: {str(share_error)}")
+
+    try:
+        sheet_sync.save_spreadsheet(db, user_id, title, spreadsheet_id, shared_with)
+    except Exception as link_error:
+        print(f"Warning: Failed to record spreadsheet {title}: {str(link_error)}")
+
+def perform_sync(user_id: str, db: Client, create_monthly_archive: bool = False, full_rewrite: bool = False):
+    """Actual sync logic, run by the sync job queue; raises on failure"""
     try:
         from datetime import datetime
         client = get_gspread_client()
         
-        # Fetch all data first
-        loans_response = db.table("loans").select("*").eq("user_id", user_id).execute()
-        installments_response = db.table("installments").select("*").eq("user_id", user_id).execute()
-        transactions_response = db.table("transactions").select("*").eq("user_id", user_id).execute()
+        # Fetch all data first (paged: a plain select stops at PostgREST's row cap)
+        loans = fetch_all_sync(
+            lambda: db.table("loans").select("*").eq("user_id", user_id).order("created_at").order("id")
+        )
+        installments = fetch_all_sync(lambda: db.table("installments").select("*").eq("user_id", user_id).order("id"))
+        transactions = fetch_all_sync(lambda: db.table("transactions").select("*").eq("user_id", user_id).order("id"))
         
-        # 1. Update main live spreadsheet
         # 1. Update main live spreadsheet
         # Fetch user's spreadsheet_id
         user_data_response = db.table("users").select("spreadsheet_id, email").eq("id", user_id).single().execute()
         user_record = user_data_response.data if user_data_response else {}
-        spreadsheet_id = user_record.get("spreadsheet_id")
         user_email = user_record.get("email")
 
-        spreadsheet = None
-        
-        # If user has a sheet, try to open it
-        if spreadsheet_id:
-            try:
-                spreadsheet = client.open_by_key(spreadsheet_id)
-            except gspread.exceptions.SpreadsheetNotFound:
-                print(f"User's assigned spreadsheet {spreadsheet_id} not found. Creating a new one.")
-                spreadsheet = None
-            except Exception as e:
-                print(f"Error opening spreadsheet {spreadsheet_id}: {e}. Will attempt to create/open generic.")
-                spreadsheet = None
-
-        # If no sheet found or opening failed, create/open by title
-        if not spreadsheet:
-            title = f"Debtsify_Sheet_{user_id}" 
-            # Note: Changed naming slightly to be cleaner
-            
-            try:
-                # Try to find by title first to avoid duplicate creation if ID was just missing/mismatched
-                try:
-                    spreadsheet = client.open(title)
-                except gspread.exceptions.SpreadsheetNotFound:
-                    spreadsheet = client.create(title)
-                
-                # Update user record with new spreadsheet_id
-                if spreadsheet:
-                    try:
-                        db.table("users").update({"spreadsheet_id": spreadsheet.id}).eq("id", user_id).execute()
-                        print(f"Linked new spreadsheet {spreadsheet.id} to user {user_id}")
-                    except Exception as update_err:
-                        print(f"Failed to save spreadsheet_id to user record: {update_err}")
-
-            except Exception as create_err:
-                print(f"Failed to create/open spreadsheet: {create_err}")
-                # Fallback to global only if absolutely necessary, but per requirement we want independent.
-                # If we fail here, we probably fail completely.
-                raise create_err
-
-        # Share with user's email if not already shared (Service Account logic)
         try:
-            if user_email:
-                print(f"Sharing spreadsheet {spreadsheet.id} with {user_email}...")
-                spreadsheet.share(user_email, perm_type='user', role='writer')
-        except Exception as share_error:
-            print(f"Warning: Failed to share spreadsheet with user: {str(share_error)}")
+            links = sheet_sync.load_spreadsheets(db, user_id)
+        except Exception as link_error:
+            print(f"Warning: Spreadsheet id map unavailable: {str(link_error)}")
+            links = {}
 
+        title = f"Debtsify_Sheet_{user_id}"
+        spreadsheet_id = user_record.get("spreadsheet_id") or links.get(title, {}).get("spreadsheet_id")
         
-        sync_to_sheet(spreadsheet, "Loans", loans_response.data)
-        sync_to_sheet(spreadsheet, "Installments", installments_response.data)
-        sync_to_sheet(spreadsheet, "Transactions", transactions_response.data)
-        
-        # 4. Sync Investment Breakdown
-        # Calculate breakdown locally
-        breakdown_data = create_investment_breakdown(loans_response.data, installments_response.data)
+        # Investment Breakdown
+        # Aggregated per loan in the database (Python fallback in reports.py)
+        breakdown = reports.get_investment_breakdown_sync(db, user_id, loans, installments)
+        breakdown_data = create_investment_breakdown(breakdown)
         
-        # Save calculated breakdown to Database
+        # Bring the investment_breakdown table up to date (only changed loans are written)
         try:
-           # First delete existing for this user (full refresh)
-           db.table("investment_breakdown").delete().eq("user_id", user_id).execute()
-           
-           # Prepare data for insertion (unformatted numbers)
-           db_insert_data = []
-           for item in breakdown_data:
-               # Parse formatted strings back to numbers/raw values
-               # Note: create_investment_breakdown returns formatted strings (e.g. ₹20,000)
-               # We need to extract raw values. Ideally, refactor helper to return raw data.
-               # For now, we will just parse it back or use a new helper.
-               
-               # Actually, let's just make create_investment_breakdown return raw data + formatted
-               # But to avoid breaking changes, let's just recalculate for DB insertion here quickly.
-               # Or better: Extract the calculation logic. See below.
-               pass
-
-           # Redoing calculation for DB insertion clean up
-           db_records = []
-           for loan in loans_response.data:
-                l_id = loan.get("id")
-                principal = float(loan.get("principal_amount", 0))
-                multiplier = float(loan.get("total_rate_multiplier") or 1.2)
-                l_type = loan.get("type")
-                
-                # Fetch installments for this loan
-                l_insts = [i for i in installments_response.data if i.get("loan_id") == l_id]
-                received = sum(float(i.get("paid_amount", 0)) for i in l_insts)
-                
-                # Market Value Logic
-                mkt_principal = 0.0
-                mkt_interest = 0.0
-                
-                if l_type == "TOTAL_RATE":
-                    total_repay = principal * multiplier
-                    total_interest = total_repay - principal
-                    for i in l_insts:
-                        if i.get("status") != "PAID":
-                            rem = float(i.get("expected_amount", 0)) - float(i.get("paid_amount", 0))
-                            mkt_principal += rem * (principal / total_repay)
-                            mkt_interest += rem * (total_interest / total_repay)
-                    int_pct = (multiplier - 1) * 100
-                else: 
-                    # DAILY_RATE
-                    daily_rate = float(loan.get("daily_rate_per_lakh", 0))
-                    int_pct = daily_rate
-                    if loan.get("status") == "ACTIVE":
-                         mkt_principal = principal
-                    for i in l_insts:
-                        if i.get("status") != "PAID":
-                             mkt_interest += (float(i.get("expected_amount", 0)) - float(i.get("paid_amount", 0)))
-
-                db_records.append({
-                    "user_id": user_id,
-                    "loan_id": l_id,
-                    "person": loan.get("client_name"),
-                    "start_date": loan.get("start_date"),
-                    "cycle": loan.get("frequency"),
-                    "capital": principal,
-                    "interest_percentage": int_pct,
-                    "received": received,
-                    "mkt_principal": mkt_principal,
-                    "mkt_interest": mkt_interest,
-                    "total_market_value": mkt_principal + mkt_interest
-                })
-           
-           if db_records:
-               db.table("investment_breakdown").insert(db_records).execute()
-               
+            breakdown_store.refresh_breakdown_sync(db, user_id, breakdown)
         except Exception as db_err:
             print(f"Warning: Failed to update investment_breakdown table: {str(db_err)}")
 
-        # Sync to Sheets (using formatted helper)
-        sync_to_sheet(spreadsheet, "Investment_Breakdown", breakdown_data)
+        sheets = [
+            ("Loans", loans, None),
+            ("Installments", installments, None),
+            ("Transactions", transactions, None),
+            ("Investment_Breakdown", breakdown_data, [str(entry["loan_id"]) for entry in breakdown]),
+        ]
+        new_spreadsheet_id, rows_written = write_spreadsheet_or_recreate(
+            client, db, user_id, title, spreadsheet_id, sheets, full_rewrite
+        )
+        if new_spreadsheet_id != spreadsheet_id:
+            # Update user record with new spreadsheet_id
+            try:
+                db.table("users").update({"spreadsheet_id": new_spreadsheet_id}).eq("id", user_id).execute()
+                print(f"Linked new spreadsheet {new_spreadsheet_id} to user {user_id}")
+            except Exception as update_err:
+                print(f"Failed to save spreadsheet_id to user record: {update_err}")
+            spreadsheet_id = new_spreadsheet_id
+
+        # Share with user's email if not already shared (Service Account logic)
+        _share(client, db, user_id, links, title, spreadsheet_id, user_email)
         
         # 2. Create monthly archive if requested or if it's a new month
         current_month = datetime.now().strftime("%Y-%m")
         archive_title = f"Debtsify_Archive_{current_month}_{user_id}"
+        archive_id = None
+        snapshot_period = None
         
         if create_monthly_archive:
+            # Columnar snapshot for GET /archives/query
+            try:
+                snapshots.write_snapshot(user_id, current_month, {
+                    "loans": loans,
+                    "installments": installments,
+                    "transactions": transactions,
+                })
+                snapshot_period = current_month
+            except Exception as e:
+                print(f"Failed to write archive snapshot: {str(e)}")
+            
             try:
-                # Check if this month's archive already exists
-                try:
-                    archive_sheet = client.open(archive_title)
-                    print(f"Monthly archive for {current_month} already exists, updating...")
-                except gspread.exceptions.SpreadsheetNotFound:
-                    # Create new monthly archive
-                    archive_sheet = client.create(archive_title)
-                    print(f"Created new monthly archive: {archive_title}")
+                archive_id = links.get(archive_title, {}).get("spreadsheet_id")
                 
-                # Share archive with user's email
-                try:
-                    user_data = db.table("users").select("email").eq("id", user_id).single().execute()
-                    if user_data and user_data.data and user_data.data.get("email"):
-                        user_email = user_data.data.get("email")
-                        print(f"Sharing archive with {user_email}...")
-                        archive_sheet.share(user_email, perm_type='user', role='writer')
-                except Exception as share_error:
-                    print(f"Warning: Failed to share archive with user: {str(share_error)}")
+                # Add a summary sheet with monthly metrics
+                monthly_metrics = reports.get_monthly_summary_sync(
+                    db, user_id, loans, installments, transactions
+                )
                 
                 # Sync data to archive
-                sync_to_sheet(archive_sheet, "Loans", loans_response.data)
-                sync_to_sheet(archive_sheet, "Installments", installments_response.data)
-                sync_to_sheet(archive_sheet, "Transactions", transactions_response.data)
-                
-                # Add a summary sheet with monthly metrics
-                create_monthly_summary(archive_sheet, loans_response.data, 
-                                     installments_response.data, transactions_response.data)
+                archive_id, archive_rows = write_spreadsheet_or_recreate(
+                    client, db, user_id, archive_title, archive_id, sheets[:3], full_rewrite, monthly_metrics
+                )
+                rows_written += archive_rows
+                _share(client, db, user_id, links, archive_title, archive_id, user_email)
                 
             except Exception as e:
                 print(f"Failed to create monthly archive: {str(e)}")
+                archive_id = None
         
         print(f"Sync completed successfully for user {user_id}")
         
         # Return the spreadsheet URL
         return {
-            "main_url": f"https://docs.google.com/spreadsheets/d/{spreadsheet.id}",
-            "archive_url": f"https://docs.google.com/spreadsheets/d/{archive_sheet.id}" if create_monthly_archive and 'archive_sheet' in locals() else None
+            "main_url": f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}",
+            "archive_url": f"https://docs.google.com/spreadsheets/d/{archive_id}" if archive_id else None,
+            "snapshot": snapshot_period,
+            "rows_written": rows_written
         }
         
     except Exception as e:
         print(f"Background sync failed for user {user_id}: {str(e)}")
-        return None
+        raise
 
 @router.post("")
 async def sync_data(
-    background_tasks: BackgroundTasks,
     create_archive: bool = False,
-    user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_supabase_admin)
+    full_rewrite: bool = False,
+    user_id: str = Depends(get_current_user_id)
 ):
-    """Sync all user data to Google Sheets in the background
+    """Queue a sync of all user data to Google Sheets
+    
+    Repeated requests while a sync is queued are merged into that job;
+    poll GET /sync/jobs/{job_id} for progress.
     
     Args:
         create_archive: If True, also creates a monthly archive snapshot
+        full_rewrite: If True, rewrites every sheet instead of only changed rows
     """
-    # Start the background task
-    background_tasks.add_task(perform_sync, user_id, db, create_archive)
+    try:
+        job = await run_in_threadpool(job_queue.enqueue, user_id, create_archive, full_rewrite)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to queue sync: {str(e)}"
+        )
     
-    response_msg = "Sync started in background"
+    response_msg = "Sync queued" if not job["coalesced"] else "Sync already queued; request merged into it"
     spreadsheet_url = None
     
-    if create_archive:
+    if job["create_archive"]:
         from datetime import datetime
         current_month = datetime.now().strftime("%Y-%m")
         response_msg += f" (including monthly archive for {current_month})"
@@ -262,192 +228,256 @@ async def sync_data(
 
     return {
         "message": response_msg,
-        "status": "processing",
+        "status": job["status"],
+        "job_id": job["id"],
         "spreadsheet_url": spreadsheet_url
     }
 
-def sync_to_sheet(spreadsheet, sheet_name: str, data: list):
+@router.get("/jobs/{job_id}", response_model=SyncJobResponse)
+async def get_sync_job(
+    job_id: str,
+    user_id: str = Depends(get_current_user_id)
+):
+    """Status of a sync job"""
     try:
-        try:
-            worksheet = spreadsheet.worksheet(sheet_name)
-            # Resize to ensure enough space (min 1000 or data length + 100)
-            required_rows = max(1000, len(data) + 100)
-            worksheet.resize(rows=required_rows)
-        except gspread.exceptions.WorksheetNotFound:
-            # Create sheet with blue header if new
-            worksheet = spreadsheet.add_worksheet(title=sheet_name, rows="5000", cols="20")
-        
-        worksheet.clear()
-        
-        if not data:
-            worksheet.update('A1', [['No data available']])
-            return
-
-        # Prepare headers and rows
-        headers = list(data[0].keys())
-        rows = [headers]
-        for item in data:
-            # Format dates and numbers nicely for Excel/Sheets
-            row = []
-            for h in headers:
-                val = item.get(h, "")
-                if val is None:
-                    row.append("")
-                else:
-                    row.append(str(val))
-            rows.append(row)
-        
-        # Batch update for performance
-        worksheet.update('A1', rows)
-        
-        # Format headers (bold and colored)
-        worksheet.format('A1:Z1', {
-            "backgroundColor": {"red": 0.0, "green": 0.4, "blue": 0.8},
-            "textFormat": {"color": {"red": 1.0, "green": 1.0, "blue": 1.0}, "bold": True}
-        })
-        
+        job = await run_in_threadpool(job_queue.get, job_id, user_id)
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Sync job not found"
+            )
+        return job
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Failed to sync {sheet_name}: {str(e)}")
-        # Don't re-raise, allow other sheets to sync
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch sync job: {str(e)}"
+        )
 
-def create_investment_breakdown(loans_data: list, installments_data: list):
-    """Create investment breakdown with detailed analytics per loan"""
-    breakdown = []
-    
-    for loan in loans_data:
-        loan_id = loan.get("id")
-        client_name = loan.get("client_name", "Unknown")
-        start_date = loan.get("start_date", "")
-        principal = float(loan.get("principal_amount", 0))
-        loan_type = loan.get("type", "")
-        frequency = loan.get("frequency", "")
-        
-        # Get all installments for this loan
-        loan_installments = [i for i in installments_data if i.get("loan_id") == loan_id]
-        
-        # Calculate received amount (paid installments)
-        received = sum(float(i.get("paid_amount", 0)) for i in loan_installments)
-        
-        # Calculate market values
-        mkt_principal = 0
-        mkt_interest = 0
-        total_expected = 0
-        
-        if loan_type == "TOTAL_RATE":
-            multiplier = float(loan.get("total_rate_multiplier", 1.2))
-            total_repay = principal * multiplier
-            total_interest = total_repay - principal
-            
-            # Interest percentage
-            int_pct = ((multiplier - 1) * 100)
-            
-            for inst in loan_installments:
-                if inst.get("status") != "PAID":
-                    remaining = float(inst.get("expected_amount", 0)) - float(inst.get("paid_amount", 0))
-                    total_expected += remaining
-                    # Amortize principal vs interest
-                    mkt_principal += remaining * (principal / total_repay)
-                    mkt_interest += remaining * (total_interest / total_repay)
-        else:
-            # DAILY_RATE
-            daily_rate = float(loan.get("daily_rate_per_lakh", 100))
-            int_pct = daily_rate  # Rate per lakh per day
-            
-            if loan.get("status") == "ACTIVE":
-                mkt_principal = principal
-            
-            for inst in loan_installments:
-                if inst.get("status") != "PAID":
-                    remaining = float(inst.get("expected_amount", 0)) - float(inst.get("paid_amount", 0))
-                    total_expected += remaining
-                    mkt_interest += remaining
-        
-        total_mkt_value = mkt_principal + mkt_interest
-        
-        breakdown.append({
-            "Person": client_name,
-            "Start Date": start_date,
-            "Cycle": f"{frequency}d" if frequency.isdigit() else frequency,
-            "Capital": f"₹{principal:,.0f}",
-            "Int (%)": f"{int_pct:.1f}%",
-            "Received": f"₹{received:,.0f}",
-            "Mkt Principal": f"₹{mkt_principal:,.0f}",
-            "Mkt Interest": f"₹{mkt_interest:,.0f}",
-            "Total Market Value": f"₹{total_mkt_value:,.0f}"
-        })
-    
-    return breakdown
+def write_spreadsheet_or_recreate(client, db: Client, user_id: str, title: str, spreadsheet_id: str,
+                                  sheets: list, full_rewrite: bool = False,
+                                  monthly_metrics: Dict[str, Any] = None) -> Tuple[str, int]:
+    """write_spreadsheet, opening or creating the spreadsheet by title when
+    no id is known or the known one is gone; returns the id written to and
+    rows written"""
+    if spreadsheet_id:
+        try:
+            return spreadsheet_id, write_spreadsheet(
+                client, db, user_id, spreadsheet_id, sheets, full_rewrite, monthly_metrics
+            )
+        except gspread.exceptions.APIError as e:
+            if not _is_not_found(e):
+                raise
+            print(f"Spreadsheet {spreadsheet_id} not found. Creating a new one.")
+
+    spreadsheet_id = _open_or_create(client, title)
+    return spreadsheet_id, write_spreadsheet(
+        client, db, user_id, spreadsheet_id, sheets, full_rewrite, monthly_metrics
+    )
+
+def write_spreadsheet(client, db: Client, user_id: str, spreadsheet_id: str, sheets: list,
+                      full_rewrite: bool = False, monthly_metrics: Dict[str, Any] = None) -> int:
+    """Bring worksheets up to date with a single batchUpdate request; returns rows written
 
-def create_monthly_summary(spreadsheet, loans_data: list, installments_data: list, transactions_data: list):
-    """Create a monthly summary sheet with key metrics"""
+    `sheets` holds (title, records, keys) tuples; `monthly_metrics` adds a
+    Monthly_Summary sheet. Worksheet ids come from the recorded sync state
+    when every sheet has one, otherwise from one metadata fetch.
+    """
+    titles = [title for title, _, _ in sheets] + (["Monthly_Summary"] if monthly_metrics else [])
+    track = True
     try:
-        from datetime import datetime
-        
-        # Calculate metrics
-        total_disbursed = sum(float(loan.get("principal_amount", 0)) for loan in loans_data)
-        
-        # Total Collected (Installments only)
-        total_installments_collected = sum(float(inst.get("paid_amount", 0)) for inst in installments_data)
-        
-        # Cash Flow Calculations (matching logic in transactions_router)
-        total_txn_credit = sum(float(txn.get("amount", 0)) for txn in transactions_data if txn.get("type") == "CREDIT")
-        total_txn_debit = sum(float(txn.get("amount", 0)) for txn in transactions_data if txn.get("type") == "DEBIT")
-        
-        # Total Inflow = Installments + Credit Txns
-        total_inflow = total_installments_collected + total_txn_credit
-        
-        # Total Outflow = Disbursements + Debit Txns
-        total_outflow = total_disbursed + total_txn_debit
-        
-        active_loans = len([l for l in loans_data if l.get("status") == "ACTIVE"])
-        pending_installments = len([i for i in installments_data if i.get("status") == "PENDING"])
-        overdue_installments = len([i for i in installments_data if i.get("status") == "OVERDUE"])
-        
-        # Create summary sheet
+        states = sheet_sync.load_states(db, user_id, spreadsheet_id)
+    except Exception as state_err:
+        print(f"Warning: Sheet sync state unavailable, rewriting sheets: {str(state_err)}")
+        states, track = {}, False
+
+    recorded = {t: s for t, s in states.items() if s.get("sheet_id") is not None}
+    if all(t in recorded for t in titles):
+        grids = {
+            t: {"sheet_id": s["sheet_id"], "row_count": s["row_count"], "col_count": s["col_count"]}
+            for t, s in recorded.items()
+        }
         try:
-            summary_sheet = spreadsheet.worksheet("Monthly_Summary")
-        except gspread.exceptions.WorksheetNotFound:
-            summary_sheet = spreadsheet.add_worksheet(title="Monthly_Summary", rows="30", cols="5")
-        
-        summary_sheet.clear()
-        
-        # Build summary data
-        current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        summary_data = [
-            ["Debtsify - Monthly Financial Summary"],
-            [f"Generated: {current_date}"],
-            [],
-            ["Metric", "Value"],
-            ["Total Loans", len(loans_data)],
-            ["Active Loans", active_loans],
-            ["Total Disbursed", f"₹{total_disbursed:,.2f}"],
-            ["Total Installments Collected", f"₹{total_installments_collected:,.2f}"],
-            [],
-            ["Cash Flow"],
-            ["Total Inflow", f"₹{total_inflow:,.2f}"],
-            ["Total Outflow", f"₹{total_outflow:,.2f}"],
-            ["Net Cash Flow (Cash in Hand)", f"₹{(total_inflow - total_outflow):,.2f}"],
-            [],
-            ["Installment Status"],
-            ["Pending", pending_installments],
-            ["Overdue", overdue_installments],
-        ]
-        
-        summary_sheet.update('A1', summary_data)
-        
-        # Format the summary sheet
-        summary_sheet.format('A1:B1', {
-            "backgroundColor": {"red": 0.0, "green": 0.3, "blue": 0.7},
-            "textFormat": {"fontSize": 14, "bold": True, "foregroundColor": {"red": 1.0, "green": 1.0, "blue": 1.0}},
-            "horizontalAlignment": "CENTER"
-        })
-        
-        summary_sheet.format('A4:B4', {
-            "backgroundColor": {"red": 0.9, "green": 0.9, "blue": 0.9},
-            "textFormat": {"bold": True}
-        })
-        
-        print("Monthly summary sheet created successfully")
-        
-    except Exception as e:
-        print(f"Failed to create monthly summary: {str(e)}")
+            return _send_batch(client, db, user_id, spreadsheet_id, grids, states, sheets,
+                               full_rewrite, monthly_metrics, track)
+        except gspread.exceptions.APIError as e:
+            if _is_not_found(e):
+                raise
+            print(f"Recorded worksheet ids out of date ({str(e)}), rewriting with fresh metadata")
+            states = {}
+
+    grids = sheet_sync.fetch_grids(client.http_client, spreadsheet_id)
+    # A state only applies to the worksheet it was recorded for
+    states = {t: s for t, s in states.items() if t in grids and grids[t]["sheet_id"] == s.get("sheet_id")}
+    return _send_batch(client, db, user_id, spreadsheet_id, grids, states, sheets,
+                full_rewrite, monthly_metrics, track)
+
+def _send_batch(client, db: Client, user_id: str, spreadsheet_id: str, grids: Dict[str, dict],
+                states: Dict[str, dict], sheets: list, full_rewrite: bool,
+                monthly_metrics: Dict[str, Any], track: bool) -> int:
+    batch = sheet_sync.SpreadsheetBatch(spreadsheet_id, grids)
+    new_states = []
+    for title, data, keys in sheets:
+        try:
+            new_states.append(sync_to_sheet(batch, title, data, states.get(title), keys, full_rewrite))
+        except Exception as e:
+            print(f"Failed to sync {title}: {str(e)}")
+            # Don't re-raise, allow other sheets to sync
+    if monthly_metrics:
+        new_states.append(create_monthly_summary(batch, monthly_metrics))
+
+    if track:
+        try:
+            # Forget the old states before touching the sheets, so a failed
+            # write can only lead to a full rewrite next time
+            sheet_sync.clear_states(db, spreadsheet_id, [state["sheet_name"] for state in new_states])
+        except Exception as state_err:
+            print(f"Warning: Failed to reset sheet sync state: {str(state_err)}")
+            track = False
+
+    batch.send(client.http_client)
+    print(f"Sent {len(batch.requests)} sheet updates to {spreadsheet_id} in one request")
+
+    if track:
+        try:
+            sheet_sync.save_states(db, user_id, spreadsheet_id, new_states)
+        except Exception as state_err:
+            print(f"Warning: Failed to save sheet sync state: {str(state_err)}")
+    return batch.rows_written
+
+def _sheet_state(batch, sheet_name: str, headers, layout) -> dict:
+    grid = batch.grids[sheet_name]
+    return {
+        "sheet_name": sheet_name,
+        "sheet_id": grid["sheet_id"],
+        "row_count": grid["row_count"],
+        "col_count": grid["col_count"],
+        "headers": headers,
+        "layout": layout,
+    }
+
+def _full_sheet(batch, sheet_name: str, data_rows: int, width: int) -> int:
+    # Resize to ensure enough space (min 1000 or data length + 100)
+    required_rows = max(1000, data_rows + 100)
+    if sheet_name in batch.grids:
+        return batch.sheet(sheet_name, required_rows, width, shrink_rows=True)
+    # Create sheet with blue header if new
+    return batch.sheet(sheet_name, max(5000, required_rows), max(20, width))
+
+def sync_to_sheet(batch, sheet_name: str, data: list, state: dict = None, keys: List[str] = None,
+                  full_rewrite: bool = False) -> dict:
+    """Queue the writes that bring a worksheet up to date with `data`
+
+    Only rows that changed since `state` (the sheet's recorded layout, see
+    sheet_sync.py) are written; `keys` identify the records (default: their
+    "id"). Without a usable state, or with `full_rewrite`, the sheet is
+    rewritten. Returns the state to record once the batch is sent.
+    """
+    if not data:
+        sheet_id = _full_sheet(batch, sheet_name, 0, 1)
+        batch.clear(sheet_id)
+        batch.write(sheet_id, 0, [['No data available']])
+        return _sheet_state(batch, sheet_name, None, [])
+
+    headers = list(data[0].keys())
+    if keys is None:
+        keys = [str(item.get("id")) for item in data]
+    unique = len(set(keys)) == len(keys)
+    rows = sheet_sync.to_cells(data, headers)
+
+    if state and state.get("headers") == headers and unique and not full_rewrite and sheet_name in batch.grids:
+        plan = sheet_sync.plan_update([tuple(entry) for entry in state["layout"]], keys, rows)
+        sheet_id = batch.sheet(sheet_name, sheet_sync.FIRST_DATA_ROW + len(plan.layout), len(headers))
+        # The header is always rewritten: restores hand edits, and fails the
+        # batch if the recorded sheet id no longer exists
+        batch.write(sheet_id, 0, [headers])
+        blocks = plan.blocks()
+        for slot, block in blocks:
+            batch.write(sheet_id, sheet_sync.FIRST_DATA_ROW + slot, block)
+        if plan.clear_from < plan.clear_to:
+            batch.clear(sheet_id, sheet_sync.FIRST_DATA_ROW + plan.clear_from,
+                        sheet_sync.FIRST_DATA_ROW + plan.clear_to)
+        print(f"{sheet_name}: {len(plan.writes)} rows written in {len(blocks)} ranges")
+        return _sheet_state(batch, sheet_name, headers, plan.layout)
+
+    sheet_id = _full_sheet(batch, sheet_name, len(data), len(headers))
+    batch.clear(sheet_id)
+    batch.write(sheet_id, 0, [headers] + rows)
+    # Format headers (bold and colored)
+    batch.format(sheet_id, (0, 1), (0, len(headers)), sheet_sync.HEADER_FORMAT)
+
+    if not unique:
+        # Without unique keys the next sync can't diff; record no header to force a rewrite
+        return _sheet_state(batch, sheet_name, None, [])
+    return _sheet_state(batch, sheet_name, headers, sheet_sync.plan_update([], keys, rows).layout)
+
+def create_investment_breakdown(breakdown: list):
+    """Format raw investment breakdown values for the sheet"""
+    return [
+        {
+            "Person": entry["person"],
+            "Start Date": entry["start_date"],
+            "Cycle": entry["cycle"],
+            "Capital": f"₹{entry['capital']:,.0f}",
+            "Int (%)": f"{entry['interest_percentage']:.1f}%",
+            "Received": f"₹{entry['received']:,.0f}",
+            "Mkt Principal": f"₹{entry['mkt_principal']:,.0f}",
+            "Mkt Interest": f"₹{entry['mkt_interest']:,.0f}",
+            "Total Market Value": f"₹{entry['total_market_value']:,.0f}"
+        }
+        for entry in breakdown
+    ]
+
+def create_monthly_summary(batch, metrics: Dict[str, Any]) -> dict:
+    """Queue a monthly summary sheet with key metrics; returns its state"""
+    from datetime import datetime
+    
+    total_inflow = metrics["total_inflow"]
+    total_outflow = metrics["total_outflow"]
+    
+    # Create summary sheet
+    sheet_id = batch.sheet("Monthly_Summary", 30, 5)
+    batch.clear(sheet_id)
+    
+    # Build summary data
+    current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    summary_data = [
+        ["Debtsify - Monthly Financial Summary"],
+        [f"Generated: {current_date}"],
+        [],
+        ["Metric", "Value"],
+        ["Total Loans", metrics["total_loans"]],
+        ["Active Loans", metrics["active_loans"]],
+        ["Total Disbursed", f"₹{metrics['total_disbursed']:,.2f}"],
+        ["Total Installments Collected", f"₹{metrics['total_installments_collected']:,.2f}"],
+        [],
+        ["Cash Flow"],
+        ["Total Inflow", f"₹{total_inflow:,.2f}"],
+        ["Total Outflow", f"₹{total_outflow:,.2f}"],
+        ["Net Cash Flow (Cash in Hand)", f"₹{(total_inflow - total_outflow):,.2f}"],
+        [],
+        ["Installment Status"],
+        ["Pending", metrics["pending_installments"]],
+        ["Overdue", metrics["overdue_installments"]],
+    ]
+    
+    batch.write(sheet_id, 0, summary_data)
+    
+    # Format the summary sheet
+    batch.format(sheet_id, (0, 1), (0, 2), {
+        "backgroundColor": {"red": 0.0, "green": 0.3, "blue": 0.7},
+        "textFormat": {"fontSize": 14, "bold": True, "foregroundColor": {"red": 1.0, "green": 1.0, "blue": 1.0}},
+        "horizontalAlignment": "CENTER"
+    })
+    
+    batch.format(sheet_id, (3, 4), (0, 2), {
+        "backgroundColor": {"red": 0.9, "green": 0.9, "blue": 0.9},
+        "textFormat": {"bold": True}
+    })
+    
+    return _sheet_state(batch, "Monthly_Summary", None, [])
+
+
+# Started and stopped with the app (main.lifespan)
+job_queue = sync_jobs.SyncJobQueue(perform_sync, settings.sync_workers)
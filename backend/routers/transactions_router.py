@@ -1,18 +1,27 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
-from supabase import Client
-from database import get_supabase_admin
-from schemas import TransactionCreate, TransactionResponse, FinancialSummary
+from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File
+from typing import List, Literal
+from datetime import date
+from database import get_supabase_admin, AsyncDatabase
+from schemas import TransactionCreate, TransactionResponse, TransactionPage, TransactionImportReport, FinancialSummary, CashFlowSeries
 from auth import get_current_user_id
+from pagination import fetch_page
+from serialization import json_response
+from config import settings
+import aggregates
+import cashflow
+import csv_import
 
 router = APIRouter(prefix="/transactions", tags=["Transactions"])
 
+# Newest first; id breaks ties between transactions with the same timestamp
+TRANSACTION_SORT_KEY = (("date", True), ("id", True))
+
 
 @router.post("/bulk", response_model=List[TransactionResponse], status_code=status.HTTP_201_CREATED)
 async def create_bulk_transactions(
     transactions: List[TransactionCreate],
     user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_supabase_admin)
+    db: AsyncDatabase = Depends(get_supabase_admin)
 ):
     """Create multiple transactions at once"""
     try:
@@ -31,7 +40,7 @@ async def create_bulk_transactions(
                 txn_dict["date"] = utc_now
             transactions_data.append(txn_dict)
         
-        response = db.table("transactions").insert(transactions_data).execute()
+        response = await db.table("transactions").insert(transactions_data).execute()
         
         if not response.data:
             raise HTTPException(
@@ -39,7 +48,7 @@ async def create_bulk_transactions(
                 detail="Failed to bulk create transactions"
             )
         
-        return [TransactionResponse(**txn) for txn in response.data]
+        return json_response(List[TransactionResponse], response.data, status.HTTP_201_CREATED)
     
     except HTTPException:
         raise
@@ -50,11 +59,36 @@ async def create_bulk_transactions(
         )
 
 
+@router.post("/import", response_model=TransactionImportReport)
+async def import_transactions_csv(
+    file: UploadFile = File(...),
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncDatabase = Depends(get_supabase_admin)
+):
+    """Import transactions from a CSV upload (Date, Amount, Type, Category, Description)
+    
+    Rows are validated one by one and inserted in chunks; rows matching an
+    existing transaction on (date, amount, type, description) are skipped.
+    Returns counts and a per-row error report.
+    """
+    try:
+        report = await csv_import.import_transactions(db, user_id, file.file)
+        return TransactionImportReport(**report)
+    
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to import transactions: {str(e)}"
+        )
+    finally:
+        await file.close()
+
+
 @router.post("", response_model=TransactionResponse, status_code=status.HTTP_201_CREATED)
 async def create_transaction(
     transaction: TransactionCreate,
     user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_supabase_admin)
+    db: AsyncDatabase = Depends(get_supabase_admin)
 ):
     """Create a new transaction"""
     try:
@@ -67,7 +101,7 @@ async def create_transaction(
         if not transaction_data.get("date"):
             transaction_data["date"] = datetime.utcnow().isoformat()
         
-        response = db.table("transactions").insert(transaction_data).execute()
+        response = await db.table("transactions").insert(transaction_data).execute()
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(
@@ -86,24 +120,31 @@ async def create_transaction(
         )
 
 
-@router.get("", response_model=List[TransactionResponse])
+@router.get("", response_model=TransactionPage)
 async def get_transactions(
     type_filter: str | None = None,
-    limit: int = 5000,
+    limit: int | None = None,
+    cursor: str | None = None,
     user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_supabase_admin)
+    db: AsyncDatabase = Depends(get_supabase_admin)
 ):
-    """Get all transactions for the current user"""
+    """Get one page of the current user's transactions, newest first
+    
+    Pass the returned `next_cursor` as `cursor` to fetch the following page;
+    it is null on the last page. `limit` is capped at settings.page_size_max.
+    """
     try:
         query = db.table("transactions").select("*").eq("user_id", user_id)
         
         if type_filter:
             query = query.eq("type", type_filter)
         
-        response = query.order("date", desc=True).limit(limit).execute()
+        rows, next_cursor = await fetch_page(query, TRANSACTION_SORT_KEY, cursor, limit)
         
-        return [TransactionResponse(**txn) for txn in response.data]
+        return json_response(TransactionPage, {"items": rows, "next_cursor": next_cursor})
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -115,11 +156,11 @@ async def get_transactions(
 async def get_transaction(
     transaction_id: str,
     user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_supabase_admin)
+    db: AsyncDatabase = Depends(get_supabase_admin)
 ):
     """Get a specific transaction by ID"""
     try:
-        response = db.table("transactions").select("*").eq("id", transaction_id).eq("user_id", user_id).execute()
+        response = await db.table("transactions").select("*").eq("id", transaction_id).eq("user_id", user_id).execute()
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(
@@ -142,11 +183,11 @@ async def get_transaction(
 async def delete_transaction(
     transaction_id: str,
     user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_supabase_admin)
+    db: AsyncDatabase = Depends(get_supabase_admin)
 ):
     """Delete a transaction"""
     try:
-        check_response = db.table("transactions").select("id").eq("id", transaction_id).eq("user_id", user_id).execute()
+        check_response = await db.table("transactions").select("id").eq("id", transaction_id).eq("user_id", user_id).execute()
         
         if not check_response.data or len(check_response.data) == 0:
             raise HTTPException(
@@ -154,7 +195,7 @@ async def delete_transaction(
                 detail="Transaction not found"
             )
         
-        db.table("transactions").delete().eq("id", transaction_id).execute()
+        await db.table("transactions").delete().eq("id", transaction_id).execute()
         
         return None
     
@@ -170,131 +211,100 @@ async def delete_transaction(
 @router.get("/summary/financial", response_model=FinancialSummary)
 async def get_financial_summary(
     user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_supabase_admin)
+    db: AsyncDatabase = Depends(get_supabase_admin)
 ):
     """Get financial summary for dashboard
     
     Money In Hand = sum(CREDITs) - sum(DEBITs) from transactions table
       - This naturally handles the reinvestment cycle
       - Disbursements are DEBIT, repayments are CREDIT
+    
+    Reads the per-user aggregates maintained by database triggers
+    (see aggregates.py); only the overdue figures are queried live.
     """
     try:
-        # Get all loans
-        loans_response = db.table("loans").select("*").eq("user_id", user_id).execute()
-        loans = loans_response.data
-        
-        # Get all installments
-        installments_response = db.table("installments").select("*").eq("user_id", user_id).execute()
-        installments = installments_response.data
-        
-        # Get all transactions
-        transactions_response = db.table("transactions").select("*").eq("user_id", user_id).execute()
-        transactions = transactions_response.data
-        
-        # Calculate metrics
-        total_loans = len(loans)
-        active_loans = len([l for l in loans if l.get("status") == "ACTIVE"])
-        total_disbursed = sum(float(l.get("principal_amount", 0)) for l in loans)
-        
-        # Market amount calculation (original logic — based on unpaid installments)
-        market_amount = 0.0
-        market_principal = 0.0
-        market_interest = 0.0
-        total_interest_expected = 0.0
-        
-        for loan in loans:
-            l_principal = float(loan.get("principal_amount", 0))
-            loan_type = loan.get("type", "")
-            loan_status = loan.get("status", "ACTIVE")
-            
-            if loan_type == "TOTAL_RATE":
-                multiplier = float(loan.get("total_rate_multiplier", 1.2))
-                total_repay = l_principal * multiplier
-                l_interest = total_repay - l_principal
-                total_interest_expected += l_interest
-                
-                if loan_status != "COMPLETED":
-                    # Get installments for this loan
-                    loan_insts = [i for i in installments if i.get("loan_id") == loan.get("id")]
-                    for inst in loan_insts:
-                        if inst.get("status") != "PAID":
-                            # Amortized Principal vs Interest
-                            remaining = float(inst.get("expected_amount", 0)) - float(inst.get("paid_amount", 0))
-                            market_amount += remaining
-                            market_principal += remaining * (l_principal / total_repay)
-                            market_interest += remaining * (l_interest / total_repay)
-            else:
-                # DAILY_RATE
-                loan_insts = [i for i in installments if i.get("loan_id") == loan.get("id")]
-                total_interest_expected += sum(float(i.get("expected_amount", 0)) for i in loan_insts if i.get("type") == "INTEREST_ONLY")
-                
-                if loan_status == "ACTIVE":
-                    market_amount += l_principal
-                    market_principal += l_principal
-                
-                for inst in loan_insts:
-                    if inst.get("status") != "PAID":
-                        remaining = float(inst.get("expected_amount", 0)) - float(inst.get("paid_amount", 0))
-                        market_amount += remaining
-                        market_interest += remaining
-
-        # ─── Money In Hand (Reinvestment Cycle) ───────────────────
-        # Pure transaction-based: CREDITs - DEBITs
-        # Loan disbursements are already recorded as DEBIT transactions
-        # Repayments are already recorded as CREDIT transactions
-        # This naturally handles the reinvestment cycle
-        total_txn_credit = sum(
-            float(txn.get("amount", 0)) 
-            for txn in transactions 
-            if txn.get("type") == "CREDIT"
-        )
-        total_txn_debit = sum(
-            float(txn.get("amount", 0)) 
-            for txn in transactions 
-            if txn.get("type") == "DEBIT"
+        summary = await aggregates.get_financial_summary(db, user_id)
+        return FinancialSummary(**summary)
+    
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to calculate financial summary: {str(e)}"
         )
+
+
+@router.get("/summary/cash-flow", response_model=CashFlowSeries)
+async def get_cash_flow(
+    granularity: Literal["daily", "weekly", "monthly"] = "daily",
+    start: date | None = None,
+    end: date | None = None,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncDatabase = Depends(get_supabase_admin)
+):
+    """CREDIT vs DEBIT per day, week (Monday to Sunday) or month, with the running balance
+    
+    `end` defaults to today and `start` to 30 periods back. Each point's
+    `balance` is cash in hand at the end of its period: every CREDIT minus
+    every DEBIT up to then. Served from a per-user prefix-sum index that
+    follows new transactions incrementally (see cashflow.py).
+    """
+    try:
+        end = end or date.today()
+        start = start or cashflow.default_start(end, granularity)
         
-        total_inflow = total_txn_credit
-        total_outflow = total_txn_debit
-        cash_in_hand = max(0, total_inflow - total_outflow)
-        
-        # Total collected from installments (for reference)
-        total_collected = sum(
-            float(inst.get("paid_amount", 0)) for inst in installments
-        )
+        if start > end:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="start must not be after end"
+            )
         
-        # Overdue metrics — date-based detection
-        from datetime import date
-        today_str = date.today().isoformat()
+        if cashflow.count_periods(start, end, granularity) > settings.cash_flow_max_points:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Range spans more than {settings.cash_flow_max_points} {granularity} periods"
+            )
         
-        overdue_installments = [
-            inst for inst in installments 
-            if inst.get("status") != "PAID" and (inst.get("due_date", "") < today_str)
-        ]
-        overdue_count = len(overdue_installments)
-        overdue_amount = sum(
-            float(inst.get("expected_amount", 0)) - float(inst.get("paid_amount", 0))
-            for inst in overdue_installments
+        series = await cashflow.get_cash_flow(db, user_id, start, end, granularity)
+        return CashFlowSeries(**series)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to compute cash flow: {str(e)}"
         )
-        
-        return FinancialSummary(
-            total_loans=total_loans,
-            active_loans=active_loans,
-            total_disbursed=total_disbursed,
-            market_amount=market_amount,
-            market_principal=market_principal,
-            market_interest=market_interest,
-            total_interest_expected=total_interest_expected,
-            cash_in_hand=cash_in_hand,
-            total_collected=total_collected,
-            total_inflow=total_inflow,
-            total_outflow=total_outflow,
-            overdue_count=overdue_count,
-            overdue_amount=overdue_amount
+
+
+@router.post("/summary/rebuild", response_model=FinancialSummary)
+async def rebuild_financial_summary(
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncDatabase = Depends(get_supabase_admin)
+):
+    """Rebuild the maintained portfolio aggregates from the live tables"""
+    try:
+        summary = await aggregates.rebuild_portfolio_aggregates(db, user_id)
+        summary.update(await aggregates.fetch_overdue(db, user_id))
+        return FinancialSummary(**summary)
+    
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to rebuild financial summary: {str(e)}"
         )
+
+
+@router.get("/summary/check")
+async def check_financial_summary(
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncDatabase = Depends(get_supabase_admin)
+):
+    """Compare the maintained aggregates with a from-scratch recompute"""
+    try:
+        return await aggregates.check_portfolio_aggregates(db, user_id)
     
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to calculate financial summary: {str(e)}"
+            detail=f"Failed to check financial summary: {str(e)}"
         )
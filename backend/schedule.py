@@ -0,0 +1,144 @@
+"""Repayment schedule generation for new loans.
+
+Mirrors the schedule the Loans screen used to build in the browser:
+
+- TOTAL_RATE: `tenure` REGULAR installments of ceil(principal * multiplier / tenure),
+  one every `days` days after the start date.
+- DAILY_RATE: one INTEREST_ONLY installment of ceil(principal / 1 lakh * rate * days)
+  due `days` after the start date; later ones are generated as interest accrues.
+
+Schedules are built as start-date-independent templates memoized per
+parameter set, so a book full of identical loans computes each shape once.
+"""
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_CEILING
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+FREQUENCY_DAYS = {
+    "DAILY": 1,
+    "WEEKLY": 7,
+    "BIWEEKLY": 15,
+    "MONTHLY": 30,
+}
+
+DEFAULT_FREQUENCY_DAYS = 7
+
+LAKH = Decimal(100000)
+
+# (offset from the start date, installment fields) - the fields are shared
+# between cached schedules and must be copied, never mutated
+Template = Tuple[Tuple[timedelta, Dict[str, Any]], ...]
+
+
+def frequency_days(frequency: str, custom_days: Optional[int] = None) -> int:
+    """Days between installments for a loan's `frequency`
+
+    Accepts a day count ("7"), a Frequency name, or CUSTOM with `custom_days`.
+    """
+    frequency = str(frequency or "").strip().upper()
+    if frequency.isdigit():
+        days = int(frequency)
+    elif frequency == "CUSTOM":
+        if not custom_days:
+            raise ValueError("frequency_days is required for CUSTOM frequency")
+        days = custom_days
+    else:
+        days = FREQUENCY_DAYS.get(frequency, DEFAULT_FREQUENCY_DAYS)
+
+    if days < 1:
+        raise ValueError("Installment frequency must be at least 1 day")
+    return days
+
+
+def _ceil(amount: Decimal) -> Decimal:
+    return amount.to_integral_value(rounding=ROUND_CEILING)
+
+
+def _installment(offset: int, amount: float, inst_type: str, paid: bool) -> Tuple[timedelta, Dict[str, Any]]:
+    return timedelta(days=offset), {
+        "expected_amount": amount,
+        "paid_amount": amount if paid else 0,
+        "penalty": 0,
+        "type": inst_type,
+        "status": "PAID" if paid else "PENDING",
+    }
+
+
+@lru_cache(maxsize=4096)
+def schedule_template(
+    loan_type: str,
+    principal: Decimal,
+    days: int,
+    total_rate_multiplier: Optional[Decimal] = None,
+    tenure: Optional[int] = None,
+    daily_rate_per_lakh: Optional[Decimal] = None,
+    advanced: bool = False
+) -> Template:
+    """Installments of a loan relative to its start date (memoized)"""
+    if loan_type == "TOTAL_RATE":
+        count = tenure or 1
+        total = principal * (total_rate_multiplier or Decimal("1.2"))
+        amount = float(_ceil(total / count))
+        # An advanced loan collects its last installment up front
+        return tuple(
+            _installment(i * days, amount, "REGULAR", advanced and i == count)
+            for i in range(1, count + 1)
+        )
+
+    # DAILY_RATE - an advanced loan collects its first interest up front
+    amount = float(_ceil(principal / LAKH * (daily_rate_per_lakh or Decimal(0)) * days))
+    return (_installment(days, amount, "INTEREST_ONLY", advanced),)
+
+
+def template_for_loan(loan: Dict[str, Any], custom_days: Optional[int] = None, advanced: bool = False) -> Template:
+    """Template for a loan payload (LoanCreate fields)"""
+    def decimal_or_none(value):
+        return None if value is None else Decimal(str(value))
+
+    return schedule_template(
+        loan["type"],
+        Decimal(str(loan["principal_amount"])),
+        frequency_days(loan["frequency"], custom_days),
+        decimal_or_none(loan.get("total_rate_multiplier")),
+        loan.get("tenure"),
+        decimal_or_none(loan.get("daily_rate_per_lakh")),
+        advanced
+    )
+
+
+def build_schedule(
+    loan: Dict[str, Any],
+    custom_days: Optional[int] = None,
+    advanced: bool = False,
+    today: Optional[date] = None
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Installments and advance-payment transactions for a new loan
+
+    Returns (installments, transactions) without user_id/loan_id, which the
+    database fills in when it creates the loan.
+    """
+    start = date.fromisoformat(str(loan["start_date"])[:10])
+    paid_on = (today or date.today()).isoformat()
+    client_name = loan["client_name"]
+
+    installments = []
+    transactions = []
+    for offset, fields in template_for_loan(loan, custom_days, advanced):
+        paid = fields["status"] == "PAID"
+        installments.append({
+            **fields,
+            "client_name": client_name,
+            "due_date": (start + offset).isoformat(),
+            "paid_date": paid_on if paid else None,
+        })
+        if paid:
+            which = "Advanced Installment (Last)" if fields["type"] == "REGULAR" else "Advanced Installment"
+            transactions.append({
+                "amount": fields["expected_amount"],
+                "type": "CREDIT",
+                "category": "Loan Repayment",
+                "description": f"{which} payment from {client_name}",
+            })
+
+    return installments, transactions
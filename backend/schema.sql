@@ -97,7 +97,7 @@ CREATE INDEX IF NOT EXISTS idx_installments_user_id ON public.installments(user_
 CREATE INDEX IF NOT EXISTS idx_installments_loan_id ON public.installments(loan_id);
 CREATE INDEX IF NOT EXISTS idx_installments_status ON public.installments(status);
 CREATE INDEX IF NOT EXISTS idx_installments_user_loan_due ON public.installments(user_id, loan_id, due_date);
-CREATE INDEX IF NOT EXISTS idx_installments_user_status_due ON public.installments(user_id, status, due_date);
+CREATE INDEX IF NOT EXISTS idx_installments_user_status_due_id ON public.installments(user_id, status, due_date, id);
 
 CREATE INDEX IF NOT EXISTS idx_transactions_user_id ON public.transactions(user_id);
 CREATE INDEX IF NOT EXISTS idx_transactions_date ON public.transactions(date);
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, Literal
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from typing import Any, Dict, List, Optional, Literal
 from datetime import datetime
 from enum import Enum
 
@@ -94,7 +94,10 @@ class LoanBase(BaseModel):
 
 
 class LoanCreate(LoanBase):
-    pass
+    # Schedule options - not stored on the loan
+    generate_schedule: bool = True  # create the installment schedule with the loan
+    frequency_days: Optional[int] = Field(default=None, ge=1)  # required for CUSTOM frequency
+    advanced_installment: bool = False  # collect the last (TOTAL_RATE) / first (DAILY_RATE) installment up front
 
 
 class LoanUpdate(BaseModel):
@@ -107,11 +110,23 @@ class LoanResponse(LoanBase):
     user_id: str
     created_at: datetime
     last_interest_generation_date: Optional[str] = None
+    # Installment statistics maintained on the loan row (migrations/add_loan_stats.sql)
+    installment_count: Optional[int] = None
+    unpaid_count: Optional[int] = None
+    outstanding_amount: Optional[float] = None
+    paid_total: Optional[float] = None
+    next_due_date: Optional[str] = None
+    last_paid_date: Optional[str] = None
 
     class Config:
         from_attributes = True
 
 
+class LoanPage(BaseModel):
+    items: List[LoanResponse]
+    next_cursor: Optional[str] = None
+
+
 # Installment Schemas
 class InstallmentBase(BaseModel):
     loan_id: str
@@ -145,6 +160,24 @@ class InstallmentResponse(InstallmentBase):
         from_attributes = True
 
 
+class InstallmentPage(BaseModel):
+    items: List[InstallmentResponse]
+    next_cursor: Optional[str] = None
+
+
+class PaymentCreate(BaseModel):
+    installment_id: str
+    amount: Optional[float] = Field(default=None, gt=0)  # defaults to expected_amount + penalty
+    paid_date: Optional[str] = None  # ISO Date string, defaults to today
+    category: Optional[str] = None  # defaults to "Repayment"
+    description: Optional[str] = None
+
+
+class LoanStatusUpdate(BaseModel):
+    id: str
+    status: LoanStatus
+
+
 # Transaction Schemas
 class TransactionBase(BaseModel):
     amount: float = Field(..., gt=0)
@@ -156,7 +189,16 @@ class TransactionBase(BaseModel):
 
 
 class TransactionCreate(TransactionBase):
-    pass
+    @field_validator("date")
+    @classmethod
+    def check_date(cls, value: Optional[str]) -> Optional[str]:
+        """An ISO date or timestamp (years 1-9999, as Python reads them back)"""
+        if value:
+            try:
+                datetime.fromisoformat(value)
+            except ValueError:
+                raise ValueError(f'Invalid date "{value}", expected an ISO date or timestamp')
+        return value
 
 
 class TransactionResponse(TransactionBase):
@@ -169,6 +211,64 @@ class TransactionResponse(TransactionBase):
         from_attributes = True
 
 
+class TransactionPage(BaseModel):
+    items: List[TransactionResponse]
+    next_cursor: Optional[str] = None
+
+
+class LoanWithSchedule(LoanResponse):
+    installments: List[InstallmentResponse] = []
+    transactions: List[TransactionResponse] = []
+
+
+class ImportRowError(BaseModel):
+    line: int
+    message: str
+
+
+class TransactionImportReport(BaseModel):
+    total_rows: int
+    inserted: int
+    duplicates: int
+    failed: int
+    errors: List[ImportRowError]
+    errors_truncated: bool = False
+
+
+class PaymentResult(BaseModel):
+    installments: List[InstallmentResponse]
+    transactions: List[TransactionResponse]
+    loans: List[LoanStatusUpdate]
+
+
+# Change feed Schemas
+class ChangeFeed(BaseModel):
+    changes: Dict[str, List[Dict[str, Any]]]  # table -> inserted/updated rows
+    deleted: Dict[str, List[str]]  # table -> ids of deleted rows
+    next_cursor: str
+    has_more: bool
+
+
+class ChangeCursor(BaseModel):
+    cursor: str
+
+
+# Sync job Schemas
+class SyncJobResponse(BaseModel):
+    id: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    create_archive: bool
+    full_rewrite: bool
+    coalesced: int = 0  # further requests merged into this job
+    rows_written: Optional[int] = None
+    duration_ms: Optional[int] = None
+    error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    requested_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
 # Dashboard/Analytics Schemas
 class FinancialSummary(BaseModel):
     total_loans: int
@@ -184,3 +284,63 @@ class FinancialSummary(BaseModel):
     total_outflow: float
     overdue_count: int
     overdue_amount: float
+
+
+class AgingRow(BaseModel):
+    name: str
+    count: int
+    amount: float
+    counts: Dict[str, int]
+    amounts: Dict[str, float]
+
+
+class AgingReport(BaseModel):
+    as_of: str  # ISO Date string
+    buckets: List[str]
+    total: AgingRow
+    by_client: List[AgingRow]
+    by_loan_type: List[AgingRow]
+
+
+class CashFlowPoint(BaseModel):
+    period_start: str  # ISO Date string
+    period_end: str
+    credit: float
+    debit: float
+    net: float
+    balance: float  # CREDITs - DEBITs of all time up to period_end
+
+
+class CashFlowSeries(BaseModel):
+    granularity: Literal["daily", "weekly", "monthly"]
+    start: str
+    end: str
+    opening_balance: float
+    credit: float
+    debit: float
+    net: float
+    closing_balance: float
+    points: List[CashFlowPoint]
+
+
+class ForecastAmounts(BaseModel):
+    count: int  # Unpaid installments
+    projected_count: int  # DAILY_RATE interest installments not generated yet
+    amount: float
+    principal: float
+    interest: float
+    accruing_interest: float  # Part of interest from projected installments
+
+
+class ForecastPeriod(ForecastAmounts):
+    period_start: str  # ISO Date string
+    period_end: str
+
+
+class CollectionsForecast(BaseModel):
+    granularity: Literal["daily", "weekly"]
+    start: str
+    end: str
+    overdue: ForecastAmounts
+    total: ForecastAmounts
+    periods: List[ForecastPeriod]
@@ -0,0 +1,27 @@
+"""One-pass validation and orjson rendering for list endpoints.
+
+Building `Model(**row)` per row and returning it lets FastAPI validate the
+result against `response_model` again, dump it and encode it with the
+stdlib `json`. `json_response` instead validates the database rows once with
+a cached TypeAdapter for the whole response type, dumps them in JSON mode
+(the same output FastAPI produces) and renders with orjson. Returning a
+Response skips FastAPI's own pass; `response_model` stays on the route for
+the OpenAPI schema.
+"""
+from functools import lru_cache
+from typing import Any
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+
+
+@lru_cache(maxsize=None)
+def adapter(response_type: Any) -> TypeAdapter:
+    """TypeAdapter of a response type (a model, or e.g. List[Model]), built once"""
+    return TypeAdapter(response_type)
+
+
+def json_response(response_type: Any, content: Any, status_code: int = 200) -> ORJSONResponse:
+    """Validate raw rows (dicts) as `response_type` once and render them with orjson"""
+    type_adapter = adapter(response_type)
+    data = type_adapter.dump_python(type_adapter.validate_python(content), mode="json")
+    return ORJSONResponse(data, status_code=status_code)
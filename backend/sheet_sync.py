@@ -0,0 +1,255 @@
+"""Google Sheets sync state and batched writes.
+
+For every worksheet we remember its sheet id and grid size, the header and,
+per data row, the key of the record it holds and a hash of its content
+(migrations/add_sheet_sync_state.sql). The next sync diffs the new records
+against that layout and only writes rows that changed: records keep their
+row, new records fill the rows freed by deleted ones (or go at the end), and
+leftover gaps are closed by moving rows up from the bottom.
+
+All writes and formatting for one spreadsheet are collected in a
+`SpreadsheetBatch` and sent as a single batchUpdate request. Spreadsheet ids
+and who they were shared with are kept too (migrations/add_sheet_id_map.sql),
+so a sync needs no Drive search or re-share.
+"""
+import hashlib
+import json
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+# Sheet row index (0-based) of the first data row (row 0 is the header)
+FIRST_DATA_ROW = 1
+
+HEADER_FORMAT = {
+    "backgroundColor": {"red": 0.0, "green": 0.4, "blue": 0.8},
+    "textFormat": {"foregroundColor": {"red": 1.0, "green": 1.0, "blue": 1.0}, "bold": True},
+}
+
+
+def row_hash(values: List[str]) -> str:
+    return hashlib.md5(json.dumps(values, ensure_ascii=False).encode()).hexdigest()
+
+
+def to_cells(data: List[dict], headers: List[str]) -> List[List[str]]:
+    """Records as rows of strings in header order (None becomes empty)"""
+    return [
+        ["" if item.get(h) is None else str(item.get(h)) for h in headers]
+        for item in data
+    ]
+
+
+class SheetPlan:
+    """Row writes and trailing clear that bring a worksheet up to date"""
+
+    def __init__(self, writes: Dict[int, List[str]], clear_from: int, clear_to: int,
+                 layout: List[Tuple[str, str]]):
+        self.writes = writes  # data slot (0-based) -> cell values
+        self.clear_from = clear_from  # data slots [clear_from, clear_to) to blank
+        self.clear_to = clear_to
+        self.layout = layout  # (key, hash) per data slot after the update
+
+    def blocks(self) -> List[Tuple[int, List[List[str]]]]:
+        """Contiguous changed rows as (first slot, rows)"""
+        blocks = []
+        for slot in sorted(self.writes):
+            if blocks and slot == blocks[-1][0] + len(blocks[-1][1]):
+                blocks[-1][1].append(self.writes[slot])
+            else:
+                blocks.append((slot, [self.writes[slot]]))
+        return blocks
+
+
+def plan_update(layout: List[Tuple[str, str]], keys: List[str], rows: List[List[str]]) -> SheetPlan:
+    """Diff new rows against the previous (key, hash) layout
+
+    Keys must be unique.
+    """
+    hashes = [row_hash(row) for row in rows]
+    new_index = {key: i for i, key in enumerate(keys)}
+
+    slots: List[Optional[str]] = [key if key in new_index else None for key, _ in layout]
+    old_hash = {key: h for key, h in layout}
+    writes: Dict[int, List[str]] = {}
+
+    # Records still present stay in their row; rewrite those that changed
+    for slot, key in enumerate(slots):
+        if key is not None and old_hash[key] != hashes[new_index[key]]:
+            writes[slot] = rows[new_index[key]]
+
+    # New records fill freed rows first, then go at the end
+    holes = [slot for slot, key in enumerate(slots) if key is None]
+    placed = set(key for key in slots if key is not None)
+    hole_iter = iter(holes)
+    for i, key in enumerate(keys):
+        if key in placed:
+            continue
+        slot = next(hole_iter, None)
+        if slot is None:
+            slot = len(slots)
+            slots.append(key)
+        else:
+            slots[slot] = key
+        writes[slot] = rows[i]
+
+    # Close remaining gaps by moving rows up from the bottom
+    old_length = len(layout)
+    while True:
+        while slots and slots[-1] is None:
+            slots.pop()
+        hole = next((slot for slot, key in enumerate(slots) if key is None), None)
+        if hole is None:
+            break
+        last = len(slots) - 1
+        slots[hole] = slots.pop()
+        writes[hole] = rows[new_index[slots[hole]]]
+        writes.pop(last, None)
+
+    new_layout = [(key, hashes[new_index[key]]) for key in slots]
+    return SheetPlan(writes, len(slots), max(old_length, len(slots)), new_layout)
+
+
+def _cell(value: Any) -> dict:
+    """CellData entering `value` as-is (like a RAW values update)"""
+    if value is None or value == "":
+        return {}
+    if isinstance(value, bool):
+        return {"userEnteredValue": {"boolValue": value}}
+    if isinstance(value, (int, float)):
+        return {"userEnteredValue": {"numberValue": value}}
+    return {"userEnteredValue": {"stringValue": str(value)}}
+
+
+class SpreadsheetBatch:
+    """Requests for one spreadsheet, sent together as a single batchUpdate"""
+
+    def __init__(self, spreadsheet_id: str, grids: Dict[str, dict]):
+        self.spreadsheet_id = spreadsheet_id
+        self.grids = grids  # title -> {"sheet_id", "row_count", "col_count"}
+        self.requests: List[dict] = []
+        self.rows_written = 0
+
+    def sheet(self, title: str, rows: int, cols: int, shrink_rows: bool = False) -> int:
+        """Id of the worksheet `title`, added or resized to fit rows x cols"""
+        grid = self.grids.get(title)
+        if grid is None:
+            used = set(g["sheet_id"] for g in self.grids.values())
+            sheet_id = random.randint(1, 2 ** 31 - 1)
+            while sheet_id in used:
+                sheet_id = random.randint(1, 2 ** 31 - 1)
+            self.requests.append({"addSheet": {"properties": {
+                "sheetId": sheet_id,
+                "title": title,
+                "gridProperties": {"rowCount": rows, "columnCount": cols},
+            }}})
+            self.grids[title] = {"sheet_id": sheet_id, "row_count": rows, "col_count": cols}
+            return sheet_id
+
+        new_rows = rows if shrink_rows else max(grid["row_count"], rows)
+        new_cols = max(grid["col_count"], cols)
+        if (new_rows, new_cols) != (grid["row_count"], grid["col_count"]):
+            self.requests.append({"updateSheetProperties": {
+                "properties": {
+                    "sheetId": grid["sheet_id"],
+                    "gridProperties": {"rowCount": new_rows, "columnCount": new_cols},
+                },
+                "fields": "gridProperties(rowCount,columnCount)",
+            }})
+            grid.update(row_count=new_rows, col_count=new_cols)
+        return grid["sheet_id"]
+
+    def clear(self, sheet_id: int, start_row: int = 0, end_row: Optional[int] = None):
+        """Blank the values (not formatting) of rows [start_row, end_row)"""
+        grid_range = {"sheetId": sheet_id, "startRowIndex": start_row}
+        if end_row is not None:
+            grid_range["endRowIndex"] = end_row
+        self.requests.append({"updateCells": {"range": grid_range, "fields": "userEnteredValue"}})
+
+    def write(self, sheet_id: int, row: int, values: List[List[Any]]):
+        """Write rows of values starting at column A of `row`"""
+        self.rows_written += len(values)
+        self.requests.append({"updateCells": {
+            "start": {"sheetId": sheet_id, "rowIndex": row, "columnIndex": 0},
+            "rows": [{"values": [_cell(value) for value in row_values]} for row_values in values],
+            "fields": "userEnteredValue",
+        }})
+
+    def format(self, sheet_id: int, rows: Tuple[int, int], cols: Tuple[int, int], cell_format: dict):
+        self.requests.append({"repeatCell": {
+            "range": {
+                "sheetId": sheet_id,
+                "startRowIndex": rows[0], "endRowIndex": rows[1],
+                "startColumnIndex": cols[0], "endColumnIndex": cols[1],
+            },
+            "cell": {"userEnteredFormat": cell_format},
+            "fields": f"userEnteredFormat({','.join(cell_format)})",
+        }})
+
+    def send(self, http_client):
+        if self.requests:
+            http_client.batch_update(self.spreadsheet_id, {"requests": self.requests})
+
+
+def fetch_grids(http_client, spreadsheet_id: str) -> Dict[str, dict]:
+    """Sheet id and grid size of every worksheet, from the spreadsheet metadata"""
+    metadata = http_client.fetch_sheet_metadata(spreadsheet_id)
+    grids = {}
+    for sheet in metadata.get("sheets", []):
+        properties = sheet["properties"]
+        grid = properties.get("gridProperties", {})
+        grids[properties["title"]] = {
+            "sheet_id": properties["sheetId"],
+            "row_count": grid.get("rowCount", 0),
+            "col_count": grid.get("columnCount", 0),
+        }
+    return grids
+
+
+def load_states(db, user_id: str, spreadsheet_id: str) -> Dict[str, dict]:
+    """Recorded state of every worksheet of a spreadsheet, by title"""
+    response = db.table("sheet_sync_state") \
+        .select("sheet_name, sheet_id, row_count, col_count, headers, layout") \
+        .eq("user_id", user_id) \
+        .eq("spreadsheet_id", spreadsheet_id) \
+        .execute()
+    return {row["sheet_name"]: row for row in response.data or []}
+
+
+def save_states(db, user_id: str, spreadsheet_id: str, states: List[dict]):
+    """Upsert worksheet states (dicts with sheet_name, sheet_id, row_count,
+    col_count, headers and layout)"""
+    if not states:
+        return
+    db.table("sheet_sync_state").upsert([
+        {
+            **state,
+            "user_id": user_id,
+            "spreadsheet_id": spreadsheet_id,
+            "layout": [list(entry) for entry in state["layout"]],
+        }
+        for state in states
+    ], on_conflict="spreadsheet_id,sheet_name").execute()
+
+
+def clear_states(db, spreadsheet_id: str, sheet_names: List[str]):
+    db.table("sheet_sync_state").delete() \
+        .eq("spreadsheet_id", spreadsheet_id) \
+        .in_("sheet_name", sheet_names) \
+        .execute()
+
+
+def load_spreadsheets(db, user_id: str) -> Dict[str, dict]:
+    """The user's known spreadsheets (id, who they were shared with), by title"""
+    response = db.table("user_spreadsheets") \
+        .select("title, spreadsheet_id, shared_with") \
+        .eq("user_id", user_id) \
+        .execute()
+    return {row["title"]: row for row in response.data or []}
+
+
+def save_spreadsheet(db, user_id: str, title: str, spreadsheet_id: str, shared_with: Optional[str]):
+    db.table("user_spreadsheets").upsert({
+        "user_id": user_id,
+        "title": title,
+        "spreadsheet_id": spreadsheet_id,
+        "shared_with": shared_with,
+    }, on_conflict="user_id,title").execute()
@@ -0,0 +1,218 @@
+"""Columnar monthly archive snapshots.
+
+Every monthly archive (POST /sync?create_archive=true) is also written to
+`settings.archive_dir` as one gzip-compressed JSON array per column:
+
+    {archive_dir}/{user_id}/{YYYY-MM}/manifest.json
+    {archive_dir}/{user_id}/{YYYY-MM}/{table}/{column}.json.gz
+
+The manifest lists each table's row count and columns (with the type of
+their values), and is written last, so a snapshot without one is
+incomplete and ignored. Queries read only the columns they use, so past
+months can be aggregated without touching the live tables.
+"""
+import gzip
+import json
+import os
+import re
+import shutil
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from config import settings
+
+SNAPSHOT_TABLES = ("loans", "installments", "transactions")
+
+AGGREGATES = ("count", "sum", "avg", "min", "max")
+
+PERIOD_PATTERN = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+_COLUMN_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _user_dir(user_id: str) -> str:
+    return os.path.join(settings.archive_dir, str(uuid.UUID(user_id)))
+
+
+def _column_type(values: List[Any]) -> str:
+    types = set()
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            types.add("boolean")
+        elif isinstance(value, (int, float)):
+            types.add("number")
+        elif isinstance(value, str):
+            types.add("string")
+        else:
+            types.add("json")
+    if not types:
+        return "null"
+    return types.pop() if len(types) == 1 else "mixed"
+
+
+def write_snapshot(user_id: str, period: str, tables: Dict[str, List[dict]]) -> dict:
+    """Write (or replace) the user's snapshot for `period`; returns its manifest"""
+    if not PERIOD_PATTERN.match(period):
+        raise ValueError(f"Invalid period: {period}")
+
+    user_dir = _user_dir(user_id)
+    staging = os.path.join(user_dir, f".{period}.{uuid.uuid4().hex}")
+    manifest = {
+        "period": period,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "tables": {},
+    }
+
+    try:
+        for table, rows in tables.items():
+            columns = []
+            for row in rows:
+                for column in row:
+                    if column not in columns and _COLUMN_PATTERN.match(column):
+                        columns.append(column)
+
+            os.makedirs(os.path.join(staging, table))
+            column_types = {}
+            for column in columns:
+                values = [row.get(column) for row in rows]
+                column_types[column] = _column_type(values)
+                with gzip.open(os.path.join(staging, table, f"{column}.json.gz"), "wt", encoding="utf-8") as f:
+                    json.dump(values, f, ensure_ascii=False, default=str, separators=(",", ":"))
+            manifest["tables"][table] = {"rows": len(rows), "columns": column_types}
+
+        with open(os.path.join(staging, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        # Swap the finished snapshot in
+        final = os.path.join(user_dir, period)
+        if os.path.exists(final):
+            retired = os.path.join(user_dir, f".{period}.old.{uuid.uuid4().hex}")
+            os.replace(final, retired)
+            os.replace(staging, final)
+            shutil.rmtree(retired, ignore_errors=True)
+        else:
+            os.replace(staging, final)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    return manifest
+
+
+def list_snapshots(user_id: str) -> List[dict]:
+    """Manifests of the user's complete snapshots, oldest first"""
+    user_dir = _user_dir(user_id)
+    if not os.path.isdir(user_dir):
+        return []
+    manifests = []
+    for period in sorted(os.listdir(user_dir)):
+        path = os.path.join(user_dir, period, "manifest.json")
+        if PERIOD_PATTERN.match(period) and os.path.isfile(path):
+            with open(path, encoding="utf-8") as f:
+                manifests.append(json.load(f))
+    return manifests
+
+
+def read_column(user_id: str, period: str, table: str, column: str, rows: int) -> List[Any]:
+    """Values of one column (all None if the snapshot doesn't have it)"""
+    path = os.path.join(_user_dir(user_id), period, table, f"{column}.json.gz")
+    if not os.path.isfile(path):
+        return [None] * rows
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class _Accumulator:
+    __slots__ = ("count", "total", "minimum", "maximum")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, value):
+        if value is None:
+            return
+        self.count += 1
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            self.total += value
+        try:
+            if self.minimum is None or value < self.minimum:
+                self.minimum = value
+            if self.maximum is None or value > self.maximum:
+                self.maximum = value
+        except TypeError:
+            # Mixed types in one column: order as text
+            if str(value) < str(self.minimum):
+                self.minimum = value
+            if str(value) > str(self.maximum):
+                self.maximum = value
+
+    def result(self, fn: str):
+        if fn == "count":
+            return self.count
+        if fn == "sum":
+            return self.total
+        if fn == "avg":
+            return self.total / self.count if self.count else None
+        return self.minimum if fn == "min" else self.maximum
+
+
+def query(user_id: str, table: str, metrics: List[Tuple[str, Optional[str]]], group_by: Optional[str] = None,
+          filters: Optional[Dict[str, str]] = None, start: Optional[str] = None,
+          end: Optional[str] = None) -> List[dict]:
+    """Aggregate a table over the user's snapshots, per period (and group)
+
+    `metrics` are (function, column) pairs, column None for a row count.
+    `filters` keep rows whose column equals the value (compared as text).
+    Raises ValueError for unknown tables, columns or functions.
+    """
+    if table not in SNAPSHOT_TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    filters = filters or {}
+    for fn, column in metrics:
+        if fn not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate: {fn}")
+        if column is None and fn != "count":
+            raise ValueError(f"{fn} needs a column")
+
+    snapshots = [
+        m for m in list_snapshots(user_id)
+        if table in m["tables"] and (not start or m["period"] >= start) and (not end or m["period"] <= end)
+    ]
+    known = set()
+    for manifest in snapshots:
+        known.update(manifest["tables"][table]["columns"])
+    needed = set(filters) | {column for _, column in metrics if column} | ({group_by} if group_by else set())
+    unknown = sorted(needed - known)
+    if snapshots and unknown:
+        raise ValueError(f"Unknown column(s): {', '.join(unknown)}")
+
+    results = []
+    for manifest in snapshots:
+        period = manifest["period"]
+        rows = manifest["tables"][table]["rows"]
+        columns = {column: read_column(user_id, period, table, column, rows) for column in needed}
+
+        groups: Dict[Any, Dict[Optional[str], _Accumulator]] = defaultdict(lambda: defaultdict(_Accumulator))
+        for i in range(rows):
+            if any(str(columns[column][i]) != value for column, value in filters.items()):
+                continue
+            key = columns[group_by][i] if group_by else None
+            if isinstance(key, (dict, list)):
+                key = json.dumps(key, sort_keys=True)
+            accumulators = groups[key]
+            accumulators[None].count += 1
+            for column in {column for _, column in metrics if column}:
+                accumulators[column].add(columns[column][i])
+
+        for key in sorted(groups, key=lambda k: (k is None, str(k))):
+            entry = {"period": period}
+            if group_by:
+                entry[group_by] = key
+            for fn, column in metrics:
+                entry[f"{fn}_{column}" if column else fn] = groups[key][column].result(fn)
+            results.append(entry)
+    return results
@@ -0,0 +1,205 @@
+"""Google Sheets sync job queue (see migrations/add_sync_jobs.sql).
+
+POST /sync records a job in sync_jobs and hands it to a worker pool of its
+own, so syncs never take threads from request handling. A user has at most
+one queued job: further requests are merged into it (archive and full
+rewrite flags are OR-ed), and a user's jobs run one at a time. Job state
+lives in the database, so it survives restarts: on startup queued jobs are
+resumed and jobs that were running are marked failed. Without the migration
+jobs are kept in memory instead (same merging, lost on restart).
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Set
+from postgrest.exceptions import APIError
+from supabase import Client
+from data_versions import bump_data_version
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class SyncJobQueue:
+    """Bounded worker pool running sync jobs recorded in the database
+
+    `run(user_id, db, create_archive, full_rewrite)` does the sync and
+    returns a dict with "rows_written" (everything else is kept as the
+    job's result).
+    """
+
+    def __init__(self, run: Callable[..., dict], workers: int):
+        self.run = run
+        self.workers = workers
+        self.db: Optional[Client] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._active_users: Set[str] = set()  # a job submitted or running
+        self._waiting: Dict[str, str] = {}  # user -> job queued behind the active one
+        # False when the sync_jobs table is missing: jobs live in _unrecorded
+        self.recorded = True
+        self._unrecorded: Dict[str, dict] = {}  # job id -> job
+
+    def start(self, db: Client):
+        """Start the workers and pick up jobs left by the previous process"""
+        self.db = db
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sync-job")
+        try:
+            db.table("sync_jobs").update({
+                "status": FAILED,
+                "error": "Interrupted by server restart",
+                "finished_at": _now(),
+            }).eq("status", RUNNING).execute()
+            queued = db.table("sync_jobs").select("id, user_id").eq("status", QUEUED) \
+                .order("requested_at").execute()
+        except APIError as e:
+            self.recorded = False
+            logging.warning(f"sync_jobs unavailable (apply migrations/add_sync_jobs.sql), "
+                            f"sync jobs are kept in memory only: {e.message}")
+            return
+        except Exception as e:
+            logging.warning(f"Sync jobs not recovered: {str(e)}")
+            return
+        for job in queued.data or []:
+            self._dispatch(job["id"], job["user_id"])
+
+    def shutdown(self):
+        # Queued jobs stay in the table and resume on the next start
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def enqueue(self, user_id: str, create_archive: bool = False, full_rewrite: bool = False) -> dict:
+        """Queue a sync for the user, merging it into their queued job if any"""
+        if not self.recorded:
+            return self._enqueue_unrecorded(user_id, create_archive, full_rewrite)
+        db = self.db
+        for _ in range(3):
+            queued = db.table("sync_jobs").select("*").eq("user_id", user_id).eq("status", QUEUED).execute()
+            if queued.data:
+                job = queued.data[0]
+                merged = db.table("sync_jobs").update({
+                    "create_archive": job["create_archive"] or create_archive,
+                    "full_rewrite": job["full_rewrite"] or full_rewrite,
+                    "coalesced": job["coalesced"] + 1,
+                }).eq("id", job["id"]).eq("status", QUEUED).execute()
+                if merged.data:
+                    return merged.data[0]
+                continue  # It started running meanwhile
+
+            try:
+                created = db.table("sync_jobs").insert({
+                    "user_id": user_id,
+                    "status": QUEUED,
+                    "create_archive": create_archive,
+                    "full_rewrite": full_rewrite,
+                }).execute()
+            except APIError as e:
+                if e.code != "23505":
+                    raise
+                continue  # Another request queued one at the same moment
+            job = created.data[0]
+            self._dispatch(job["id"], user_id)
+            return job
+
+        raise RuntimeError("Could not queue sync job")
+
+    def _enqueue_unrecorded(self, user_id: str, create_archive: bool, full_rewrite: bool) -> dict:
+        with self._lock:
+            for job in self._unrecorded.values():
+                if job["user_id"] == user_id and job["status"] == QUEUED:
+                    job["create_archive"] = job["create_archive"] or create_archive
+                    job["full_rewrite"] = job["full_rewrite"] or full_rewrite
+                    job["coalesced"] += 1
+                    return dict(job)
+            # Only the user's latest finished job is kept for polling
+            for job_id in [key for key, job in self._unrecorded.items()
+                           if job["user_id"] == user_id and job["status"] in (SUCCEEDED, FAILED)]:
+                del self._unrecorded[job_id]
+            job = {
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "status": QUEUED,
+                "create_archive": create_archive,
+                "full_rewrite": full_rewrite,
+                "coalesced": 0,
+                "requested_at": _now(),
+            }
+            self._unrecorded[job["id"]] = job
+        self._dispatch(job["id"], user_id)
+        return dict(job)
+
+    def get(self, job_id: str, user_id: str) -> Optional[dict]:
+        if not self.recorded:
+            with self._lock:
+                job = self._unrecorded.get(job_id)
+                return dict(job) if job and job["user_id"] == user_id else None
+        response = self.db.table("sync_jobs").select("*").eq("id", job_id).eq("user_id", user_id).execute()
+        return response.data[0] if response.data else None
+
+    def _dispatch(self, job_id: str, user_id: str):
+        with self._lock:
+            if user_id in self._active_users:
+                # Runs when the user's current job finishes
+                self._waiting[user_id] = job_id
+                return
+            self._active_users.add(user_id)
+        self._executor.submit(self._run, job_id, user_id)
+
+    def _run(self, job_id: str, user_id: str):
+        try:
+            self._execute(job_id)
+        except Exception:
+            logging.exception(f"Sync job {job_id} could not be recorded")
+        finally:
+            with self._lock:
+                next_job = self._waiting.pop(user_id, None)
+                if next_job is None:
+                    self._active_users.discard(user_id)
+            if next_job is not None:
+                self._executor.submit(self._run, next_job, user_id)
+
+    def _execute(self, job_id: str):
+        if not self.recorded:
+            with self._lock:
+                job = self._unrecorded.get(job_id)
+                if job is None or job["status"] != QUEUED:
+                    return
+                job.update({"status": RUNNING, "started_at": _now()})
+                claimed = dict(job)
+            update = self._perform(job_id, claimed)
+            with self._lock:
+                job.update(update)
+            return
+
+        db = self.db
+        claimed = db.table("sync_jobs").update({"status": RUNNING, "started_at": _now()}) \
+            .eq("id", job_id).eq("status", QUEUED).execute()
+        if not claimed.data:
+            return  # Already taken
+        update = self._perform(job_id, claimed.data[0])
+        db.table("sync_jobs").update(update).eq("id", job_id).execute()
+
+    def _perform(self, job_id: str, job: dict) -> dict:
+        """Run a claimed job; returns its finished state"""
+        db = self.db
+        started = time.perf_counter()
+        try:
+            result = self.run(job["user_id"], db, job["create_archive"], job["full_rewrite"])
+            rows_written = result.pop("rows_written", None)
+            update = {"status": SUCCEEDED, "rows_written": rows_written, "result": result}
+        except Exception as e:
+            logging.exception(f"Sync job {job_id} failed")
+            update = {"status": FAILED, "error": str(e)}
+        finally:
+            # The sync may update investment_breakdown
+            bump_data_version(job["user_id"])
+
+        update["finished_at"] = _now()
+        update["duration_ms"] = int((time.perf_counter() - started) * 1000)
+        return update
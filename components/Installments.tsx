@@ -1,56 +1,67 @@
-import React, { useState, useMemo } from 'react';
+import React, { useState, useEffect, useMemo } from 'react';
 import { useData } from '../context/DataContext';
+import { installmentsAPI, loansAPI } from '../services/api';
+import usePagedList from '../hooks/usePagedList';
 import { LoanType, Frequency } from '../types';
 import { CheckCircle2, AlertCircle, RotateCcw, DollarSign, Calendar, Loader2, Download, Pencil, Search, AlertTriangle } from 'lucide-react';
 
+const PAGE_SIZE = 100;
+
 const Installments: React.FC = () => {
-   const { installments, updateInstallment, addTransaction, loans, addInstallments, updateLoan, isLoading } = useData();
+   const { updateInstallment, addTransaction, recordPayments, accrueInterest, loans, updateLoan, financialSummary, isLoading } = useData();
    const [filter, setFilter] = useState<'ALL' | 'PENDING' | 'OVERDUE' | 'PAID'>('PENDING');
    const [searchTerm, setSearchTerm] = useState('');
+   const [clientName, setClientName] = useState('');
    const [actionLoading, setActionLoading] = useState<string | null>(null);
    const [editModal, setEditModal] = useState<any>(null);
    const [editPenalty, setEditPenalty] = useState<string>('0');
 
-   // Get days based on frequency
-   const getFrequencyDays = (freq: any): number => {
-      if (!isNaN(Number(freq)) && freq !== '') return Number(freq);
-      switch (freq) {
-         case 'DAILY': return 1;
-         case 'WEEKLY': return 7;
-         case 'BIWEEKLY': return 15;
-         case 'MONTHLY': return 30;
-         default: return 7;
-      }
-   };
-
    // Compute effective status: if PENDING and due_date < today => OVERDUE
    const today = new Date().toISOString().split('T')[0];
 
+   // Search on the server once typing pauses
+   useEffect(() => {
+      const timer = setTimeout(() => setClientName(searchTerm.trim()), 300);
+      return () => clearTimeout(timer);
+   }, [searchTerm]);
+
+   // Filtered and paged on the server, earliest due first; reloaded after
+   // every data refresh (financialSummary is replaced on each one)
+   const { items, hasMore, isLoading: isPageLoading, error: pageError, loadMore, reload, replace } = usePagedList<any>(
+      (cursor) => {
+         if (filter === 'OVERDUE') {
+            return installmentsAPI.getOverdue(cursor, PAGE_SIZE, undefined, clientName);
+         }
+         const filters = {
+            ALL: {},
+            PENDING: { status: 'PENDING', dueFrom: today },
+            PAID: { status: 'PAID' },
+         }[filter];
+         return installmentsAPI.getPage({ ...filters, clientName }, cursor, PAGE_SIZE);
+      },
+      [filter, clientName, today, financialSummary]
+   );
+
    const installmentsWithOverdue = useMemo(() => {
-      return installments.map(i => {
+      return items.map(i => {
          const dueDate = i.due_date || i.dueDate;
          if (i.status === 'PENDING' && dueDate < today) {
             return { ...i, effectiveStatus: 'OVERDUE' as const };
          }
          return { ...i, effectiveStatus: i.status as string };
       });
-   }, [installments, today]);
+   }, [items, today]);
 
-   const overdueCount = useMemo(() => {
-      return installmentsWithOverdue.filter(i => i.effectiveStatus === 'OVERDUE').length;
-   }, [installmentsWithOverdue]);
+   const overdueCount = financialSummary?.overdue_count || 0;
 
-   const filtered = installmentsWithOverdue
-      .filter(i => {
-         const matchesStatus = filter === 'ALL' ? true : i.effectiveStatus === filter;
-         const clientName = i.client_name || i.clientName || '';
-         const matchesSearch = clientName.toLowerCase().includes(searchTerm.toLowerCase());
-         return matchesStatus && matchesSearch;
-      })
-      .sort((a, b) => new Date(a.due_date || a.dueDate).getTime() - new Date(b.due_date || b.dueDate).getTime());
+   // Loan of an installment: from context when loaded there, else fetched
+   const findLoan = async (inst: any) => {
+      const loanId = inst.loan_id || inst.loanId;
+      return loans.find(l => l.id === loanId) || await loansAPI.getById(loanId).catch(() => null);
+   };
 
    const handlePay = async (inst: any) => {
-      const loan = loans.find(l => l.id === (inst.loan_id || inst.loanId));
+      const loan = await findLoan(inst);
       if (!loan) {
          alert('Associated loan not found!');
          return;
@@ -62,38 +73,18 @@ const Installments: React.FC = () => {
          const penalty = inst.penalty || 0;
          const totalAmount = expectedAmount + penalty;
 
-         // 1. Update Installment
-         await updateInstallment(inst.id, {
-            status: 'PAID',
-            paid_amount: totalAmount,
-            paid_date: new Date().toISOString().split('T')[0]
-         });
-
-         // 2. Add Transaction
-         await addTransaction({
-            date: new Date().toISOString(),
+         // 1-2. Mark paid + CREDIT transaction + loan status, in one call
+         const paid = await recordPayments([{
+            installment_id: inst.id,
             amount: totalAmount,
-            type: 'CREDIT',
-            category: 'Repayment',
-            description: `Payment from ${inst.client_name || inst.clientName} (${inst.type})`
-         });
+            paid_date: new Date().toISOString().split('T')[0]
+         }]);
+         paid.forEach(replace);
 
-         // 3. Daily Rate Logic: Generate NEXT Installment
+         // 3. Daily Rate Logic: the server generates the next interest
+         // installment once its period has begun (daily accrual job)
          if ((loan.type === 'DAILY_RATE' || loan.type === LoanType.DAILY_RATE) && inst.type === 'INTEREST_ONLY') {
-            const days = getFrequencyDays(loan.frequency);
-            const nextDueDate = new Date(inst.due_date || inst.dueDate);
-            nextDueDate.setDate(nextDueDate.getDate() + days);
-
-            await addInstallments([{
-               loan_id: loan.id,
-               client_name: loan.client_name || loan.clientName,
-               due_date: nextDueDate.toISOString().split('T')[0],
-               expected_amount: expectedAmount,
-               paid_amount: 0,
-               penalty: 0,
-               status: 'PENDING',
-               type: 'INTEREST_ONLY'
-            }]);
+            await accrueInterest(loan.id);
          }
       } catch (error: any) {
          alert(`Error: ${error.message}`);
@@ -105,7 +96,7 @@ const Installments: React.FC = () => {
    const handleSettlePrincipal = async (inst: any) => {
       if (!window.confirm("Are you sure you want to settle the FULL principal and close this loan?")) return;
 
-      const loan = loans.find(l => l.id === (inst.loan_id || inst.loanId));
+      const loan = await findLoan(inst);
       if (!loan) return;
 
       setActionLoading(inst.id);
@@ -114,11 +105,11 @@ const Installments: React.FC = () => {
          const penalty = inst.penalty || 0;
 
          // Mark current interest as paid
-         await updateInstallment(inst.id, {
+         replace(await updateInstallment(inst.id, {
             status: 'PAID',
             paid_amount: expectedAmount + penalty,
             paid_date: new Date().toISOString().split('T')[0]
-         });
+         }));
 
          // Add interest payment transaction
          await addTransaction({
@@ -161,11 +152,11 @@ const Installments: React.FC = () => {
          const paidAmount = inst.paid_amount || inst.paidAmount || 0;
 
          // 1. Revert Installment
-         await updateInstallment(inst.id, {
+         replace(await updateInstallment(inst.id, {
             status: newStatus,
             paid_amount: 0,
             paid_date: null
-         });
+         }));
 
          // 2. Add correction debit
          if (paidAmount > 0) {
@@ -191,9 +182,9 @@ const Installments: React.FC = () => {
 
       setActionLoading(editModal.id);
       try {
-         await updateInstallment(editModal.id, {
+         replace(await updateInstallment(editModal.id, {
             penalty: Number(editPenalty) || 0
-         });
+         }));
          setEditModal(null);
          alert('Penalty updated successfully!');
       } catch (error: any) {
@@ -203,8 +194,16 @@ const Installments: React.FC = () => {
       }
    };
 
-   // Export to Excel (CSV format)
-   const exportToExcel = () => {
+   // Export to Excel (CSV format): every installment, not just the loaded pages
+   const exportToExcel = async () => {
+      let installments: any[];
+      try {
+         installments = await installmentsAPI.getAll();
+      } catch (error: any) {
+         alert(`Export failed: ${error.message}`);
+         return;
+      }
+
       const headers = ['ID', 'Client Name', 'Due Date', 'Type', 'Expected Amount', 'Paid Amount', 'Penalty', 'Status', 'Paid Date'];
       const rows = installments.map(inst => {
          const clientName = inst.client_name || inst.clientName;
@@ -300,10 +299,10 @@ const Installments: React.FC = () => {
                      </tr>
                   </thead>
                   <tbody className="divide-y divide-slate-100">
-                     {filtered.length === 0 ? (
-                        <tr><td colSpan={6} className="p-8 text-center text-slate-400">No installments found</td></tr>
+                     {installmentsWithOverdue.length === 0 ? (
+                        <tr><td colSpan={6} className="p-8 text-center text-slate-400">{isPageLoading ? 'Loading...' : 'No installments found'}</td></tr>
                      ) : (
-                        filtered.map(inst => {
+                        installmentsWithOverdue.map(inst => {
                            const isDaily = inst.type === 'INTEREST_ONLY';
                            const dueDate = inst.due_date || inst.dueDate;
                            const clientName = inst.client_name || inst.clientName;
@@ -389,6 +388,19 @@ const Installments: React.FC = () => {
                   </tbody>
                </table>
             </div>
+            {(hasMore || pageError) && (
+               <div className="p-4 border-t border-slate-100 flex flex-col items-center gap-2">
+                  {pageError && <p className="text-sm text-red-500">{pageError}</p>}
+                  <button
+                     onClick={pageError ? reload : loadMore}
+                     disabled={isPageLoading}
+                     className="px-4 py-2 text-sm font-medium text-primary-600 hover:bg-primary-50 rounded-lg flex items-center gap-2 disabled:opacity-50"
+                  >
+                     {isPageLoading && <Loader2 size={16} className="animate-spin" />}
+                     {pageError ? 'Retry' : 'Load more'}
+                  </button>
+               </div>
+            )}
          </div>
 
          {/* Edit Penalty Modal */}
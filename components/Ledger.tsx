@@ -1,10 +1,11 @@
 import React, { useRef, useState, useMemo } from 'react';
 import { useData } from '../context/DataContext';
+import { transactionsAPI } from '../services/api';
 import { Transaction } from '../types';
 import { Download, Upload, ArrowUpRight, ArrowDownLeft, Loader2, Search, Filter, X } from 'lucide-react';
 
 const Ledger: React.FC = () => {
-  const { transactions, addTransaction, isLoading } = useData();
+  const { transactions, isLoading, refreshData } = useData();
   const fileInputRef = useRef<HTMLInputElement>(null);
   const [isImporting, setIsImporting] = useState(false);
 
@@ -76,91 +77,32 @@ const Ledger: React.FC = () => {
     if (!file) return;
 
     setIsImporting(true);
-    const reader = new FileReader();
-
-    reader.onload = async (event) => {
-      const csv = event.target?.result as string;
-      const lines = csv.split(/\r?\n/);
-      let count = 0;
-      let errors = 0;
-      const errorMessages: string[] = [];
-
-      // Skip header
-      for (let i = 1; i < lines.length; i++) {
-        const line = lines[i].trim();
-        if (!line) continue;
-
-        // Handle comma in quoted fields
-        const parts = line.match(/(".*?"|[^",]+)(?=\s*,|\s*$)/g) || [];
-        const [date, amount, type, category, desc] = parts.map(p => p.replace(/^"|"$/g, '').trim());
-
-        if (!date || !amount || !type) {
-          errors++;
-          errorMessages.push(`Line ${i + 1}: Missing required fields`);
-          continue;
-        }
-
-        const parsedAmount = parseFloat(amount.replace(/[₹,]/g, ''));
-        if (isNaN(parsedAmount) || parsedAmount <= 0) {
-          errors++;
-          errorMessages.push(`Line ${i + 1}: Invalid amount "${amount}"`);
-          continue;
-        }
-
-        let parsedDate: Date;
-        try {
-          if (date.includes('-')) {
-            const parts = date.split('-');
-            if (parts[0].length === 4) {
-              parsedDate = new Date(date);
-            } else {
-              parsedDate = new Date(`${parts[2]}-${parts[1]}-${parts[0]}`);
-            }
-          } else if (date.includes('/')) {
-            const parts = date.split('/');
-            parsedDate = new Date(`${parts[2]}-${parts[1]}-${parts[0]}`);
-          } else {
-            parsedDate = new Date(date);
-          }
-
-          if (isNaN(parsedDate.getTime())) {
-            throw new Error('Invalid date');
-          }
-        } catch {
-          errors++;
-          errorMessages.push(`Line ${i + 1}: Invalid date format "${date}"`);
-          continue;
-        }
-
-        try {
-          await addTransaction({
-            date: parsedDate.toISOString(),
-            amount: parsedAmount,
-            type: type.toUpperCase() === 'CREDIT' ? 'CREDIT' : 'DEBIT',
-            category: category || 'Imported',
-            description: desc || 'CSV Import'
-          });
-          count++;
-        } catch (err: any) {
-          errors++;
-          errorMessages.push(`Line ${i + 1}: ${err.message || 'Failed to create'}`);
-        }
-      }
 
-      if (errors > 0) {
-        alert(`Imported ${count} transactions. ${errors} failed.\n\nFirst errors:\n${errorMessages.slice(0, 3).join('\n')}`);
-      } else if (count === 0) {
+    try {
+      // Parsed, validated and de-duplicated on the server in chunks
+      const report = await transactionsAPI.importCSV(file);
+      const skipped = report.duplicates + report.failed;
+
+      if (skipped > 0) {
+        const firstErrors = report.errors.slice(0, 3).map((err: any) => `Line ${err.line}: ${err.message}`);
+        alert(`Imported ${report.inserted} transactions. ${report.duplicates} duplicates skipped, ${report.failed} failed.\n\nFirst errors:\n${firstErrors.join('\n')}`);
+      } else if (report.inserted === 0) {
         alert('No transactions found in CSV.');
       } else {
-        alert(`Imported ${count} transactions successfully.`);
+        alert(`Imported ${report.inserted} transactions successfully.`);
       }
+
+      if (report.inserted > 0) {
+        await refreshData();
+      }
+    } catch (err: any) {
+      alert(err.message || 'Failed to import transactions');
+    } finally {
       setIsImporting(false);
       if (fileInputRef.current) {
         fileInputRef.current.value = '';
       }
-    };
-
-    reader.readAsText(file);
+    }
   };
 
   const handleExportCSV = () => {
@@ -1,5 +1,7 @@
-import React, { useState, useMemo } from 'react';
+import React, { useState, useEffect, useMemo } from 'react';
 import { useData } from '../context/DataContext';
+import { loansAPI, installmentsAPI } from '../services/api';
+import usePagedList from '../hooks/usePagedList';
 import { LoanType, Frequency } from '../types';
 import { Plus, Search, Loader2, Pencil, Trash2, Download, X, ChevronUp, ChevronDown, Eye, TrendingUp, Clock, CheckCircle2, AlertTriangle, IndianRupee, BarChart3 } from 'lucide-react';
 
@@ -67,13 +69,41 @@ const SimpleInput = ({
   );
 };
 
+const PAGE_SIZE = 60;
+
 const Loans: React.FC = () => {
-  const { loans, installments, addLoan, updateLoan, deleteLoan, addInstallments, addTransaction, isLoading, refreshData } = useData();
+  const { addLoan, updateLoan, deleteLoan, addTransaction, financialSummary, isLoading, refreshData } = useData();
   const [showModal, setShowModal] = useState(false);
   const [editingLoan, setEditingLoan] = useState<any>(null);
   const [searchTerm, setSearchTerm] = useState('');
+  const [clientSearch, setClientSearch] = useState('');
   const [isSubmitting, setIsSubmitting] = useState(false);
   const [summaryLoan, setSummaryLoan] = useState<any>(null);
+  const [summaryInstallments, setSummaryInstallments] = useState<any[] | null>(null);
+
+  // Search on the server once typing pauses
+  useEffect(() => {
+    const timer = setTimeout(() => setClientSearch(searchTerm.trim()), 300);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
+  // Paged on the server, newest first; reloaded after every data refresh
+  // (financialSummary is replaced on each one)
+  const { items: loans, hasMore, isLoading: isPageLoading, error: pageError, loadMore, reload, replace } = usePagedList<any>(
+    (cursor) => loansAPI.getPage({ clientName: clientSearch }, cursor, PAGE_SIZE),
+    [clientSearch, financialSummary]
+  );
+
+  // Only the selected loan's installments are needed for its summary
+  useEffect(() => {
+    setSummaryInstallments(null);
+    if (!summaryLoan) return;
+    let current = true;
+    installmentsAPI.getAll(summaryLoan.id)
+      .then(rows => { if (current) setSummaryInstallments(rows); })
+      .catch(err => { if (current) alert(`Error: ${err.message}`); });
+    return () => { current = false; };
+  }, [summaryLoan]);
 
   // Form State
   const [clientName, setClientName] = useState('');
@@ -196,8 +226,11 @@ const Loans: React.FC = () => {
       }
 
       if (editingLoan) {
-        await updateLoan(editingLoan.id, loanData);
+        replace(await updateLoan(editingLoan.id, loanData));
       } else {
+        // The installment schedule (and any advanced installment payment)
+        // is created by the backend in the same call as the loan
+        loanData.advanced_installment = isAdvancedInstallment;
         const createdLoan = await addLoan(loanData);
         const loanId = createdLoan.id;
 
@@ -232,84 +265,6 @@ const Loans: React.FC = () => {
             related_entity_id: loanId
           });
         }
-
-        // Installments
-        const newInstallments: any[] = [];
-        const start = new Date(startDate);
-        const days = Number(installmentDays);
-
-        if (loanType === LoanType.TOTAL_RATE) {
-          const totalAmount = principalAmt * Number(multiplier);
-          const installmentAmount = Math.ceil(totalAmount / (numInstallments || 1));
-
-          for (let i = 1; i <= numInstallments; i++) {
-            const dueDate = new Date(start);
-            dueDate.setDate(start.getDate() + (i * days));
-
-            // Process rate is now separate, so no addition to first installment
-            const expectedAmt = installmentAmount;
-            const isLastAndAdvanced = isAdvancedInstallment && (i === numInstallments);
-
-            newInstallments.push({
-              loan_id: loanId,
-              client_name: clientName,
-              due_date: dueDate.toISOString().split('T')[0],
-              expected_amount: expectedAmt,
-              paid_amount: isLastAndAdvanced ? expectedAmt : 0,
-              penalty: 0,
-              status: isLastAndAdvanced ? 'PAID' : 'PENDING',
-              paid_date: isLastAndAdvanced ? new Date().toISOString().split('T')[0] : null,
-              type: 'REGULAR'
-            });
-
-            if (isLastAndAdvanced) {
-              await addTransaction({
-                date: new Date().toISOString(),
-                amount: expectedAmt,
-                type: 'CREDIT',
-                category: 'Loan Repayment',
-                description: `Advanced Installment (Last) payment from ${clientName}`,
-                related_entity_id: loanId
-              });
-            }
-          }
-        } else {
-          // Daily Rate
-          const interestAmount = Math.ceil((principalAmt / 100000) * Number(dailyRate) * days);
-          const expectedAmt = interestAmount;
-
-          const dueDate = new Date(start);
-          dueDate.setDate(start.getDate() + days);
-
-          const isAdvanced = isAdvancedInstallment;
-
-          newInstallments.push({
-            loan_id: loanId,
-            client_name: clientName,
-            due_date: dueDate.toISOString().split('T')[0],
-            expected_amount: expectedAmt,
-            paid_amount: isAdvanced ? expectedAmt : 0,
-            penalty: 0,
-            status: isAdvanced ? 'PAID' : 'PENDING',
-            paid_date: isAdvanced ? new Date().toISOString().split('T')[0] : null,
-            type: 'INTEREST_ONLY'
-          });
-
-          if (isAdvanced) {
-            await addTransaction({
-              date: new Date().toISOString(),
-              amount: expectedAmt,
-              type: 'CREDIT',
-              category: 'Loan Repayment',
-              description: `Advanced Installment payment from ${clientName}`,
-              related_entity_id: loanId
-            });
-          }
-        }
-
-        if (newInstallments.length > 0) {
-          await addInstallments(newInstallments);
-        }
       }
 
       await refreshData();
@@ -336,8 +291,16 @@ const Loans: React.FC = () => {
     setEditingLoan(null);
   };
 
-  // Export Logic
-  const exportToExcel = () => {
+  // Export Logic: every loan, not just the loaded pages
+  const exportToExcel = async () => {
+    let loans: any[];
+    try {
+      loans = await loansAPI.getAll();
+    } catch (error: any) {
+      alert(`Export failed: ${error.message}`);
+      return;
+    }
+
     const headers = ['ID', 'Client Name', 'Type', 'Principal', 'Installment Days', 'Status', 'Start Date', 'Multiplier/Rate', 'Num Installments'];
     const rows = loans.map(loan => {
       const clientName = loan.client_name || loan.clientName;
@@ -373,24 +336,11 @@ const Loans: React.FC = () => {
     URL.revokeObjectURL(url);
   };
 
-  const filteredLoans = loans
-    .filter(l => {
-      const name = l.client_name || l.clientName || '';
-      return name.toLowerCase().includes(searchTerm.toLowerCase()) || l.id.includes(searchTerm);
-    })
-    .sort((a, b) => {
-      const dateA = new Date(a.start_date || a.startDate || a.created_at || '').getTime();
-      const dateB = new Date(b.start_date || b.startDate || b.created_at || '').getTime();
-      return dateB - dateA; // Most recent start_date first
-    });
-
   // Compute loan summary for the selected loan
   const loanSummary = useMemo(() => {
-    if (!summaryLoan) return null;
+    if (!summaryLoan || !summaryInstallments) return null;
 
-    const loanInstallments = installments.filter(
-      i => (i.loan_id || i.loanId) === summaryLoan.id
-    );
+    const loanInstallments = summaryInstallments;
 
     const totalInstallments = loanInstallments.length;
     const paidInstallments = loanInstallments.filter(i => i.status === 'PAID').length;
@@ -428,7 +378,7 @@ const Loans: React.FC = () => {
       principalAmount,
       progressPercent,
     };
-  }, [summaryLoan, installments]);
+  }, [summaryLoan, summaryInstallments]);
 
   if (isLoading) {
     return (
@@ -469,7 +419,7 @@ const Loans: React.FC = () => {
           <Search className="absolute left-3 top-1/2 -translate-y-1/2 text-slate-400" size={18} />
           <input
             type="text"
-            placeholder="Search loans by client name or ID..."
+            placeholder="Search loans by client name..."
             className="w-full pl-10 pr-4 py-2 border border-slate-200 rounded-lg focus:outline-none focus:ring-2 focus:ring-primary-500"
             value={searchTerm}
             onChange={e => setSearchTerm(e.target.value)}
@@ -477,13 +427,15 @@ const Loans: React.FC = () => {
         </div>
       </div>
 
-      {filteredLoans.length === 0 ? (
+      {loans.length === 0 ? (
         <div className="bg-white rounded-xl shadow-sm border border-slate-100 p-12 text-center">
-          <p className="text-slate-400">No loans yet. Click "New Loan" to create your first loan.</p>
+          <p className="text-slate-400">
+            {isPageLoading ? 'Loading...' : clientSearch ? 'No loans match your search.' : 'No loans yet. Click "New Loan" to create your first loan.'}
+          </p>
         </div>
       ) : (
         <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4">
-          {filteredLoans.map(loan => {
+          {loans.map(loan => {
             const clientName = loan.client_name || loan.clientName;
             const principalAmount = loan.principal_amount || loan.principalAmount;
             const loanType = loan.type;
@@ -525,6 +477,20 @@ const Loans: React.FC = () => {
         </div>
       )}
 
+      {(hasMore || pageError) && (
+        <div className="mt-4 flex flex-col items-center gap-2">
+          {pageError && <p className="text-sm text-red-500">{pageError}</p>}
+          <button
+            onClick={pageError ? reload : loadMore}
+            disabled={isPageLoading}
+            className="px-4 py-2 text-sm font-medium text-primary-600 hover:bg-primary-50 rounded-lg flex items-center gap-2 disabled:opacity-50"
+          >
+            {isPageLoading && <Loader2 size={16} className="animate-spin" />}
+            {pageError ? 'Retry' : 'Load more'}
+          </button>
+        </div>
+      )}
+
       {/* Loan Summary Modal */}
       {summaryLoan && loanSummary && (
         <div className="fixed inset-0 bg-black/50 flex items-center justify-center z-50 p-4" onClick={() => setSummaryLoan(null)}>
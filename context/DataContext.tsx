@@ -1,6 +1,6 @@
-import React, { createContext, useContext, ReactNode, useState, useEffect } from 'react';
+import React, { createContext, useContext, ReactNode, useState, useEffect, useRef } from 'react';
 import { Loan, Installment, Transaction } from '../types';
-import { loansAPI, installmentsAPI, transactionsAPI } from '../services/api';
+import { loansAPI, installmentsAPI, transactionsAPI, changesAPI, PaymentInput } from '../services/api';
 import { useAuth } from './AuthContext';
 
 interface DataContextType {
@@ -9,12 +9,14 @@ interface DataContextType {
   transactions: Transaction[];
   isLoading: boolean;
   error: string | null;
-  addLoan: (loan: Omit<Loan, 'id' | 'created_at' | 'updated_at'>) => Promise<void>;
-  updateLoan: (id: string, updates: Partial<Loan>) => Promise<void>;
+  addLoan: (loan: Omit<Loan, 'id' | 'created_at' | 'updated_at'> & { advanced_installment?: boolean; frequency_days?: number }) => Promise<any>;
+  updateLoan: (id: string, updates: Partial<Loan>) => Promise<Loan>;
   deleteLoan: (id: string) => Promise<void>;
   addInstallments: (newInstallments: Omit<Installment, 'id' | 'created_at' | 'updated_at'>[]) => Promise<void>;
-  updateInstallment: (id: string, updates: Partial<Installment>) => Promise<void>;
+  updateInstallment: (id: string, updates: Partial<Installment>) => Promise<Installment>;
   deleteInstallment: (id: string) => Promise<void>;
+  recordPayments: (payments: PaymentInput[]) => Promise<Installment[]>;
+  accrueInterest: (loanId?: string) => Promise<void>;
   addTransaction: (transaction: Omit<Transaction, 'id' | 'created_at'>) => Promise<void>;
   addTransactions: (transactions: Omit<Transaction, 'id' | 'created_at'>[]) => Promise<void>;
   deleteTransaction: (id: string) => Promise<void>;
@@ -31,6 +33,24 @@ interface DataContextType {
 
 const DataContext = createContext<DataContextType | undefined>(undefined);
 
+// Apply a change-feed delta to a list, keeping the API's sort order
+const applyDelta = <T extends { id: string }>(
+  list: T[],
+  changed: T[] = [],
+  deleted: string[] = [],
+  compare: (a: T, b: T) => number
+): T[] => {
+  if (changed.length === 0 && deleted.length === 0) return list;
+  const byId = new Map(list.map((item) => [item.id, item]));
+  deleted.forEach((id) => byId.delete(id));
+  changed.forEach((item) => byId.set(item.id, item));
+  return Array.from(byId.values()).sort(compare);
+};
+
+const byCreatedDesc = (a: any, b: any) => String(b.created_at).localeCompare(String(a.created_at)) || String(b.id).localeCompare(String(a.id));
+const byDueDate = (a: any, b: any) => String(a.due_date).localeCompare(String(b.due_date)) || String(a.id).localeCompare(String(b.id));
+const byDateDesc = (a: any, b: any) => String(b.date).localeCompare(String(a.date)) || String(b.id).localeCompare(String(a.id));
+
 export const DataProvider: React.FC<{ children: ReactNode }> = ({ children }) => {
   const { isAuthenticated } = useAuth();
   const [loans, setLoans] = useState<Loan[]>([]);
@@ -40,12 +60,56 @@ export const DataProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
 
-  // Fetch all data when user logs in
+  // Position in the change feed; null until a full load has been done
+  const changeCursor = useRef<string | null>(null);
+
+  // Pull only what changed since the last refresh
+  const syncChanges = async () => {
+    let cursor = changeCursor.current as string;
+    const changed: Record<string, any[]> = { loans: [], installments: [], transactions: [] };
+    const deleted: Record<string, string[]> = { loans: [], installments: [], transactions: [] };
+
+    let feed;
+    do {
+      feed = await changesAPI.since(cursor);
+      for (const table of Object.keys(changed)) {
+        // Later pages win: drop earlier versions of re-changed or deleted rows
+        const latest = new Set([...(feed.changes[table] || []).map((row) => row.id), ...(feed.deleted[table] || [])]);
+        changed[table] = changed[table].filter((row) => !latest.has(row.id)).concat(feed.changes[table] || []);
+        deleted[table] = deleted[table].filter((id) => !latest.has(id)).concat(feed.deleted[table] || []);
+      }
+      cursor = feed.next_cursor;
+    } while (feed.has_more);
+
+    setLoans((prev) => applyDelta(prev, changed.loans, deleted.loans, byCreatedDesc));
+    setInstallments((prev) => applyDelta(prev, changed.installments, deleted.installments, byDueDate));
+    setTransactions((prev) => applyDelta(prev, changed.transactions, deleted.transactions, byDateDesc));
+    changeCursor.current = cursor;
+  };
+
+  const loadAll = async () => {
+    // Taken first: anything written during the load is replayed by the feed
+    const cursor = await changesAPI.head().catch(() => null);
+
+    const [loansData, installmentsData, transactionsData] = await Promise.all([
+      loansAPI.getAll(),
+      installmentsAPI.getAll(),
+      transactionsAPI.getAll()
+    ]);
+
+    setLoans(loansData);
+    setInstallments(installmentsData);
+    setTransactions(transactionsData);
+    changeCursor.current = cursor;
+  };
+
+  // Fetch all data when user logs in, and only deltas after that
   const refreshData = async () => {
     if (!isAuthenticated) {
       setLoans([]);
       setInstallments([]);
       setTransactions([]);
+      changeCursor.current = null;
       return;
     }
 
@@ -53,17 +117,21 @@ export const DataProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
     setError(null);
 
     try {
-      const [loansData, installmentsData, transactionsData, summaryData] = await Promise.all([
-        loansAPI.getAll(),
-        installmentsAPI.getAll(),
-        transactionsAPI.getAll(),
-        transactionsAPI.getFinancialSummary()
-      ]);
-
-      setLoans(loansData);
-      setInstallments(installmentsData);
-      setTransactions(transactionsData);
-      setFinancialSummary(summaryData);
+      const summaryPromise = transactionsAPI.getFinancialSummary();
+
+      if (changeCursor.current) {
+        try {
+          await syncChanges();
+        } catch (err) {
+          console.warn('Delta sync failed, reloading everything:', err);
+          changeCursor.current = null;
+          await loadAll();
+        }
+      } else {
+        await loadAll();
+      }
+
+      setFinancialSummary(await summaryPromise);
     } catch (err: any) {
       setError(err.message || 'Failed to fetch data');
       console.error('Error fetching data:', err);
@@ -78,12 +146,18 @@ export const DataProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
   }, [isAuthenticated]);
 
   // Loans
-  const addLoan = async (loanData: Omit<Loan, 'id' | 'created_at' | 'updated_at'>): Promise<any> => {
+  const addLoan = async (loanData: Omit<Loan, 'id' | 'created_at' | 'updated_at'> & { advanced_installment?: boolean; frequency_days?: number }): Promise<any> => {
     setError(null);
     try {
-      const newLoan = await loansAPI.create(loanData);
+      // The backend creates the installment schedule along with the loan
+      const { installments: schedule = [], transactions: scheduleTransactions = [], ...newLoan } = await loansAPI.create(loanData);
       setLoans((prev) => [...prev, newLoan]);
-      // Remove redundant refreshData() call
+      if (schedule.length > 0) {
+        setInstallments((prev) => [...prev, ...schedule]);
+      }
+      if (scheduleTransactions.length > 0) {
+        setTransactions((prev) => [...scheduleTransactions, ...prev]); // Newest first
+      }
       return newLoan;
     } catch (err: any) {
       setError(err.message || 'Failed to create loan');
@@ -91,11 +165,12 @@ export const DataProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
     }
   };
 
-  const updateLoan = async (id: string, updates: Partial<Loan>) => {
+  const updateLoan = async (id: string, updates: Partial<Loan>): Promise<Loan> => {
     setError(null);
     try {
       const updatedLoan = await loansAPI.update(id, updates);
       setLoans((prev) => prev.map((l) => (l.id === id ? updatedLoan : l)));
+      return updatedLoan;
     } catch (err: any) {
       setError(err.message || 'Failed to update loan');
       throw err;
@@ -129,11 +204,12 @@ export const DataProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
     }
   };
 
-  const updateInstallment = async (id: string, updates: Partial<Installment>) => {
+  const updateInstallment = async (id: string, updates: Partial<Installment>): Promise<Installment> => {
     setError(null);
     try {
       const updated = await installmentsAPI.update(id, updates);
       setInstallments((prev) => prev.map((i) => (i.id === id ? updated : i)));
+      return updated;
     } catch (err: any) {
       setError(err.message || 'Failed to update installment');
       throw err;
@@ -151,6 +227,39 @@ export const DataProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
     }
   };
 
+  // Marks installments paid, records their CREDIT transactions and
+  // updates loan statuses in one atomic server call
+  const recordPayments = async (payments: PaymentInput[]): Promise<Installment[]> => {
+    setError(null);
+    try {
+      const result = await installmentsAPI.recordPayments(payments);
+      const paid = new Map(result.installments.map((i: Installment) => [i.id, i]));
+      const statuses = new Map(result.loans.map((l: { id: string; status: string }) => [l.id, l.status]));
+
+      setInstallments((prev) => prev.map((i) => paid.get(i.id) || i));
+      setTransactions((prev) => [...result.transactions, ...prev]); // Newest first
+      setLoans((prev) => prev.map((l) => (statuses.has(l.id) ? { ...l, status: statuses.get(l.id) } : l)));
+      return result.installments;
+    } catch (err: any) {
+      setError(err.message || 'Failed to record payments');
+      throw err;
+    }
+  };
+
+  // Generates due interest installments on the server, then pulls them in
+  const accrueInterest = async (loanId?: string) => {
+    setError(null);
+    try {
+      const result = await loansAPI.accrueInterest(loanId);
+      if (result.installments_created > 0) {
+        await refreshData();
+      }
+    } catch (err: any) {
+      setError(err.message || 'Failed to accrue interest');
+      throw err;
+    }
+  };
+
   // Transactions
   const addTransaction = async (transactionData: Omit<Transaction, 'id' | 'created_at'>) => {
     setError(null);
@@ -235,6 +344,8 @@ export const DataProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
     addInstallments,
     updateInstallment,
     deleteInstallment,
+    recordPayments,
+    accrueInterest,
     addTransaction,
     addTransactions,
     deleteTransaction,
@@ -0,0 +1,60 @@
+import { useState, useEffect, useRef, useCallback, DependencyList } from 'react';
+
+export interface Page<T> {
+  items: T[];
+  next_cursor: string | null;
+}
+
+// Cursor-paged list: loads the first page whenever `deps` change, then appends
+// the following pages on loadMore()
+function usePagedList<T extends { id: string }>(
+  fetchPage: (cursor?: string) => Promise<Page<T>>,
+  deps: DependencyList
+) {
+  const [items, setItems] = useState<T[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [isLoading, setIsLoading] = useState(false);
+  const [error, setError] = useState<string | null>(null);
+  // Responses of superseded requests (filters changed meanwhile) are dropped
+  const request = useRef(0);
+
+  const load = async (cursor?: string) => {
+    const id = ++request.current;
+    setIsLoading(true);
+    setError(null);
+    try {
+      const page = await fetchPage(cursor);
+      if (id !== request.current) return;
+      setItems((prev) => (cursor ? [...prev, ...page.items] : page.items));
+      setNextCursor(page.next_cursor ?? null);
+    } catch (err: any) {
+      if (id === request.current) setError(err.message || 'Failed to load');
+    } finally {
+      if (id === request.current) setIsLoading(false);
+    }
+  };
+
+  useEffect(() => {
+    load();
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, deps);
+
+  const loadMore = () => {
+    if (nextCursor && !isLoading) load(nextCursor);
+  };
+
+  const reload = () => load();
+
+  // Swap in an updated row (e.g. after an edit) without refetching the list
+  const replace = useCallback((item: T) => {
+    setItems((prev) => prev.map((i) => (i.id === item.id ? item : i)));
+  }, []);
+
+  const remove = useCallback((id: string) => {
+    setItems((prev) => prev.filter((i) => i.id !== id));
+  }, []);
+
+  return { items, hasMore: nextCursor !== null, isLoading, error, loadMore, reload, replace, remove };
+}
+
+export default usePagedList;
@@ -18,7 +18,8 @@ export const removeAuthToken = (): void => {
 const fetchWithAuth = async (url: string, options: RequestInit = {}) => {
     const token = getAuthToken();
     const headers: HeadersInit = {
-        'Content-Type': 'application/json',
+        // Let the browser set the multipart boundary for file uploads
+        ...(options.body instanceof FormData ? {} : { 'Content-Type': 'application/json' }),
         ...(options.headers || {}),
     };
 
@@ -28,13 +29,10 @@ const fetchWithAuth = async (url: string, options: RequestInit = {}) => {
 
     const response = await fetch(`${API_BASE_URL}${url}`, {
         ...options,
-        cache: 'no-store', // Prevent caching
-        headers: {
-            ...headers,
-            'Cache-Control': 'no-cache, no-store, must-revalidate',
-            'Pragma': 'no-cache',
-            'Expires': '0'
-        },
+        // Always revalidate: the browser sends If-None-Match with the cached
+        // ETag and reuses the cached body when the API answers 304
+        cache: 'no-cache',
+        headers,
     });
 
     if (response.status === 401) {
@@ -136,10 +134,23 @@ export const authAPI = {
 };
 
 // Loans API
+export interface LoanFilters {
+    status?: string;
+    loanType?: string;
+    clientName?: string;
+}
+
 export const loansAPI = {
-    getAll: async (status?: string) => {
-        const url = status ? `/loans?status=${status}` : '/loans';
-        const response = await fetchWithAuth(url);
+    // One page of loans, newest first; pass next_cursor back as cursor
+    getPage: async (filters: LoanFilters = {}, cursor?: string, limit?: number) => {
+        const params = new URLSearchParams();
+        if (filters.status) params.set('status_filter', filters.status);
+        if (filters.loanType) params.set('loan_type', filters.loanType);
+        if (filters.clientName) params.set('client_name', filters.clientName);
+        if (cursor) params.set('cursor', cursor);
+        if (limit) params.set('limit', String(limit));
+
+        const response = await fetchWithAuth(`/loans?${params.toString()}`);
 
         if (!response.ok) {
             throw new Error('Failed to fetch loans');
@@ -148,6 +159,19 @@ export const loansAPI = {
         return response.json();
     },
 
+    getAll: async (status?: string) => {
+        const loans: any[] = [];
+        let cursor: string | undefined;
+
+        do {
+            const page = await loansAPI.getPage({ status }, cursor, 1000);
+            loans.push(...page.items);
+            cursor = page.next_cursor ?? undefined;
+        } while (cursor);
+
+        return loans;
+    },
+
     getById: async (id: string) => {
         const response = await fetchWithAuth(`/loans/${id}`);
 
@@ -194,19 +218,156 @@ export const loansAPI = {
             throw new Error('Failed to delete loan');
         }
     },
+
+    // Generate due INTEREST_ONLY installments of DAILY_RATE loans (all, or one)
+    accrueInterest: async (loanId?: string) => {
+        const params = loanId ? `?loan_id=${encodeURIComponent(loanId)}` : '';
+        const response = await fetchWithAuth(`/loans/accrue-interest${params}`, {
+            method: 'POST',
+        });
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.detail || 'Failed to accrue interest');
+        }
+
+        return response.json();
+    },
 };
 
 // Installments API
+export interface PaymentInput {
+    installment_id: string;
+    amount?: number; // defaults to expected_amount + penalty
+    paid_date?: string;
+    category?: string;
+    description?: string;
+}
+
+export interface InstallmentFilters {
+    loanId?: string;
+    status?: string;
+    dueFrom?: string;
+    dueTo?: string;
+    clientName?: string;
+    loanType?: string;
+    unpaidOnly?: boolean;
+}
+
+export interface AgingRow {
+    name: string;
+    count: number;
+    amount: number;
+    counts: Record<string, number>;
+    amounts: Record<string, number>;
+}
+
+export interface AgingReport {
+    as_of: string;
+    buckets: string[];
+    total: AgingRow;
+    by_client: AgingRow[];
+    by_loan_type: AgingRow[];
+}
+
+export interface ForecastAmounts {
+    count: number;
+    projected_count: number;
+    amount: number;
+    principal: number;
+    interest: number;
+    accruing_interest: number;
+}
+
+export interface ForecastPeriod extends ForecastAmounts {
+    period_start: string;
+    period_end: string;
+}
+
+export interface CollectionsForecast {
+    granularity: 'daily' | 'weekly';
+    start: string;
+    end: string;
+    overdue: ForecastAmounts;
+    total: ForecastAmounts;
+    periods: ForecastPeriod[];
+}
+
 export const installmentsAPI = {
+    // One page of installments, earliest due first; pass next_cursor back as cursor
+    getPage: async (filters: InstallmentFilters = {}, cursor?: string, limit?: number) => {
+        const params = new URLSearchParams();
+        if (filters.loanId) params.set('loan_id', filters.loanId);
+        if (filters.status) params.set('status_filter', filters.status);
+        if (filters.dueFrom) params.set('due_from', filters.dueFrom);
+        if (filters.dueTo) params.set('due_to', filters.dueTo);
+        if (filters.clientName) params.set('client_name', filters.clientName);
+        if (filters.loanType) params.set('loan_type', filters.loanType);
+        if (filters.unpaidOnly) params.set('unpaid_only', 'true');
+        if (cursor) params.set('cursor', cursor);
+        if (limit) params.set('limit', String(limit));
+
+        const response = await fetchWithAuth(`/installments?${params.toString()}`);
+
+        if (!response.ok) {
+            throw new Error('Failed to fetch installments');
+        }
+
+        return response.json();
+    },
+
     getAll: async (loanId?: string, status?: string) => {
-        let url = '/installments?';
-        if (loanId) url += `loan_id=${loanId}&`;
-        if (status) url += `status=${status}`;
+        const installments: any[] = [];
+        let cursor: string | undefined;
 
-        const response = await fetchWithAuth(url);
+        do {
+            const page = await installmentsAPI.getPage({ loanId, status }, cursor, 1000);
+            installments.push(...page.items);
+            cursor = page.next_cursor ?? undefined;
+        } while (cursor);
+
+        return installments;
+    },
+
+    // Outstanding amounts by days past due, in total, per client and per loan type
+    getAging: async (asOf?: string): Promise<AgingReport> => {
+        const params = new URLSearchParams();
+        if (asOf) params.set('as_of', asOf);
+
+        const response = await fetchWithAuth(`/installments/aging?${params.toString()}`);
 
         if (!response.ok) {
-            throw new Error('Failed to fetch installments');
+            throw new Error('Failed to fetch aging report');
+        }
+
+        return response.json();
+    },
+
+    // Expected collections per day or week from today, split into principal and interest
+    getForecast: async (granularity: 'daily' | 'weekly' = 'daily', periods = 30): Promise<CollectionsForecast> => {
+        const params = new URLSearchParams({ granularity, periods: String(periods) });
+
+        const response = await fetchWithAuth(`/installments/forecast?${params.toString()}`);
+
+        if (!response.ok) {
+            throw new Error('Failed to fetch collections forecast');
+        }
+
+        return response.json();
+    },
+
+    // One page of overdue installments (unpaid, due before today), most overdue first
+    getOverdue: async (cursor?: string, limit?: number, loanId?: string, clientName?: string) => {
+        const params = new URLSearchParams();
+        if (loanId) params.set('loan_id', loanId);
+        if (clientName) params.set('client_name', clientName);
+        if (cursor) params.set('cursor', cursor);
+        if (limit) params.set('limit', String(limit));
+
+        const response = await fetchWithAuth(`/installments/overdue?${params.toString()}`);
+
+        if (!response.ok) {
+            throw new Error('Failed to fetch overdue installments');
         }
 
         return response.json();
@@ -236,6 +397,21 @@ export const installmentsAPI = {
         return response.json();
     },
 
+    // Record one or many payments atomically (installments, CREDITs, loan statuses)
+    recordPayments: async (payments: PaymentInput[]) => {
+        const response = await fetchWithAuth('/installments/payments', {
+            method: 'POST',
+            body: JSON.stringify(payments),
+        });
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.detail || 'Failed to record payments');
+        }
+
+        return response.json();
+    },
+
     bulkCreate: async (installments: any[]) => {
         const response = await fetchWithAuth('/installments/bulk', {
             method: 'POST',
@@ -288,10 +464,36 @@ export const installmentsAPI = {
 };
 
 // Transactions API
+export interface CashFlowPoint {
+    period_start: string;
+    period_end: string;
+    credit: number;
+    debit: number;
+    net: number;
+    balance: number;
+}
+
+export interface CashFlowSeries {
+    granularity: 'daily' | 'weekly' | 'monthly';
+    start: string;
+    end: string;
+    opening_balance: number;
+    credit: number;
+    debit: number;
+    net: number;
+    closing_balance: number;
+    points: CashFlowPoint[];
+}
+
 export const transactionsAPI = {
-    getAll: async (type?: string) => {
-        const url = type ? `/transactions?type=${type}` : '/transactions';
-        const response = await fetchWithAuth(url);
+    // One page of transactions, newest first; pass next_cursor back as cursor
+    getPage: async (cursor?: string, type?: string, limit?: number) => {
+        const params = new URLSearchParams();
+        if (type) params.set('type_filter', type);
+        if (cursor) params.set('cursor', cursor);
+        if (limit) params.set('limit', String(limit));
+
+        const response = await fetchWithAuth(`/transactions?${params.toString()}`);
 
         if (!response.ok) {
             throw new Error('Failed to fetch transactions');
@@ -300,6 +502,19 @@ export const transactionsAPI = {
         return response.json();
     },
 
+    getAll: async (type?: string) => {
+        const transactions: any[] = [];
+        let cursor: string | undefined;
+
+        do {
+            const page = await transactionsAPI.getPage(cursor, type, 1000);
+            transactions.push(...page.items);
+            cursor = page.next_cursor ?? undefined;
+        } while (cursor);
+
+        return transactions;
+    },
+
     getById: async (id: string) => {
         const response = await fetchWithAuth(`/transactions/${id}`);
 
@@ -338,6 +553,24 @@ export const transactionsAPI = {
         return response.json();
     },
 
+    // Server-side CSV import; returns counts and a per-row error report
+    importCSV: async (file: File) => {
+        const body = new FormData();
+        body.append('file', file);
+
+        const response = await fetchWithAuth('/transactions/import', {
+            method: 'POST',
+            body,
+        });
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.detail || 'Failed to import transactions');
+        }
+
+        return response.json();
+    },
+
     delete: async (id: string) => {
         const response = await fetchWithAuth(`/transactions/${id}`, {
             method: 'DELETE',
@@ -357,6 +590,52 @@ export const transactionsAPI = {
 
         return response.json();
     },
+
+    // CREDIT vs DEBIT per period with the running cash-in-hand balance
+    getCashFlow: async (granularity: 'daily' | 'weekly' | 'monthly' = 'daily', start?: string, end?: string): Promise<CashFlowSeries> => {
+        const params = new URLSearchParams({ granularity });
+        if (start) params.set('start', start);
+        if (end) params.set('end', end);
+
+        const response = await fetchWithAuth(`/transactions/summary/cash-flow?${params.toString()}`);
+
+        if (!response.ok) {
+            throw new Error('Failed to fetch cash flow');
+        }
+
+        return response.json();
+    },
+};
+
+// Change feed (delta sync)
+export interface ChangeFeed {
+    changes: Record<string, any[]>;
+    deleted: Record<string, string[]>;
+    next_cursor: string;
+    has_more: boolean;
+}
+
+export const changesAPI = {
+    // Cursor covering everything committed so far - take it before a full load
+    head: async (): Promise<string> => {
+        const response = await fetchWithAuth('/changes/head');
+
+        if (!response.ok) {
+            throw new Error('Failed to fetch change cursor');
+        }
+
+        return (await response.json()).cursor;
+    },
+
+    since: async (cursor: string): Promise<ChangeFeed> => {
+        const response = await fetchWithAuth(`/changes?since=${encodeURIComponent(cursor)}&limit=1000`);
+
+        if (!response.ok) {
+            throw new Error('Failed to fetch changes');
+        }
+
+        return response.json();
+    },
 };
 
 // Health check
@@ -380,4 +659,15 @@ export const syncAPI = {
 
         return response.json();
     },
+
+    getJob: async (jobId: string) => {
+        const response = await fetchWithAuth(`/sync/jobs/${jobId}`);
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.detail || 'Failed to fetch sync job');
+        }
+
+        return response.json();
+    },
 };
@@ -57,6 +57,14 @@ export interface Loan {
   disbursement_date: string;
   created_at?: string;
 
+  // Installment statistics maintained by the backend
+  installment_count?: number;
+  unpaid_count?: number;
+  outstanding_amount?: number;
+  paid_total?: number;
+  next_due_date?: string | null;
+  last_paid_date?: string | null;
+
   // Legacy camelCase support
   clientId?: string;
   clientName?: string;